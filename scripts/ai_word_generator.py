@@ -3,10 +3,17 @@ import os
 import json
 import time
 import random
+from collections import Counter
+
 from google import genai
 from google.genai import types
 from pydantic import BaseModel, Field
 
+from lexical_slices import SliceBoard
+from lexicon_scan import lexicon_problem, to_british
+from word_families import FamilyIndex
+from llm_runtime import Journal, Telemetry
+
 # --- CONFIGURATION ---
 # --- CONFIGURATION ---
 PROJECT_ID = "vocab-gen-2025-njytim" # Clean, user-created project
@@ -76,19 +83,19 @@ class VocabItem(BaseModel):
     example: str = Field(description="The full sentence including the word")
 
 # --- GENERATOR FUNCTION ---
-def generate_batch(theme, difficulty, existing_words, batch_size=20):
+def generate_batch(theme, difficulty, slice_, exclusion_list, batch_size=20):
     
-    exclusion_list = list(existing_words)[-200:] if len(existing_words) > 0 else []
-
     prompt = f"""
     Generate {batch_size} vocabulary items for a high-quality British English word game.
     
     ### CONSTRAINTS:
     1. **Theme**: {theme}
     2. **Difficulty**: {difficulty}/9
-    3. **Uniqueness**: Avoid these recent words: {exclusion_list}
+    3. **Uniqueness**: Avoid these words: {exclusion_list}
     4. **Context**: Sentences MUST be 15+ words long and tell a micro-story.
     5. **Spelling**: STRICT British English (colour, theatre, metre).
+    6. **Answer words** (the word in `answer`):
+    {slice_.constraint()}
     
     ### DISTRACTOR RULES:
     * If answer is a Noun, distractors must be Nouns.
@@ -113,7 +120,7 @@ def generate_batch(theme, difficulty, existing_words, batch_size=20):
 # --- MAIN LOOP ---
 def main():
     database = []
-    seen_words = set()
+    seen_words = FamilyIndex()
     
     # Check if target file exists and load it to append or resume
     if os.path.exists(OUTPUT_FILE):
@@ -122,11 +129,34 @@ def main():
                 content = json.load(f)
                 if isinstance(content, list):
                     database = content
-                    seen_words = {item['answer'].lower() for item in database if 'answer' in item}
+                    seen_words = FamilyIndex(item['answer'].lower() for item in database if 'answer' in item)
                     print(f"Resuming... {len(database)} questions loaded.")
         except:
             print("Starting fresh (or file corrupt).")
 
+    # Items accepted since the last compaction are only in the journal
+    journal = Journal(OUTPUT_FILE)
+    resumed = journal.replay()
+    if resumed:
+        database.extend(resumed)
+        for item in resumed:
+            if 'answer' in item:
+                seen_words.add(item['answer'].lower())
+        print(f"Replayed {len(resumed)} questions from journal.")
+
+    # Each call asks for its own lexical slice; see lexical_slices.py
+    board = SliceBoard({d: TARGET_COUNT // 9 + (1 if d <= TARGET_COUNT % 9 else 0) for d in range(1, 10)})
+    board.add_existing((item['answer'].lower(), item.get('difficulty', 5)) for item in database if 'answer' in item)
+
+    telemetry = Telemetry()
+    try:
+        mine(database, seen_words, journal, telemetry, board)
+    finally:
+        # Write the canonical file once (also when interrupted with Ctrl-C)
+        journal.compact(database)
+        print(board.summary())
+
+def mine(database, seen_words, journal, telemetry, board):
     # Cycle difficulties to ensure we don't get stuck on "Easy" for 500 iterations
     difficulty_cycle = [1, 2, 3, 4, 5, 6, 7, 8, 9] 
     
@@ -138,40 +168,57 @@ def main():
         for theme in current_themes:
             for diff in difficulty_cycle:
                 if len(database) >= TARGET_COUNT: break
+                slice_ = board.next_slice(diff)
+                if slice_ is None:
+                    continue
                 
-                print(f"Mining... [Theme: {theme}] [Diff: {diff}] [Total: {len(database)}]")
+                print(f"Mining... [Theme: {theme}] [Slice: {slice_.key}] [Total: {len(database)}]")
                 
-                batch = generate_batch(theme, diff, seen_words)
+                started = time.monotonic()
+                batch = generate_batch(theme, diff, slice_, board.exclusions(slice_))
+                job = f"{theme}-d{diff}"
+                telemetry.write("call", job=job, difficulty=diff, theme=theme, model="gemini-2.0-flash",
+                                outcome="ok" if batch else "empty", latency=round(time.monotonic() - started, 3),
+                                items=len(batch or []))
                 
                 valid_items = 0
+                accepted_words = []
+                rejected = Counter()
                 if batch:
                     for item in batch:
-                        # 1. Duplication Check
-                        if item.answer.lower() in seen_words:
+                        # 1. Duplication Check (whole word family: "devise" blocks "devised")
+                        existing = seen_words.find(item.answer)
+                        if existing is not None:
+                            rejected["duplicate" if existing == item.answer.lower() else "same family"] += 1
                             continue
                         
                         # 2. Length Check
                         if len(item.question.split()) < MIN_QUESTION_LENGTH:
+                            rejected["too short"] += 1
                             continue
 
-                        # 3. British English Guardrails
-                        if item.answer.lower() in ['color', 'center', 'theater', 'honor', 'defense']:
+                        # 3. British English Guardrails (lexicon_scan.py): reject banned words and
+                        # American answers, respell anything else
+                        item.question_number = len(database) + 1
+                        record = item.model_dump(by_alias=True)
+                        problem = lexicon_problem(record, answer_field="answer")
+                        if problem:
+                            rejected[problem] += 1
                             continue
+                        to_british(record)
 
                         # Success
-                        item.question_number = len(database) + 1
-                        database.append(item.model_dump(by_alias=True))
+                        database.append(record)
+                        journal.append(record)
                         seen_words.add(item.answer.lower())
+                        accepted_words.append(item.answer.lower())
                         valid_items += 1
                     
                     print(f"  -> Accepted {valid_items} valid questions.")
-                    
-                    # Save progressively
-                    try:
-                        with open(OUTPUT_FILE, 'w') as f:
-                            json.dump(database, f, indent=2)
-                    except Exception as e:
-                        print(f"Error saving file: {e}")
+                duplicates = rejected["duplicate"] + rejected["same family"]
+                if board.record(slice_, len(batch or []), duplicates, accepted_words):
+                    print(f"  -> Slice {slice_.key} is mostly duplicates now, retiring it.")
+                telemetry.items(job, valid_items, rejected, difficulty=diff, theme=theme, slice=slice_.key)
                 
                 time.sleep(1)
 
@@ -0,0 +1,484 @@
+"""
+Content Schemas
+pydantic models for every question bank and for what the generators get
+back from the model before it is numbered and stamped:
+
+    vocab-words            generate_vocab_ai.py word entries (vocab_8000.json)
+    vocab-mcq              questions.json
+    grammar-mcq(-draft)    grammar_questions_full.json
+    vocab-cloze(-draft)    cloze_generated.json
+    grammar-cloze(-draft)  grammar_cloze_full.json
+    comprehension(-draft)  comprehension_full.json
+    synthesis(-draft)      synthesis_transformation.json
+    spelling               spelling_words.json
+    listening              listening_passages.json
+
+and for the passage parts repair_passages.py regenerates on their own
+(grammar-cloze-blank, grammar-cloze-paragraph, comprehension-question).
+A bank schema has its content_store.BANKS name, and validate_bank() reads
+the file BANKS gives for it.
+
+Each schema is compiled once into a TypeAdapter over a list of items, so a
+whole batch or bank is validated in a single call into pydantic-core rather
+than field by field in Python; a bank file is handed over as raw bytes and
+parsed and validated in one pass. Besides the types, the schemas check what
+the app relies on: MCQ answers are the option answer_index points at, cloze
+markers match their blanks, totalBlanks is right, and synthesis answerParts
+rebuild the answer.
+
+Errors are grouped by type and field path (list positions collapsed), so a
+bank with 300 bad options maps reports one line, not 300.
+
+response_schema() turns a draft schema into the OpenAPI subset Vertex AI
+takes as a response_schema, so --structured generator runs are constrained
+to the same shape they are validated against.
+
+Usage:
+    python content_schemas.py [--bank vocab-mcq] [--json report.json]
+"""
+
+import argparse
+import json
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Annotated, Dict, List, Literal, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator, model_validator
+from pydantic_core import InitErrorDetails, PydanticCustomError
+
+from content_store import BANKS, bank_path
+
+MARKER = re.compile(r"__(\d+)__")
+
+Text = Annotated[str, Field(min_length=1, pattern=r"\S")]
+Difficulty = Annotated[int, Field(ge=1, le=10)]
+OPTION_KEYS = ("1", "2", "3", "4")
+
+
+class Item(BaseModel):
+    # Strict: the app reads these values as they are, so "3" is not a difficulty.
+    # Extra fields (wordId, trigger_used, ...) are allowed through.
+    model_config = ConfigDict(strict=True, extra="allow")
+
+
+def normalise_answer(text: str) -> str:
+    """SynthesisView.jsx normalizeText() plus its punctuation strip."""
+    text = " ".join(text.strip().lower().split())
+    text = text.replace("n't", " not").replace("'", "")
+    return " ".join(re.sub(r"[.,!?;:]", "", text).split())
+
+
+def raise_all(title: str, errors: List[PydanticCustomError], value) -> None:
+    """Raise every error a validator found at once, so the first defect does not hide the next."""
+    if errors:
+        raise ValidationError.from_exception_data(title, [InitErrorDetails(type=e, loc=(), input=value)
+                                                          for e in errors])
+
+
+def repeated(texts: List[str]) -> List[str]:
+    return [t for t, n in Counter(t.lower() for t in texts).items() if n > 1]
+
+
+def check_choice(answer: str, options: Dict[str, str], answer_index: int) -> List[PydanticCustomError]:
+    errors = []
+    texts = [o.strip() for o in options.values()]
+    if answer.strip() not in texts:
+        errors.append(PydanticCustomError("answer_not_option", "answer '{answer}' is not an option",
+                                          {"answer": answer}))
+    chosen = options.get(str(answer_index))
+    if (chosen or "").strip() != answer.strip():
+        errors.append(PydanticCustomError("answer_index", "answer_index {index} is '{chosen}', not '{answer}'",
+                                          {"index": answer_index, "chosen": chosen, "answer": answer}))
+    if repeated(texts):
+        errors.append(PydanticCustomError("repeated_option", "repeated option(s): {options}",
+                                          {"options": ", ".join(repeated(texts))}))
+    return errors
+
+
+class Choice(Item):
+    """A question with an options map {"1": ..., "4": ...}."""
+    question: Text
+    # The properties only shape the response schema: the prompts ask for four options
+    options: Dict[str, Text] = Field(min_length=2, json_schema_extra={
+        "properties": {key: {"type": "string"} for key in OPTION_KEYS}, "required": list(OPTION_KEYS)})
+    answer: Text
+    answer_index: int = Field(ge=1)
+
+    @field_validator("options")
+    @classmethod
+    def numbered(cls, options: Dict[str, str]) -> Dict[str, str]:
+        if sorted(options) != [str(n) for n in range(1, len(options) + 1)]:
+            raise PydanticCustomError("option_keys", "options must be keyed 1..{n}", {"n": len(options)})
+        return options
+
+    @model_validator(mode="after")
+    def answer_is_option(self):
+        raise_all(type(self).__name__, check_choice(self.answer, self.options, self.answer_index), self.answer)
+        return self
+
+
+class VocabWord(Item):
+    word: Text
+    definition: Text
+    example: Text
+    distractors: List[Text] = Field(min_length=3)
+    themes: Union[List[Text], Text]
+
+
+class VocabMCQ(Choice):
+    question_number: int
+    theme: Text
+    difficulty: Difficulty
+    definition: str = ""
+    example: str = ""
+
+
+class GrammarQuestion(Choice):
+    subunit: Text
+    difficulty: Difficulty
+    explanation: str = ""
+    example: str = ""
+
+
+class GrammarMCQ(GrammarQuestion):
+    category: Text
+    question_number: Optional[int] = None
+
+
+class Blank(Item):
+    id: int = Field(ge=1)
+    answer: Text
+    options: List[Text] = Field(min_length=2)
+
+    @model_validator(mode="after")
+    def answer_is_option(self):
+        errors = []
+        options = [o.strip() for o in self.options]
+        if self.answer.strip() not in options:
+            errors.append(PydanticCustomError("answer_not_option", "blank {id}: '{answer}' is not an option",
+                                              {"id": self.id, "answer": self.answer}))
+        if repeated(options):
+            errors.append(PydanticCustomError("repeated_option", "blank {id}: repeated options {options}",
+                                              {"id": self.id, "options": options}))
+        raise_all(type(self).__name__, errors, self.answer)
+        return self
+
+
+class GrammarBlank(Blank):
+    subunit: Text
+    explanation: str = ""
+
+
+def check_markers(text: str, blanks: List[Blank]) -> None:
+    markers = sorted(int(m) for m in MARKER.findall(text))
+    ids = sorted(b.id for b in blanks)
+    if markers != ids:
+        raise PydanticCustomError("blank_markers", "markers {markers} but blanks {ids}",
+                                  {"markers": markers, "ids": ids})
+
+
+class Paragraph(Item):
+    text: Text
+    blanks: List[Blank]
+
+    @model_validator(mode="after")
+    def markers_match(self):
+        check_markers(self.text, self.blanks)
+        return self
+
+
+class GrammarParagraph(Item):
+    text: Text
+    blanks: List[GrammarBlank]
+
+    @model_validator(mode="after")
+    def markers_match(self):
+        check_markers(self.text, self.blanks)
+        return self
+
+
+def check_total(total: int, paragraphs: List) -> None:
+    actual = sum(len(p.blanks) for p in paragraphs)
+    if total != actual:
+        raise PydanticCustomError("total_blanks", "totalBlanks is {total}, passage has {actual}",
+                                  {"total": total, "actual": actual})
+
+
+class ClozeDraft(Item):
+    title: Text
+    theme: str = ""
+    paragraphs: List[Paragraph] = Field(min_length=1)
+
+
+class ClozePassage(ClozeDraft):
+    id: int
+    type: Literal["ClozePassage"]
+    theme: Text
+    difficulty: Difficulty
+    totalBlanks: int
+
+    @model_validator(mode="after")
+    def total_matches(self):
+        check_total(self.totalBlanks, self.paragraphs)
+        return self
+
+
+class GrammarClozeDraft(Item):
+    title: Text
+    paragraphs: List[GrammarParagraph] = Field(min_length=1)
+
+
+class GrammarClozePassage(GrammarClozeDraft):
+    id: int
+    type: Literal["GrammarCloze"]
+    category: Text
+    difficulty: Difficulty
+    totalBlanks: int
+
+    @model_validator(mode="after")
+    def total_matches(self):
+        check_total(self.totalBlanks, self.paragraphs)
+        return self
+
+
+class PassageQuestion(Choice):
+    id: Union[int, str]
+    explanation: str = ""
+
+
+class ComprehensionDraft(Item):
+    title: Text
+    difficulty: Difficulty
+    theme: Text
+    passage: Text
+    questions: List[PassageQuestion] = Field(min_length=1)
+
+
+class ComprehensionPassage(ComprehensionDraft):
+    id: int
+    type: Literal["Comprehension"]
+
+
+class ListeningPassage(Item):
+    id: int
+    title: Text
+    transcript: Dict[str, object] = Field(min_length=1)
+    questions: List[PassageQuestion] = Field(min_length=1)
+
+
+class AnswerPart(Item):
+    type: Literal["locked", "blank"]
+    text: Optional[str] = None
+    expected: Optional[str] = None
+
+
+class SynthesisDraft(Item):
+    question: Text
+    answer: Text
+    trigger_used: str = ""
+
+
+class SynthesisQuestion(SynthesisDraft):
+    id: int
+    type: Literal["synthesis"]
+    category: Text
+    subcategory: Text
+    difficulty: Difficulty
+    answerParts: Optional[List[AnswerPart]] = None
+
+    @model_validator(mode="after")
+    def parts_rebuild_answer(self):
+        if self.answerParts:
+            words = [p.text if p.type == "locked" else p.expected for p in self.answerParts]
+            rebuilt = " ".join(w for w in words if w)
+            if normalise_answer(rebuilt) != normalise_answer(self.answer):
+                raise PydanticCustomError("answer_parts", "answerParts give '{rebuilt}'", {"rebuilt": rebuilt})
+        return self
+
+
+class SpellingWord(Item):
+    word: Text
+    definition: Text
+    example: str = ""
+    difficulty: Difficulty
+    theme: Optional[str] = None
+
+
+SCHEMAS: Dict[str, Type[Item]] = {
+    "vocab-words": VocabWord,
+    "vocab-mcq": VocabMCQ,
+    "grammar-mcq-draft": GrammarQuestion,
+    "grammar-mcq": GrammarMCQ,
+    "vocab-cloze-draft": ClozeDraft,
+    "vocab-cloze": ClozePassage,
+    "grammar-cloze-draft": GrammarClozeDraft,
+    "grammar-cloze": GrammarClozePassage,
+    "comprehension-draft": ComprehensionDraft,
+    "comprehension": ComprehensionPassage,
+    "synthesis-draft": SynthesisDraft,
+    "synthesis": SynthesisQuestion,
+    "spelling": SpellingWord,
+    "listening": ListeningPassage,
+    # Parts of a passage, regenerated on their own by repair_passages.py
+    "grammar-cloze-blank": GrammarBlank,
+    "grammar-cloze-paragraph": GrammarParagraph,
+    "comprehension-question": PassageQuestion,
+}
+# The content_store banks that have a schema
+BANK_SCHEMAS = [bank for bank in BANKS if bank in SCHEMAS]
+
+# JSON Schema keywords Vertex AI's response_schema understands
+RESPONSE_KEYS = ("type", "format", "description", "enum", "minimum", "maximum", "minItems", "maxItems")
+
+Invalid = Dict[int, List[Dict]]  # item position -> its errors
+
+
+@lru_cache(maxsize=None)
+def adapter(schema: str) -> TypeAdapter:
+    """The compiled list validator for a schema, built on first use."""
+    return TypeAdapter(List[SCHEMAS[schema]])
+
+
+def openapi_subset(node: Dict, defs: Dict) -> Dict:
+    """One JSON Schema node as Vertex AI's Schema: refs inlined, unions narrowed, unsupported keys dropped."""
+    if "$ref" in node:
+        return openapi_subset(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+    if "anyOf" in node:
+        branches = [b for b in node["anyOf"] if b.get("type") != "null"]
+        converted = openapi_subset(branches[0], defs)
+        if len(branches) < len(node["anyOf"]):
+            converted["nullable"] = True
+        return converted
+    converted = {key: node[key] for key in RESPONSE_KEYS if key in node}
+    if "const" in node:
+        converted["enum"] = [node["const"]]
+    if "items" in node:
+        converted["items"] = openapi_subset(node["items"], defs)
+    if "properties" in node:
+        converted["properties"] = {name: openapi_subset(prop, defs) for name, prop in node["properties"].items()}
+        converted["propertyOrdering"] = list(node["properties"])
+        # Ask for everything the schema describes; only nullable fields may be left out
+        converted["required"] = [name for name, prop in converted["properties"].items() if not prop.get("nullable")]
+    return converted
+
+
+@lru_cache(maxsize=None)
+def response_schema(schema: str, many: bool = True) -> Dict:
+    """
+    A schema as a Vertex AI response_schema, for structured output: a list of
+    items, or one item with many=False. Vertex takes an OpenAPI subset, so
+    string patterns and lengths are left to validate_batch.
+    """
+    doc = adapter(schema).json_schema()
+    converted = openapi_subset(doc, doc.get("$defs", {}))
+    return converted if many else converted["items"]
+
+
+def group_errors(error: ValidationError) -> Invalid:
+    """A list validation error's entries, by the position of the item they belong to."""
+    invalid: Invalid = {}
+    for entry in error.errors(include_url=False, include_input=False):
+        loc = entry["loc"]
+        invalid.setdefault(loc[0] if loc and isinstance(loc[0], int) else -1, []).append(entry)
+    return invalid
+
+
+def validate_batch(schema: str, items: List) -> Tuple[List, Invalid]:
+    """Validate a whole batch in one call. Returns (valid items, errors of the rest by position)."""
+    try:
+        adapter(schema).validate_python(items)
+        return list(items), {}
+    except ValidationError as error:
+        invalid = group_errors(error)
+    return [item for i, item in enumerate(items) if i not in invalid], invalid
+
+
+def error_key(entry: Dict) -> str:
+    """'type at field.path' with list positions (and the item's own position) left out."""
+    path = ".".join(str(part) for part in entry["loc"][1:] if not isinstance(part, int))
+    return f"{entry['type']} at {path}" if path else entry["type"]
+
+
+def error_counts(invalid: Invalid) -> Counter:
+    return Counter(error_key(entry) for entries in invalid.values() for entry in entries)
+
+
+def accept_valid(schema: str, items: List, rejected: Counter) -> List:
+    """The items that fit the schema; each other item counts once in rejected, under its first error type."""
+    valid, invalid = validate_batch(schema, items)
+    for entries in invalid.values():
+        rejected[f"schema: {entries[0]['type']}"] += 1
+    return valid
+
+
+def describe_invalid(bank: str, items: List, invalid: Invalid, start: int = 0) -> List[Dict]:
+    """
+    One {key, type, path, message} per error, naming items by their bank key
+    (or #position); unlike error_key() the path keeps list positions.
+    """
+    problems = []
+    for position, entries in sorted(invalid.items()):
+        try:
+            key = str(BANKS[bank].key(items[position]))
+        except (IndexError, KeyError, TypeError):
+            key = f"#{start + position}"
+        problems.extend({"key": key, "type": e["type"], "path": ".".join(str(part) for part in e["loc"][1:]),
+                         "message": e["msg"]} for e in entries)
+    return problems
+
+
+def validate_bank(bank: str) -> Dict:
+    """Parse and validate a bank file in one call; items are only loaded in Python to name the bad ones."""
+    started = time.time()
+    with open(bank_path(bank), "rb") as f:
+        raw = f.read()
+    try:
+        count = len(adapter(bank).validate_json(raw))
+        invalid: Invalid = {}
+    except ValidationError as error:
+        invalid = group_errors(error)
+        items = json.loads(raw)
+        count = len(items) if isinstance(items, list) else 0
+    return {
+        "file": BANKS[bank].file,
+        "items": count,
+        "invalid": len(invalid),
+        "seconds": round(time.time() - started, 3),
+        "errors": dict(error_counts(invalid).most_common()),
+        "problems": describe_invalid(bank, items, invalid) if invalid else [],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the src/data question banks against their schemas")
+    parser.add_argument("--bank", choices=BANK_SCHEMAS, action="append",
+                        help="Bank to validate (repeatable; default: all)")
+    parser.add_argument("--json", metavar="PATH", default=None, help="Write the full report as JSON")
+    parser.add_argument("--show", type=int, default=5, help="Invalid items to print per bank (default: 5)")
+    args = parser.parse_args()
+
+    reports = {bank: validate_bank(bank) for bank in args.bank or BANK_SCHEMAS}
+
+    print("=" * 60)
+    print(f"Validated {sum(r['items'] for r in reports.values())} items in "
+          f"{sum(r['seconds'] for r in reports.values()):.3f}s")
+    print("=" * 60)
+    for bank, report in reports.items():
+        status = "OK" if not report["invalid"] else f"{report['invalid']} invalid"
+        print(f"  {bank:<15} {report['items']:>6} items  {status}  ({report['seconds']}s)")
+        for key, count in report["errors"].items():
+            print(f"      {count:>5}  {key}")
+        for problem in report["problems"][:args.show]:
+            print(f"      {problem['key']}: {problem['path'] or problem['type']}: {problem['message']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+        print(f"\nReport saved to: {args.json}")
+    raise SystemExit(0 if not any(r["invalid"] for r in reports.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+Content Store
+One local SQLite file holding every question bank that dataManifest.js
+imports, so merges and dedupes are indexed queries and transactional
+upserts instead of "load the whole JSON, edit it, rewrite it".
+
+Each bank is a set of rows keyed by the item's own identity (id,
+question_number, wordId or word) with the item JSON, its position in the
+exported file and indexed columns for answer, answer word family (see
+word_families.py), difficulty, theme and subunit.
+The src/data/*.json files stay what the app imports and what git tracks:
+export() writes a bank back in exactly the layout its file already uses.
+
+The store follows the files: opening it re-imports any bank whose JSON file
+changed since it was last imported or exported (size and mtime first, the
+sha256 only when those moved) (a git pull, a hand edit, a
+generator writing the file directly). A bank with store changes that were
+not exported yet is never overwritten that way; export or --force import it.
+
+append() adds items to the end of a bank's file without rewriting it, and
+high-water marks record how far an incremental merge has read its source
+(see merge_vocab.py).
+
+Usage:
+    python content_store.py stats
+    python content_store.py import [--bank vocab-mcq] [--force]
+    python content_store.py export [--bank grammar-cloze]
+    python content_store.py dedupe --bank vocab-mcq
+
+    from content_store import open_store
+    with open_store() as store:
+        store.upsert("grammar-cloze", passages)
+        store.export("grammar-cloze")
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from llm_runtime import write_json_atomic
+from word_families import family_key
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "../src/data")
+DEFAULT_STORE_FILE = os.path.join(os.path.dirname(__file__), ".content_store.sqlite")
+
+
+class Bank(NamedTuple):
+    file: str
+    key: Callable[[Dict], Any]
+    answer_field: Optional[str] = None
+    indent: int = 2
+    ensure_ascii: bool = False  # match how the file is written today
+
+
+# Names as in dataManifest.js getQuestionsByType()
+BANKS = {
+    "vocab-mcq": Bank("questions.json", key=lambda q: q["question_number"], answer_field="answer"),
+    "grammar-mcq": Bank("grammar_questions_full.json", key=lambda q: q["question_number"], answer_field="answer"),
+    "vocab-cloze": Bank("cloze_generated.json", key=lambda p: p["id"], ensure_ascii=True),
+    "grammar-cloze": Bank("grammar_cloze_full.json", key=lambda p: p["id"]),
+    "spelling": Bank("spelling_words.json", key=lambda w: w.get("wordId") or w["word"].lower(), answer_field="word"),
+    "synthesis": Bank("synthesis_transformation.json", key=lambda q: q["id"], answer_field="answer"),
+    "comprehension": Bank("comprehension_full.json", key=lambda p: p["id"]),
+    "listening": Bank("listening_passages.json", key=lambda p: p["id"], indent=4),
+}
+
+# Indexed columns; items(), count() and duplicates() filter on these
+COLUMNS = ("answer", "family", "difficulty", "theme", "subunit")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    bank TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    answer TEXT,
+    family TEXT,
+    difficulty INTEGER,
+    theme TEXT,
+    subunit TEXT,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (bank, key)
+);
+CREATE INDEX IF NOT EXISTS idx_items_position ON items(bank, position);
+CREATE INDEX IF NOT EXISTS idx_items_answer ON items(bank, answer);
+CREATE INDEX IF NOT EXISTS idx_items_family ON items(bank, family);
+CREATE INDEX IF NOT EXISTS idx_items_difficulty ON items(bank, difficulty);
+CREATE INDEX IF NOT EXISTS idx_items_theme ON items(bank, theme);
+CREATE INDEX IF NOT EXISTS idx_items_subunit ON items(bank, subunit);
+CREATE TABLE IF NOT EXISTS banks (
+    bank TEXT PRIMARY KEY,
+    file_hash TEXT,
+    file_stat TEXT,
+    dirty INTEGER NOT NULL DEFAULT 0,
+    synced REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS high_water (
+    source TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    size INTEGER,
+    digest TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def normalise(text) -> Optional[str]:
+    return " ".join(str(text).lower().split()) if text is not None else None
+
+
+def file_hash(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_stat(path: str) -> Optional[str]:
+    """Size and mtime, which tell an unchanged file apart without reading it."""
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def bank_path(bank: str) -> str:
+    return os.path.join(DATA_DIR, BANKS[bank].file)
+
+
+def row_for(bank: str, item: Dict) -> Tuple:
+    """(key, answer, family, difficulty, theme, subunit, data) for one item."""
+    spec = BANKS[bank]
+    answer = normalise(item.get(spec.answer_field)) if spec.answer_field else None
+    return (
+        str(spec.key(item)),
+        answer,
+        family_key(answer) if answer else None,
+        item.get("difficulty", item.get("level")),
+        item.get("theme", item.get("category")),
+        item.get("subunit", item.get("subcategory")),
+        json.dumps(item, ensure_ascii=False),
+    )
+
+
+class ContentStore:
+    """All banks in one SQLite file, with indexed lookups and JSON export."""
+
+    def __init__(self, path: str = DEFAULT_STORE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.migrate()
+        self.conn.executescript(SCHEMA)
+
+    def migrate(self):
+        """Stores made before the family, file_stat or size columns: add (and fill) them."""
+        for table, column in (("banks", "file_stat TEXT"), ("high_water", "size INTEGER")):
+            existing = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            if existing and column.split()[0] not in existing:
+                with self.conn:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(items)")]
+        if columns and "family" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE items ADD COLUMN family TEXT")
+                rows = self.conn.execute("SELECT rowid, answer FROM items WHERE answer IS NOT NULL").fetchall()
+                self.conn.executemany("UPDATE items SET family = ? WHERE rowid = ?",
+                                      [(family_key(answer), rowid) for rowid, answer in rows])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # --- keeping the store and the JSON files in step ---
+
+    def sync(self, banks: Optional[Iterable[str]] = None) -> List[str]:
+        """Re-import banks whose JSON file changed outside the store. Returns the banks imported."""
+        imported = []
+        for bank in banks or BANKS:
+            path = bank_path(bank)
+            stat = file_stat(path)
+            row = self.conn.execute("SELECT file_hash, file_stat, dirty FROM banks WHERE bank = ?",
+                                    (bank,)).fetchone()
+            if row is not None and row[1] == stat:
+                continue
+            current = file_hash(path)
+            if row is not None and row[0] is not None and row[0] == current:
+                # Touched (a checkout, a copy) but not changed
+                with self.conn:
+                    self.conn.execute("UPDATE banks SET file_stat = ? WHERE bank = ?", (stat, bank))
+                continue
+            if row is not None and row[2]:
+                raise SystemExit(f"{BANKS[bank].file} changed on disk, but the store has unexported changes "
+                                 f"to {bank}. Export them or run: python content_store.py import --bank {bank} --force")
+            self.import_bank(bank)
+            imported.append(bank)
+        return imported
+
+    def import_bank(self, bank: str, items: Optional[List[Dict]] = None):
+        """Replace a bank with `items` (default: its JSON file) in one transaction."""
+        path = bank_path(bank)
+        if items is None:
+            items = []
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    items = json.load(f)
+        now = time.time()
+        with self.conn:
+            self.conn.execute("DELETE FROM items WHERE bank = ?", (bank,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO items "
+                "(bank, key, position, answer, family, difficulty, theme, subunit, data, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((bank, *row[:1], position, *row[1:], now) for position, row in
+                 enumerate(row_for(bank, item) for item in items)),
+            )
+            self.set_file_hash(bank, file_hash(path), dirty=False, stat=file_stat(path))
+
+    def set_file_hash(self, bank: str, hash_: Optional[str], dirty: bool, stat: Optional[str]):
+        self.conn.execute(
+            "INSERT INTO banks (bank, file_hash, file_stat, dirty, synced) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(bank) DO UPDATE SET file_hash = excluded.file_hash, file_stat = excluded.file_stat, "
+            "dirty = excluded.dirty, synced = excluded.synced",
+            (bank, hash_, stat, int(dirty), time.time()),
+        )
+
+    def export(self, bank: str, path: Optional[str] = None) -> int:
+        """Write a bank to its src/data file (or `path`) in the file's usual layout."""
+        spec = BANKS[bank]
+        path = path or bank_path(bank)
+        items = list(self.items(bank))
+        write_json_atomic(path, items, indent=spec.indent, ensure_ascii=spec.ensure_ascii)
+        if path == bank_path(bank):
+            with self.conn:
+                self.set_file_hash(bank, file_hash(path), dirty=False, stat=file_stat(path))
+        return len(items)
+
+    def append(self, bank: str, items: List[Dict]):
+        """
+        Add new items to the end of the bank and of its file, writing only the
+        new items: the file's closing bracket is replaced by the items in the
+        same layout json.dump would give them. If the bank has unexported
+        changes the whole file is exported instead.
+        """
+        if not items:
+            return
+        spec = BANKS[bank]
+        path = bank_path(bank)
+        row = self.conn.execute("SELECT dirty FROM banks WHERE bank = ?", (bank,)).fetchone()
+        self.sync([bank])
+        inserted, updated = self.upsert(bank, items)
+        if updated or (row and row[0]) or not self.count(bank) > inserted:
+            # Replaced items, unexported changes or an empty file: write it all
+            self.export(bank)
+            return
+        pad = " " * spec.indent
+        text = "".join(
+            ",\n" + pad + json.dumps(item, indent=spec.indent, ensure_ascii=spec.ensure_ascii).replace("\n", "\n" + pad)
+            for item in items
+        )
+        with open(path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            f.seek(max(0, end - 64))
+            tail = f.read()
+            close = tail.rindex(b"]")
+            # Drop the newline before "]" too; the last item keeps its closing brace
+            f.seek(end - len(tail) + len(tail[:close].rstrip()))
+            f.truncate()
+            f.write((text + "\n]").encode("utf-8"))
+        with self.conn:
+            # Hashing would read the whole file again; the stat alone tells the next open it is unchanged
+            self.set_file_hash(bank, None, dirty=False, stat=file_stat(path))
+
+    # --- high-water marks for incremental merges ---
+
+    def high_water(self, source: str) -> Optional[Tuple[int, Optional[int], str]]:
+        """(byte offset, file size, digest of the bytes just before the offset) from the last merge of `source`."""
+        return self.conn.execute("SELECT offset, size, digest FROM high_water WHERE source = ?",
+                                 (source,)).fetchone()
+
+    def set_high_water(self, source: str, offset: int, size: int, digest: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO high_water (source, offset, size, digest, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET offset = excluded.offset, size = excluded.size, "
+                "digest = excluded.digest, updated = excluded.updated",
+                (source, offset, size, digest, time.time()),
+            )
+
+    # --- changes ---
+
+    def upsert(self, bank: str, items: Iterable[Dict]) -> Tuple[int, int]:
+        """
+        Insert or replace items by key in one transaction. Replaced items keep
+        their position; new ones are appended. Returns (inserted, updated).
+        """
+        inserted = updated = 0
+        now = time.time()
+        with self.conn:
+            (end,) = self.conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM items WHERE bank = ?", (bank,)).fetchone()
+            for item in items:
+                key, *fields = row_for(bank, item)
+                cursor = self.conn.execute(
+                    "UPDATE items SET answer = ?, family = ?, difficulty = ?, theme = ?, subunit = ?, data = ?, "
+                    "updated = ? "
+                    "WHERE bank = ? AND key = ?", (*fields, now, bank, key))
+                if cursor.rowcount:
+                    updated += 1
+                    continue
+                self.conn.execute(
+                    "INSERT INTO items (bank, key, position, answer, family, difficulty, theme, subunit, data, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (bank, key, end, *fields, now))
+                end += 1
+                inserted += 1
+            if inserted or updated:
+                self.conn.execute("UPDATE banks SET dirty = 1 WHERE bank = ?", (bank,))
+        return inserted, updated
+
+    def delete(self, bank: str, keys: Iterable[Any]) -> int:
+        with self.conn:
+            deleted = self.conn.executemany(
+                "DELETE FROM items WHERE bank = ? AND key = ?", ((bank, str(key)) for key in keys)).rowcount
+            if deleted:
+                self.conn.execute("UPDATE banks SET dirty = 1 WHERE bank = ?", (bank,))
+        return deleted
+
+    # --- queries ---
+
+    def where(self, bank: str, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        unknown = set(filters) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot filter on {', '.join(sorted(unknown))}; indexed columns are {', '.join(COLUMNS)}")
+        clauses, params = ["bank = ?"], [bank]
+        for column, value in filters.items():
+            clauses.append(f"{column} = ?")
+            if column == "answer":
+                value = normalise(value)
+            elif column == "family":
+                value = family_key(value)
+            params.append(value)
+        return " AND ".join(clauses), params
+
+    def items(self, bank: str, **filters) -> Iterator[Dict]:
+        """Items in file order, optionally filtered by answer, difficulty, theme or subunit."""
+        clause, params = self.where(bank, filters)
+        for (data,) in self.conn.execute(f"SELECT data FROM items WHERE {clause} ORDER BY position", params):
+            yield json.loads(data)
+
+    def count(self, bank: str, **filters) -> int:
+        clause, params = self.where(bank, filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM items WHERE {clause}", params).fetchone()[0]
+
+    def has_answer(self, bank: str, answer: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM items WHERE bank = ? AND answer = ? LIMIT 1",
+                                 (bank, normalise(answer))).fetchone() is not None
+
+    def family_member(self, bank: str, word: str) -> Optional[Tuple[str, str]]:
+        """(answer, key) of the first item whose answer is in `word`'s family, or None."""
+        return self.conn.execute(
+            "SELECT answer, key FROM items WHERE bank = ? AND family = ? ORDER BY position LIMIT 1",
+            (bank, family_key(word))).fetchone()
+
+    def answers(self, bank: str) -> Iterator[str]:
+        for (answer,) in self.conn.execute(
+                "SELECT answer FROM items WHERE bank = ? AND answer IS NOT NULL ORDER BY position", (bank,)):
+            yield answer
+
+    def max_number(self, bank: str) -> int:
+        """Highest numeric key, for banks numbered by question_number or id."""
+        return self.conn.execute("SELECT COALESCE(MAX(CAST(key AS INTEGER)), 0) FROM items WHERE bank = ?",
+                                 (bank,)).fetchone()[0]
+
+    def duplicates(self, bank: str, column: str = "answer") -> List[Tuple[Any, List[str]]]:
+        """(value, keys in file order) for every value of an indexed column held by more than one item."""
+        if column not in COLUMNS:
+            raise ValueError(f"{column} is not an indexed column")
+        rows = self.conn.execute(
+            f"SELECT {column}, key FROM items WHERE bank = ? AND {column} IN ("
+            f"SELECT {column} FROM items WHERE bank = ? AND {column} IS NOT NULL "
+            f"GROUP BY {column} HAVING COUNT(*) > 1) ORDER BY {column}, position", (bank, bank))
+        groups: Dict[Any, List[str]] = {}
+        for value, key in rows:
+            groups.setdefault(value, []).append(key)
+        return list(groups.items())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for bank in BANKS:
+            row = self.conn.execute("SELECT dirty FROM banks WHERE bank = ?", (bank,)).fetchone()
+            levels = dict(self.conn.execute(
+                "SELECT difficulty, COUNT(*) FROM items WHERE bank = ? GROUP BY difficulty ORDER BY difficulty",
+                (bank,)).fetchall())
+            report[bank] = {"items": self.count(bank), "by_difficulty": levels,
+                            "unexported": bool(row and row[0])}
+        return report
+
+
+def open_store(path: str = DEFAULT_STORE_FILE, sync: bool = True,
+               banks: Optional[Iterable[str]] = None) -> ContentStore:
+    """Open the store, first re-importing any bank (of `banks`) whose JSON file changed."""
+    store = ContentStore(path)
+    if sync:
+        for bank in store.sync(banks):
+            print(f"Imported {bank} from {BANKS[bank].file} ({store.count(bank)} items)")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite store for the src/data question banks")
+    parser.add_argument("command", choices=["stats", "import", "export", "dedupe"])
+    parser.add_argument("--bank", choices=list(BANKS), action="append",
+                        help="Bank to work on (repeatable; default: all, except for dedupe)")
+    parser.add_argument("--force", action="store_true", help="import: discard unexported store changes")
+    parser.add_argument("--store", default=DEFAULT_STORE_FILE, help="Store file (default: scripts/.content_store.sqlite)")
+    args = parser.parse_args()
+    banks = args.bank or list(BANKS)
+
+    if args.command == "import":
+        with ContentStore(args.store) as store:
+            if not args.force:
+                store.sync(banks)
+            for bank in banks:
+                if args.force:
+                    store.import_bank(bank)
+                print(f"  {bank:<15} {store.count(bank):>6} items from {BANKS[bank].file}")
+        return
+
+    with open_store(args.store) as store:
+        if args.command == "stats":
+            for bank, info in store.stats().items():
+                if bank in banks:
+                    flag = "  (unexported changes)" if info["unexported"] else ""
+                    print(f"  {bank:<15} {info['items']:>6} items{flag}")
+        elif args.command == "export":
+            for bank in banks:
+                print(f"  {bank:<15} {store.export(bank):>6} items -> {BANKS[bank].file}")
+        elif args.command == "dedupe":
+            if not args.bank:
+                parser.error("dedupe needs --bank")
+            for bank in banks:
+                if not BANKS[bank].answer_field:
+                    print(f"  {bank}: no answer field, skipped")
+                    continue
+                # Keep the first item per answer, as dedupe-questions.js does
+                groups = store.duplicates(bank)
+                removed = store.delete(bank, [key for _, keys in groups for key in keys[1:]])
+                print(f"  {bank}: removed {removed} items repeating {len(groups)} answers")
+                if removed:
+                    store.export(bank)
+
+
+if __name__ == "__main__":
+    main()
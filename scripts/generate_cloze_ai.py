@@ -11,25 +11,37 @@ Features:
 - 3 types of distractors (semantic, syntactic, phonetic)
 
 Usage: python generate_cloze_ai.py
+
+Work-queue mode: start any number of workers (on one host or several) with
+the same --queue file. Jobs are difficulty x theme slices, and passages are
+deduplicated globally by title, including the titles already in the bank.
+The first worker to see the queue finish claims the export and appends the
+queue's passages to the existing output, with IDs continuing after its last
+one; the other workers leave the file alone.
+
+    python generate_cloze_ai.py --queue /shared/cloze_queue.sqlite
+
+With --plan (from plan_generation.py) only the passages the bank is missing
+per level and theme are generated and added to the existing file.
 """
 
+import argparse
+import asyncio
 import json
 import os
-import time
 import random
-from typing import List, Dict, Any
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
 
-# Use google-cloud-aiplatform for Vertex AI
-try:
-    import vertexai
-    from vertexai.generative_models import GenerativeModel, Part
-except ImportError:
-    print("Please install: pip install google-cloud-aiplatform")
-    exit(1)
+from content_schemas import accept_valid, response_schema
+from lexicon_scan import lexicon_problem, to_british
+from llm_runtime import (
+    BatchSizer, Job, JobResult, Journal, QueuedJob, add_batch_args, add_queue_args, add_runtime_args, batch_sizer,
+    Shard, add_plan_args, add_shard_args, load_plan, open_queue, output_path, parse_json_items, run_jobs, run_queue_worker, runner_options,
+    shard_from_args, write_json_atomic,
+)
 
 # Configuration
-PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "vocab-gen-2025-njytim")
-LOCATION = "us-central1"
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "../src/data/cloze_generated.json")
 
 # Themes - Same as Vocab but focused on reading topics
@@ -48,19 +60,18 @@ DIFFICULTY_LEVELS = {
     7: "Junior College (age 17-18): General Paper standard, complex arguments (approx 350 words)"
 }
 
-def init_vertex_ai():
-    """Initialize Vertex AI with project settings."""
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-    # User feedback: Works with 2.0, not 1.5
-    return GenerativeModel("gemini-2.0-flash-exp")
+# User feedback: Works with 2.0, not 1.5
+MODEL_NAME = "gemini-2.0-flash-exp"
 
-def generate_cloze_batch(model: GenerativeModel, difficulty: int, count: int, current_id: int) -> List[Dict]:
-    """Generate a batch of cloze passages."""
+# Top-up requests allowed for a batch that came back short
+MAX_TOPUPS = 3
+
+def build_cloze_prompt(difficulty: int, count: int, theme: str) -> str:
+    """Build the generation prompt for a batch of cloze passages."""
     
     difficulty_desc = DIFFICULTY_LEVELS[difficulty]
-    theme = random.choice(THEMES)
     
-    prompt = f"""Generate {count} unique English cloze passages for Singapore students.
+    return f"""Generate {count} unique English cloze passages for Singapore students.
 
 Difficulty Level: {difficulty} - {difficulty_desc}
 Theme: {theme}
@@ -84,62 +95,175 @@ IMPORTANT:
 Return ONLY a valid JSON array of objects.
 """
 
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
+def parse_cloze_response(text: str) -> List[Dict]:
+    """Parse a batch of passages, salvaging complete ones; an empty batch is retried."""
+    passages = parse_json_items(text)
+    if not passages:
+        raise ValueError("empty batch")
+    return passages
+
+def finalize_passages(passages: List[Dict], difficulty: int, current_id: int, rejected: Counter) -> List[Dict]:
+    """
+    Add IDs, difficulty and blank counts to freshly generated passages, dropping
+    ones that do not fit the vocab-cloze-draft schema (content_schemas.py:
+    paragraphs present, each __n__ marker matching a blank whose answer is
+    one of its options) or that fail the lexicon scan.
+    """
+    valid_passages = []
+    for p in accept_valid("vocab-cloze-draft", passages, rejected):
+        problem = lexicon_problem(p)
+        if problem:
+            rejected[problem] += 1
+            continue
+        to_british(p)
+        p["id"] = current_id
+        p["difficulty"] = difficulty
+        p["type"] = "ClozePassage"
         
-        # Clean up response
-        if text.startswith("```"):
-            parts = text.split("```")
-            if len(parts) >= 2:
-                text = parts[1]
-                if text.startswith("json"):
-                    text = text[4:]
-        text = text.strip()
+        # Flatten/Verify blanks count
+        total_blanks = 0
+        for para in p.get("paragraphs", []):
+            total_blanks += len(para.get("blanks", []))
+            # Add wordId placeholder (optional, can be linked to vocab bank later)
+            for blank in para.get("blanks", []):
+                blank["wordId"] = f"c_{current_id}_{blank['id']}"
         
-        passages = json.loads(text)
+        p["totalBlanks"] = total_blanks
+        valid_passages.append(p)
+        current_id += 1
         
-        # Post-processing to add IDs and structure
-        valid_passages = []
-        for p in passages:
-            p["id"] = current_id
-            p["difficulty"] = difficulty
-            p["type"] = "ClozePassage"
-            
-            # Flatten/Verify blanks count
-            total_blanks = 0
-            for para in p.get("paragraphs", []):
-                total_blanks += len(para.get("blanks", []))
-                # Add wordId placeholder (optional, can be linked to vocab bank later)
-                for blank in para.get("blanks", []):
-                    blank["wordId"] = f"c_{current_id}_{blank['id']}"
-            
-            p["totalBlanks"] = total_blanks
-            valid_passages.append(p)
-            current_id += 1
-            
-        return valid_passages
+    return valid_passages
+
+def cloze_job(difficulty: int, count: int, key: str, theme: Optional[str] = None, topups: int = 0) -> Job:
+    theme = theme or random.choice(THEMES)
+    return Job(
+        key=key,
+        prompt=build_cloze_prompt(difficulty, count, theme),
+        meta={"difficulty": difficulty, "count": count, "theme": theme, "topups": topups},
+        parse=parse_cloze_response,
+        stream=True,
+        schema=response_schema("vocab-cloze-draft"),
+    )
+
+def cloze_jobs(cells: List[Tuple[int, Optional[str], int]], sizer: BatchSizer):
+    """
+    One job per batch of passages for each (difficulty, theme, count) cell,
+    sized when the job is dispatched. A theme of None picks one per batch.
+    """
+    for difficulty, theme, count in cells:
+        prefix = f"cloze-d{difficulty}" if theme is None else f"cloze-d{difficulty}-t{THEMES.index(theme)}"
+        n = 0
+        while n < count:
+            size = min(sizer.size(f"cloze-d{difficulty}"), count - n)
+            yield cloze_job(difficulty, size, f"{prefix}-{n + 1}", theme)
+            n += size
 
-    except Exception as e:
-        print(f"Error generating batch: {e}")
+def passage_title(passage: Dict) -> str:
+    return " ".join(str(passage.get("title", "")).lower().split())
+
+def cloze_queue_plan(targets: Dict[int, int], batch_size: int) -> List[Tuple[str, Dict]]:
+    """Difficulty x theme jobs: each level's target is split evenly across the themes."""
+    plan = []
+    for difficulty, target in targets.items():
+        share, extra = divmod(target, len(THEMES))
+        for t, theme in enumerate(THEMES):
+            count = share + (1 if t < extra else 0)
+            for n in range(0, count, batch_size):
+                key = f"cloze-d{difficulty}-t{t}-{n // batch_size + 1}"
+                plan.append((key, {"difficulty": difficulty, "theme": theme,
+                                   "count": min(batch_size, count - n), "base": key, "topups": 0}))
+    return plan
+
+def load_passages(path: str) -> List[Dict]:
+    """The passages already in `path`, or none if it is missing or unreadable."""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r") as f:
+            passages = json.load(f)
+        print(f"Loaded {len(passages)} existing passages.")
+        return passages
+    except (OSError, ValueError):
+        print("Could not load existing file, starting fresh.")
         return []
 
-def main():
-    print("Initializing Vertex AI (Gemini 1.5 Pro)...")
-    model = init_vertex_ai()
+def run_queue(args: argparse.Namespace, targets: Dict[int, int], output_file: str, existing: List[Dict],
+              shard: Optional[Shard] = None):
+    """
+    Work-queue mode: one of possibly many workers sharing args.queue.
     
-    all_passages = []
+    The titles of the `existing` bank passages are reserved up front, so
+    workers never store a passage the bank already has. Without --shard the
+    queue's passages are appended to them; a shard writes its new passages
+    only and merge_shards.py adds them to the bank.
     
-    # Load existing if file exists
-    if os.path.exists(OUTPUT_FILE):
-        try:
-            with open(OUTPUT_FILE, "r") as f:
-                all_passages = json.load(f)
-                print(f"Loaded {len(all_passages)} existing passages.")
-        except:
-            print("Could not load existing file, starting fresh.")
-            
-    current_id = max([p["id"] for p in all_passages], default=0) + 1
+    A --shard run without --queue works through its share of the plan on a
+    private queue next to its output, which also makes it resumable.
+    """
+    queue = open_queue(args, "cloze", args.queue or f"{output_file}.queue.sqlite")
+    plan = cloze_queue_plan(targets, args.batch_size)
+    if shard is not None:
+        plan = shard.select(plan)
+        print(f"Shard {shard} (seed {shard.seed}): {len(plan)} jobs")
+    added = queue.enqueue_many(plan)
+    queue.reserve(passage_title(p) for p in existing)
+    print(f"Worker {queue.worker_id}: {added} jobs added, {len(existing)} bank titles reserved")
+    print(queue.summary())
+    
+    def make_job(leased: QueuedJob) -> Job:
+        p = leased.payload
+        job = cloze_job(p["difficulty"], p["count"], leased.key, p["theme"], p["topups"])
+        job.meta["base"] = p["base"]
+        return job
+    
+    async def handle(result: JobResult):
+        p = result.job.meta
+        if not result.ok:
+            await asyncio.to_thread(queue.fail, p["queue_id"], str(result.error))
+            return
+        rejected = Counter()
+        # IDs are assigned at export, once the order of the whole bank is known
+        passages = finalize_passages(result.data, p["difficulty"], 0, rejected)
+        stored = await asyncio.to_thread(queue.complete, p["queue_id"], passages, dedup_key=passage_title)
+        rejected["duplicate"] += len(passages) - len(stored)
+        result.report(len(stored), rejected)
+        print(f"  {result.job.key}: {len(stored)}/{p['count']} passages stored")
+        
+        missing = p["count"] - len(stored)
+        if missing > 0 and p["topups"] < MAX_TOPUPS:
+            await asyncio.to_thread(queue.enqueue, f"{p['base']}-r{p['topups'] + 1}",
+                                    {"difficulty": p["difficulty"], "theme": p["theme"], "count": missing,
+                                     "base": p["base"], "topups": p["topups"] + 1})
+    
+    all_stats = run_queue_worker(queue, make_job, handle, model_name=MODEL_NAME, **runner_options(args))
+    print(f"\nThis worker: {sum(s.succeeded for s in all_stats)} jobs completed")
+    print(queue.summary())
+    
+    if not queue.claim_export():
+        print("Another worker writes the output file.")
+        return
+    all_passages = [] if shard is not None else list(existing)
+    current_id = max([p["id"] for p in existing], default=0) + 1
+    new_passages = []
+    for p in queue.items():
+        new_passages.extend(finalize_passages([p], p["difficulty"], current_id + len(new_passages), Counter()))
+    all_passages.extend(new_passages)
+    write_json_atomic(output_file, all_passages)
+    print(f"\n=== COMPLETE: {len(new_passages)} passages generated, {len(all_passages)} in file ===")
+    print(f"Saved to: {output_file}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate cloze passages with Vertex AI")
+    add_batch_args(parser, default=1, maximum=10)
+    add_runtime_args(parser)
+    add_queue_args(parser)
+    add_shard_args(parser)
+    add_plan_args(parser)
+    parser.set_defaults(max_retries=4)
+    args = parser.parse_args()
+    output_file = output_path(args, OUTPUT_FILE)
+    
+    print(f"Initializing Vertex AI ({MODEL_NAME})...")
     
     # Target distribution
     targets = {
@@ -149,49 +273,78 @@ def main():
         6: 100, # O-Level
         7: 100  # A-Level
     }
+    cells = [[difficulty, None, count] for difficulty, count in targets.items()]
     
-    for difficulty, count in targets.items():
-        print(f"\n=== Generating Difficulty {difficulty} ({count} passages) ===")
-        generated_this_level = 0
-        
-        while generated_this_level < count:
-            batch_size = 1 # Reduced from dynamic to 1 for stability
-            print(f"  Generating passage {generated_this_level + 1}/{count}...", end=" ", flush=True)
-            
-            retry_count = 0
-            max_retries = 5
-            
-            while retry_count < max_retries:
-                new_passages = generate_cloze_batch(model, difficulty, batch_size, current_id)
-                
-                if new_passages:
-                    all_passages.extend(new_passages)
-                    generated_this_level += len(new_passages)
-                    current_id += len(new_passages)
-                    print(f"Done. Total: {len(all_passages)}")
-                    
-                    # Save checkpoint
-                    with open(OUTPUT_FILE, "w") as f:
-                        json.dump(all_passages, f, indent=2)
-                    
-                    time.sleep(1) # Cooldown
-                    break
-                else:
-                    retry_wait = 2 ** retry_count
-                    print(f"\n  [Warn] Failed batch. Retrying in {retry_wait}s...", end=" ", flush=True)
-                    time.sleep(retry_wait)
-                    retry_count += 1
+    # With a plan, only the gaps it lists (see plan_generation.py)
+    if args.plan:
+        cells = [[job["difficulty"], job["theme"], job["count"]] for job in load_plan(args.plan, "cloze")]
+        targets = {}
+        for difficulty, _, count in cells:
+            targets[difficulty] = targets.get(difficulty, 0) + count
+        print(f"Plan: {sum(targets.values())} passages in {len(cells)} level x theme cells")
+    
+    shard = shard_from_args(args)
+    if args.queue or shard is not None:
+        # Shards dedup against the bank too, but leave it to merge_shards.py to write it
+        existing = load_passages(output_file)
+        if shard is not None:
+            output_file = shard.output(output_file)
+        run_queue(args, targets, output_file, existing, shard)
+        return
+    
+    # Load existing if file exists
+    all_passages = load_passages(output_file)
+    
+    # Passages accepted by an interrupted run live in the journal until compaction
+    journal = Journal(output_file)
+    resumed = journal.replay()
+    if resumed:
+        all_passages.extend(resumed)
+        print(f"Resuming from journal: {len(resumed)} passages.")
             
-            if retry_count == max_retries:
-                print("\n[Error] Max retries reached for this batch. Skipping...")
-                # Optional: Break completely or just skip?
-                # For now, let's break to avoid infinite loops of failure
-                break
-                
-
+    current_id = max([p["id"] for p in all_passages], default=0) + 1
+    
+    for p in resumed:
+        # Count the passage against its own theme's cell if there is one, else any cell of its level
+        level = [c for c in cells if c[0] == p["difficulty"] and c[2] > 0]
+        cell = next((c for c in level if c[1] == p.get("theme")), level[0] if level else None)
+        if cell is not None:
+            cell[2] -= 1
+    # Starts at 1 passage per call (the old fixed size) and grows while yield per second improves
+    sizer = batch_sizer(args)
+    
+    def handle(result: JobResult):
+        nonlocal current_id
+        difficulty = result.job.meta["difficulty"]
+        if not result.ok:
+            sizer.record(f"cloze-d{difficulty}", result, result.job.meta["count"], 0)
+            return
+        rejected = Counter()
+        new_passages = finalize_passages(result.data, difficulty, current_id, rejected)
+        result.report(len(new_passages), rejected)
+        all_passages.extend(new_passages)
+        current_id += len(new_passages)
+        sizer.record(f"cloze-d{difficulty}", result, result.job.meta["count"], len(new_passages))
+        print(f"  {result.job.key}: Done. Total: {len(all_passages)}")
+        
+        # Checkpoint: append only the new passages
+        journal.extend(new_passages)
+        
+        # A damaged batch only kept some passages; ask again for the rest
+        missing = result.job.meta["count"] - len(new_passages)
+        topups = result.job.meta["topups"]
+        if missing > 0 and topups < MAX_TOPUPS:
+            return [cloze_job(difficulty, missing, f"{result.job.key}-retry", result.job.meta["theme"], topups + 1)]
+    
+    stats = run_jobs(cloze_jobs(cells, sizer), handle, model_name=MODEL_NAME, **runner_options(args))
+    print(f"\n{stats.summary()}")
+    print(sizer.summary())
+    
+    # Write the canonical file once
+    journal.compact(all_passages)
 
     print(f"\n=== COMPLETE: {len(all_passages)} passages generated ===")
-    print(f"Saved to: {OUTPUT_FILE}")
+    print(f"Saved to: {output_file}")
 
 if __name__ == "__main__":
     main()
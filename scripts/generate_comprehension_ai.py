@@ -6,24 +6,25 @@ Target: 100 passages across difficulty levels (1-9)
 - 5-8 questions per passage
 - Variety of question types (literal, inferential, vocabulary)
 
-Usage: python generate_comprehension_ai.py
+Usage: python generate_comprehension_ai.py [--concurrency 5] [--hedge 95]
+
+With --plan (from plan_generation.py) only the passages each level x theme
+is missing are asked for, and the new passages are added to the existing
+file.
 """
 
+import argparse
 import json
 import os
-import time
-from typing import List, Dict
+import random
+from collections import Counter
+from typing import Dict
 
-try:
-    import vertexai
-    from vertexai.generative_models import GenerativeModel
-except ImportError:
-    print("Please install: pip install google-cloud-aiplatform")
-    exit(1)
+from content_schemas import accept_valid, response_schema
+from llm_runtime import Job, add_plan_args, add_runtime_args, collect_results, load_plan, output_path, runner_options
 
 # Configuration
-PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "vocab-gen-2025-njytim")
-LOCATION = "us-central1"
+MODEL_NAME = "gemini-2.0-flash-001"
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "../src/data/comprehension_full.json")
 
 # Themes
@@ -44,22 +45,25 @@ DIFFICULTY_LEVELS = {
     7: "JC/A-Level: Academic texts, 500-600 words, complex analysis"
 }
 
-def init_vertex_ai():
-    """Initialize Vertex AI."""
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-    return GenerativeModel("gemini-2.0-flash-001")
+# Passages per difficulty in a full run
+TARGETS = {
+    2: 10,  # Primary 2-3
+    3: 15,  # Primary 4
+    4: 20,  # Primary 5-6 (PSLE)
+    5: 20,  # Secondary 1-2
+    6: 20,  # Secondary 3-4 (O-Level)
+    7: 15   # JC/A-Level
+}
 
-def generate_passage(model: GenerativeModel, passage_id: int, difficulty: int) -> Dict:
-    """Generate a single comprehension passage."""
+def build_passage_prompt(difficulty: int, theme: str) -> str:
+    """Build the prompt for a single comprehension passage."""
     
-    import random
-    theme = random.choice(THEMES)
     difficulty_desc = DIFFICULTY_LEVELS.get(difficulty, "General")
     
     # Question count based on difficulty
     num_questions = 4 if difficulty <= 3 else 5 if difficulty <= 5 else 6
     
-    prompt = f"""Generate a reading comprehension passage for Singapore students.
+    return f"""Generate a reading comprehension passage for Singapore students.
 
 Difficulty Level: {difficulty}
 Description: {difficulty_desc}
@@ -95,74 +99,64 @@ CRITICAL:
 
 Return ONLY valid JSON, no markdown."""
 
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        # Clean markdown
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        text = text.strip()
-        
-        passage = json.loads(text)
-        
-        # Add metadata
-        passage["id"] = passage_id
-        passage["type"] = "Comprehension"
-        
-        return passage
-        
-    except Exception as e:
-        print(f"  Error generating passage {passage_id}: {e}")
-        return None
-
 def main():
+    parser = argparse.ArgumentParser(description="Generate comprehension passages with Vertex AI")
+    add_runtime_args(parser)
+    add_plan_args(parser)
+    args = parser.parse_args()
+    output_file = output_path(args, OUTPUT_FILE)
+    
     print("=" * 60)
     print("READING COMPREHENSION GENERATION")
     print("Target: 100 passages across difficulty levels")
     print("=" * 60)
     
-    model = init_vertex_ai()
     all_passages = []
+    # (difficulty, theme or None for a random one, count)
+    cells = [(difficulty, None, count) for difficulty, count in TARGETS.items()]
     
-    # Target distribution
-    targets = {
-        2: 10,  # Primary 2-3
-        3: 15,  # Primary 4
-        4: 20,  # Primary 5-6 (PSLE)
-        5: 20,  # Secondary 1-2
-        6: 20,  # Secondary 3-4 (O-Level)
-        7: 15   # JC/A-Level
-    }
+    # With a plan, only the gaps it lists, added to what is already there
+    if args.plan:
+        cells = [(job["difficulty"], job["theme"], job["count"]) for job in load_plan(args.plan, "comprehension")]
+        if os.path.exists(output_file):
+            with open(output_file, encoding="utf-8") as f:
+                all_passages = json.load(f)
+        print(f"Plan: {sum(count for _, _, count in cells)} passages in {len(cells)} level x theme cells, "
+              f"{len(all_passages)} already in {os.path.basename(output_file)}")
     
-    passage_id = 1
+    passages = [(difficulty, theme or random.choice(THEMES)) for difficulty, theme, count in cells for _ in range(count)]
+    jobs = (
+        Job(key=f"comprehension-d{difficulty}-{n}", prompt=build_passage_prompt(difficulty, theme),
+            meta={"difficulty": difficulty, "theme": theme},
+            schema=response_schema("comprehension-draft", many=False))
+        for n, (difficulty, theme) in enumerate(passages, 1)
+    )
+    results = collect_results(jobs, model_name=MODEL_NAME, **runner_options(args))
     
-    for difficulty, count in targets.items():
-        print(f"\n=== Difficulty {difficulty} ({count} passages) ===")
-        
-        for i in range(count):
-            print(f"  Generating passage {i+1}/{count}...", end=" ", flush=True)
-            
-            passage = generate_passage(model, passage_id, difficulty)
-            
-            if passage:
-                all_passages.append(passage)
-                passage_id += 1
-                print(f"Done ({len(passage.get('questions', []))} questions)")
-            else:
-                print("FAILED")
-            
-            time.sleep(1)  # Rate limit
+    passage_id = max((p["id"] for p in all_passages), default=0) + 1
+    for result in results:
+        rejected = Counter()
+        if result.ok and accept_valid("comprehension-draft", [result.data], rejected):
+            passage = result.data
+            passage["id"] = passage_id
+            passage["type"] = "Comprehension"
+            all_passages.append(passage)
+            passage_id += 1
+            result.report(1)
+            print(f"  {result.job.key}: Done ({len(passage.get('questions', []))} questions)")
+        elif result.ok:
+            result.report(0, rejected)
+            print(f"  {result.job.key}: REJECTED ({', '.join(rejected)})")
+        else:
+            print(f"  {result.job.key}: FAILED")
     
     # Save results
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    with open(output_file, "w", encoding="utf-8") as f:
         json.dump(all_passages, f, indent=2, ensure_ascii=False)
     
     print(f"\n{'=' * 60}")
     print(f"COMPLETE: {len(all_passages)} passages generated")
-    print(f"Saved to: {OUTPUT_FILE}")
+    print(f"Saved to: {output_file}")
     print("=" * 60)
     
     # Summary
@@ -3,25 +3,32 @@ Grammar MCQ Generation Script using Vertex AI
 Generates 20 questions per subunit (35 subunits = 700 questions total)
 Uses parallel processing for speed
 
-Usage: python generate_grammar_ai.py
+Usage: python generate_grammar_ai.py [--concurrency 5] [--shard 3/8 --seed 0]
+
+With --shard only that share of the subunits is generated, into
+grammar_questions_full.shard-I-of-N.json; merge_shards.py grammar joins them.
+
+With --plan (from plan_generation.py) only the subunits short of
+QUESTIONS_PER_SUBUNIT are asked for, and the new questions are added to the
+existing file. --plan cannot be combined with --shard, since merge_shards.py
+grammar replaces the file with the shards' questions.
 """
 
+import argparse
 import json
 import os
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
 from typing import List, Dict
 
-try:
-    import vertexai
-    from vertexai.generative_models import GenerativeModel
-except ImportError:
-    print("Please install: pip install google-cloud-aiplatform")
-    exit(1)
+from content_schemas import accept_valid, response_schema
+from lexicon_scan import lexicon_problem, to_british
+from llm_runtime import (
+    Job, add_plan_args, add_runtime_args, add_shard_args, collect_results, load_plan, output_path, parse_json_items,
+    runner_options, shard_from_args,
+)
 
 # Configuration
-PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "vocab-gen-2025-njytim")
-LOCATION = "us-central1"
+MODEL_NAME = "gemini-2.0-flash-001"
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "../src/data/grammar_questions_full.json")
 
 # Grammar subunits with difficulty ranges
@@ -78,17 +85,12 @@ GRAMMAR_SUBUNITS = [
 
 QUESTIONS_PER_SUBUNIT = 20
 
-def init_vertex_ai():
-    """Initialize Vertex AI."""
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-    return GenerativeModel("gemini-2.0-flash-001")
-
-def generate_questions_for_subunit(model: GenerativeModel, subunit: Dict) -> List[Dict]:
-    """Generate questions for a single subunit."""
+def build_subunit_prompt(subunit: Dict, count: int = QUESTIONS_PER_SUBUNIT) -> str:
+    """Build the prompt for a single subunit's questions."""
     
     min_diff, max_diff = subunit["difficulty_range"]
     
-    prompt = f"""Generate {QUESTIONS_PER_SUBUNIT} unique grammar MCQ questions for Singapore students.
+    return f"""Generate {count} unique grammar MCQ questions for Singapore students.
 
 Grammar Topic: {subunit["name"]}
 Category: {subunit["category"]}
@@ -113,62 +115,75 @@ IMPORTANT RULES:
 Return ONLY a valid JSON array, no markdown.
 """
 
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        # Clean markdown if present
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        text = text.strip()
-        
-        questions = json.loads(text)
-        
-        # Validate and add metadata
-        valid_questions = []
-        for q in questions:
-            if q.get("question") and q.get("answer"):
-                q["category"] = subunit["category"]
-                valid_questions.append(q)
-        
-        return valid_questions
-        
-    except Exception as e:
-        print(f"  Error for {subunit['name']}: {e}")
-        return []
+def accept_questions(questions: List[Dict], subunit: Dict, rejected: Counter) -> List[Dict]:
+    """Validate against the grammar-mcq-draft schema and add metadata, counting rejections by reason."""
+    valid_questions = []
+    for q in accept_valid("grammar-mcq-draft", questions, rejected):
+        problem = lexicon_problem(q, answer_field="answer")
+        if problem:
+            rejected[problem] += 1
+        else:
+            to_british(q)
+            q["category"] = subunit["category"]
+            valid_questions.append(q)
+    
+    return valid_questions
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate grammar MCQs with Vertex AI")
+    add_runtime_args(parser)
+    add_shard_args(parser)
+    add_plan_args(parser)
+    args = parser.parse_args()
+    if args.plan and args.shard:
+        parser.error("--plan adds to the existing file and cannot be combined with --shard")
+    output_file = output_path(args, OUTPUT_FILE)
+    subunits = GRAMMAR_SUBUNITS
+    counts = {s["id"]: QUESTIONS_PER_SUBUNIT for s in subunits}
+    all_questions = []
+    
+    # With a plan, only the short subunits, added to what is already there
+    if args.plan:
+        counts = {job["subunit_id"]: job["count"] for job in load_plan(args.plan, "grammar")}
+        subunits = [s for s in subunits if s["id"] in counts]
+        if os.path.exists(output_file):
+            with open(output_file, encoding="utf-8") as f:
+                all_questions = json.load(f)
+        print(f"Plan: {sum(counts.values())} questions for {len(subunits)} subunits, "
+              f"{len(all_questions)} already in {os.path.basename(output_file)}")
+    
+    shard = shard_from_args(args)
+    if shard is not None:
+        subunits = [s for s in subunits if shard.contains(f"grammar-{s['id']}")]
+        output_file = shard.output(output_file)
+    
     print("=" * 60)
     print("GRAMMAR MCQ GENERATION - Parallel Processing")
-    print(f"Target: {len(GRAMMAR_SUBUNITS)} subunits × {QUESTIONS_PER_SUBUNIT} questions = {len(GRAMMAR_SUBUNITS) * QUESTIONS_PER_SUBUNIT} total")
+    if shard is not None:
+        print(f"Shard {shard} (seed {shard.seed})")
+    print(f"Target: {len(subunits)} subunits, {sum(counts[s['id']] for s in subunits)} questions total")
     print("=" * 60)
     
-    model = init_vertex_ai()
-    all_questions = []
-    
-    # Use ThreadPoolExecutor for parallel processing
-    max_workers = 5  # Limit concurrent API calls
-    
-    print(f"\nUsing {max_workers} parallel workers...")
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {
-            executor.submit(generate_questions_for_subunit, model, subunit): subunit
-            for subunit in GRAMMAR_SUBUNITS
-        }
-        
-        completed = 0
-        for future in futures:
-            subunit = futures[future]
-            try:
-                questions = future.result()
-                all_questions.extend(questions)
-                completed += 1
-                print(f"  [{completed}/{len(GRAMMAR_SUBUNITS)}] {subunit['name']}: {len(questions)} questions")
-            except Exception as e:
-                print(f"  [{completed}/{len(GRAMMAR_SUBUNITS)}] {subunit['name']}: FAILED - {e}")
+    print(f"\nUsing {args.concurrency} parallel workers...")
+    
+    jobs = (
+        Job(key=f"grammar-{subunit['id']}", prompt=build_subunit_prompt(subunit, counts[subunit["id"]]),
+            meta={"subunit": subunit}, parse=parse_json_items, stream=True,
+            schema=response_schema("grammar-mcq-draft"))
+        for subunit in subunits
+    )
+    results = collect_results(jobs, model_name=MODEL_NAME, **runner_options(args))
+    
+    for completed, result in enumerate(results, 1):
+        subunit = result.job.meta["subunit"]
+        if result.ok:
+            rejected = Counter()
+            questions = accept_questions(result.data, subunit, rejected)
+            result.report(len(questions), rejected)
+            all_questions.extend(questions)
+            print(f"  [{completed}/{len(subunits)}] {subunit['name']}: {len(questions)} questions")
+        else:
+            print(f"  [{completed}/{len(subunits)}] {subunit['name']}: FAILED - {result.error}")
     
     # Assign question numbers
     print("\nAssigning question numbers...")
@@ -176,12 +191,12 @@ def main():
         q["question_number"] = i + 1
     
     # Save results
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    with open(output_file, "w", encoding="utf-8") as f:
         json.dump(all_questions, f, indent=2, ensure_ascii=False)
     
     print(f"\n{'=' * 60}")
     print(f"COMPLETE: {len(all_questions)} questions generated")
-    print(f"Saved to: {OUTPUT_FILE}")
+    print(f"Saved to: {output_file}")
     print("=" * 60)
     
     # Summary by category
@@ -161,7 +161,7 @@ def main():
     try:
         with open(EXISTING_FILE, "r", encoding="utf-8") as f:
             existing = json.load(f)
-        start_id = len(existing) + 1
+        start_id = max((p["id"] for p in existing), default=0) + 1
         print(f"\nExisting passages: {len(existing)}")
         print(f"Starting ID: {start_id}")
     except:
@@ -8,26 +8,35 @@ Specification:
 - 2 grammar questions per paragraph (10 total/passage)
 - Covers all 35 grammar subunits
 
-Usage: python generate_grammar_cloze_ai.py
+Usage: python generate_grammar_cloze_ai.py [--concurrency 5] [--hedge 95]
+
+With --plan (from plan_generation.py) only the passages each level is
+missing are asked for, and the new passages are added to the existing file.
 """
 
+import argparse
 import json
 import os
-import time
-from typing import List, Dict
+import random
+from collections import Counter
+from typing import Dict
 
-try:
-    import vertexai
-    from vertexai.generative_models import GenerativeModel
-except ImportError:
-    print("Please install: pip install google-cloud-aiplatform")
-    exit(1)
+from content_schemas import accept_valid, response_schema
+from llm_runtime import Job, add_plan_args, add_runtime_args, collect_results, load_plan, output_path, runner_options
 
 # Configuration
-PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "vocab-gen-2025-njytim")
-LOCATION = "us-central1"
+MODEL_NAME = "gemini-2.0-flash-001"
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "../src/data/grammar_cloze_full.json")
 
+# Passages per difficulty in a full run
+TARGETS = {
+    3: 20,  # Primary 3-4
+    4: 20,  # Primary 5-6 (PSLE)
+    5: 20,  # Secondary 1-2
+    6: 20,  # Secondary 3-4 (O-Level)
+    7: 20   # JC (A-Level)
+}
+
 # Grammar subunits (same as MCQ)
 GRAMMAR_SUBUNITS = [
     # Nouns, Pronouns & Determiners
@@ -80,21 +89,15 @@ GRAMMAR_SUBUNITS = [
     {"name": "Participle Clauses", "category": "Advanced Structures"},
 ]
 
-def init_vertex_ai():
-    """Initialize Vertex AI."""
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-    return GenerativeModel("gemini-2.0-flash-001")
-
-def generate_passage(model: GenerativeModel, passage_id: int, difficulty: int) -> Dict:
-    """Generate a single grammar cloze passage with mixed topics."""
+def build_passage_prompt(difficulty: int) -> str:
+    """Build the prompt for a single grammar cloze passage with mixed topics."""
     
     # Select 5 random subunits for this passage (one per paragraph)
-    import random
     selected_subunits = random.sample(GRAMMAR_SUBUNITS, 5)
     
     subunit_list = "\n".join([f"  Paragraph {i+1}: {s['name']}" for i, s in enumerate(selected_subunits)])
     
-    prompt = f"""Generate a coherent grammar cloze passage for Singapore students.
+    return f"""Generate a coherent grammar cloze passage for Singapore students.
 
 Difficulty Level: {difficulty} (1-3: Primary, 4-6: Secondary, 7-9: JC)
 
@@ -127,79 +130,74 @@ CRITICAL:
 
 Return ONLY valid JSON, no markdown."""
 
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        # Clean markdown
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        text = text.strip()
-        
-        passage = json.loads(text)
-        
-        # Add metadata
-        passage["id"] = passage_id
-        passage["type"] = "GrammarCloze"
-        passage["difficulty"] = difficulty
-        passage["category"] = "Mixed Grammar"
-        
-        # Verify and count blanks
-        total_blanks = sum(len(p.get("blanks", [])) for p in passage.get("paragraphs", []))
-        passage["totalBlanks"] = total_blanks
-        
-        return passage
-        
-    except Exception as e:
-        print(f"  Error generating passage {passage_id}: {e}")
-        return None
+def finalize_passage(passage: Dict, passage_id: int, difficulty: int) -> Dict:
+    """Add metadata and count blanks."""
+    passage["id"] = passage_id
+    passage["type"] = "GrammarCloze"
+    passage["difficulty"] = difficulty
+    passage["category"] = "Mixed Grammar"
+    
+    # Verify and count blanks
+    total_blanks = sum(len(p.get("blanks", [])) for p in passage.get("paragraphs", []))
+    passage["totalBlanks"] = total_blanks
+    
+    return passage
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate grammar cloze passages with Vertex AI")
+    add_runtime_args(parser)
+    add_plan_args(parser)
+    args = parser.parse_args()
+    output_file = output_path(args, OUTPUT_FILE)
+    
     print("=" * 60)
     print("GRAMMAR CLOZE GENERATION")
     print("Mixed Topics | 5 Paragraphs × 4 Sentences × 2 Questions")
     print("=" * 60)
     
-    model = init_vertex_ai()
     all_passages = []
+    targets = TARGETS
+    
+    # With a plan, only the short levels, added to what is already there
+    if args.plan:
+        targets = {job["difficulty"]: job["count"] for job in load_plan(args.plan, "grammar-cloze")}
+        if os.path.exists(output_file):
+            with open(output_file, encoding="utf-8") as f:
+                all_passages = json.load(f)
+        print(f"Plan: {sum(targets.values())} passages for {len(targets)} levels, "
+              f"{len(all_passages)} already in {os.path.basename(output_file)}")
+    
+    jobs = (
+        Job(key=f"grammar-cloze-d{difficulty}-{i+1}", prompt=build_passage_prompt(difficulty),
+            meta={"difficulty": difficulty},
+            schema=response_schema("grammar-cloze-draft", many=False))
+        for difficulty, count in targets.items()
+        for i in range(count)
+    )
+    results = collect_results(jobs, model_name=MODEL_NAME, **runner_options(args))
     
-    # Target distribution by difficulty
-    targets = {
-        3: 20,  # Primary 3-4
-        4: 20,  # Primary 5-6 (PSLE)
-        5: 20,  # Secondary 1-2
-        6: 20,  # Secondary 3-4 (O-Level)
-        7: 20   # JC (A-Level)
-    }
-    
-    passage_id = 1
-    
-    for difficulty, count in targets.items():
-        print(f"\n=== Difficulty {difficulty} ({count} passages) ===")
-        
-        for i in range(count):
-            print(f"  Generating passage {i+1}/{count}...", end=" ", flush=True)
-            
-            passage = generate_passage(model, passage_id, difficulty)
-            
-            if passage:
-                all_passages.append(passage)
-                passage_id += 1
-                print(f"Done ({passage.get('totalBlanks', 0)} blanks)")
-            else:
-                print("FAILED")
-            
-            time.sleep(1)  # Rate limit
+    passage_id = max((p["id"] for p in all_passages), default=0) + 1
+    for result in results:
+        rejected = Counter()
+        if result.ok and accept_valid("grammar-cloze-draft", [result.data], rejected):
+            passage = finalize_passage(result.data, passage_id, result.job.meta["difficulty"])
+            all_passages.append(passage)
+            passage_id += 1
+            result.report(1)
+            print(f"  {result.job.key}: Done ({passage.get('totalBlanks', 0)} blanks)")
+        elif result.ok:
+            result.report(0, rejected)
+            print(f"  {result.job.key}: REJECTED ({', '.join(rejected)})")
+        else:
+            print(f"  {result.job.key}: FAILED")
     
     # Save results
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    with open(output_file, "w", encoding="utf-8") as f:
         json.dump(all_passages, f, indent=2, ensure_ascii=False)
     
     print(f"\n{'=' * 60}")
     print(f"COMPLETE: {len(all_passages)} passages generated")
-    print(f"Saved to: {OUTPUT_FILE}")
+    print(f"Saved to: {output_file}")
     print("=" * 60)
 
 if __name__ == "__main__":
@@ -10,9 +10,12 @@ import json
 import os
 import re
 import subprocess
+import time
 from pathlib import Path
 from google.cloud import texttospeech_v1 as texttospeech
 
+from llm_runtime import Telemetry
+
 # Configuration
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_ROOT = SCRIPT_DIR.parent
@@ -239,10 +242,12 @@ def main():
     ]
     
     # Generate each passage
+    telemetry = Telemetry()
     print(f"DEBUG: Found {len(passages)} passages to generate")
     for passage in passages:
         print(f"DEBUG: Starting passage {passage['id']}")
 
+        started = time.monotonic()
         try:
             generate_passage(passage['id'], passage)
         except Exception as e:
@@ -250,7 +255,11 @@ def main():
             print(f"\n{err_msg}")
             with open("generation_errors.log", "a") as err_f:
                 err_f.write(err_msg + "\n")
+            telemetry.write("call", job=f"listening-{passage['id']}", outcome="error",
+                            latency=round(time.monotonic() - started, 3), error=f"{type(e).__name__}: {e}"[:300])
             continue
+        telemetry.write("call", job=f"listening-{passage['id']}", outcome="ok",
+                        latency=round(time.monotonic() - started, 3), prompt_chars=len(passage["script_text"]))
     
     print("\n" + "="*60)
     print(f"COMPLETE: Generated {len(passages)} passages")
@@ -1,3 +1,24 @@
+"""
+Question Bank Generator
+Builds questions.json from the hand-written vocab_bank below: each entry
+becomes an MCQ with its own distractors, topped up from a DistractorIndex.
+
+Streaming mode writes any number of synthetic MCQs (millions are fine)
+straight to disk, one question at a time, for stress-testing data loading,
+QuizSetup filtering and the tooling scripts. Output is NDJSON (one question
+per line) or a JSON array in the same layout as questions.json, chosen by
+the file extension. The same --seed always gives the same file.
+
+Usage:
+    python generate_questions.py
+    python generate_questions.py --scale 10 --output /tmp/questions.10x.json
+    python generate_questions.py --count 1000000 --seed 7 --output /tmp/questions.ndjson
+    python generate_questions.py --count 100000 --output /tmp/hard.ndjson --difficulty-mix 7:1,8:2,9:2
+    python generate_questions.py --count 100000 --output /tmp/themes.json --theme-mix Emotions:3,Nature:1
+"""
+
+import argparse
+import bisect
 import json
 import random
 import os
@@ -1232,29 +1253,143 @@ vocab_bank = [
     }
 ]
 
-def get_distractors(correct_word, bank, count=3):
-    # Try to find words with similar difficulty
-    candidates = [w['word'] for w in bank if w['word'] != correct_word]
-    if len(candidates) < count:
-        return ["optionA", "optionB", "optionC"] # Fallback
-    return random.sample(candidates, count)
+# Suffix -> part of speech, for bank entries without an explicit "pos" field
+POS_SUFFIXES = [
+    ("ly", "adverb"),
+    ("tion", "noun"), ("sion", "noun"), ("ness", "noun"), ("ment", "noun"), ("ity", "noun"),
+    ("ance", "noun"), ("ence", "noun"), ("ism", "noun"), ("ship", "noun"),
+    ("ize", "verb"), ("ise", "verb"), ("ify", "verb"), ("ate", "verb"),
+    ("ous", "adjective"), ("ful", "adjective"), ("less", "adjective"), ("ive", "adjective"),
+    ("able", "adjective"), ("ible", "adjective"), ("ant", "adjective"), ("ent", "adjective"),
+    ("al", "adjective"), ("ic", "adjective"), ("ing", "adjective"), ("ed", "adjective"),
+    ("y", "adjective"),
+]
 
-def generate_questions(original_questions):
-    questions = []
-    
-    # Target: 2000 total
-    target_count = 5000
-    generated_count = 0
-    
-    # Create an extended list to iterate through to ensure we get enough
-    # We will loop enough times to cover the target
-    extended_bank = vocab_bank * (target_count // len(vocab_bank) + 2)
-    random.shuffle(extended_bank)
 
-    for word_data in extended_bank:
-        if generated_count >= target_count:
-            break
-            
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), '../src/data/questions.json')
+
+# Progress line every this many streamed questions
+STREAM_PROGRESS_STEP = 100000
+
+
+def guess_pos(word_data):
+    if word_data.get("pos"):
+        return word_data["pos"]
+    word = word_data["word"].lower()
+    for suffix, pos in POS_SUFFIXES:
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            return pos
+    return "other"
+
+
+class DistractorIndex:
+    """
+    Bank words bucketed by (difficulty, theme, part of speech), built once.
+    sample() draws from the narrowest bucket with enough words and widens to
+    (difficulty, pos), then difficulty, then the whole bank, so each call
+    costs a few dict lookups and a draw of `count` words instead of a scan
+    of the bank.
+    """
+
+    def __init__(self, bank):
+        self.buckets = {}
+        for word_data in bank:
+            word = word_data["word"]
+            diff, theme, pos = word_data["difficulty"], word_data["theme"], guess_pos(word_data)
+            for key in [(diff, theme, pos), (diff, pos), (diff,), ()]:
+                self.buckets.setdefault(key, []).append(word)
+        # Dedupe each bucket once so draws never repeat a word
+        for key, words in self.buckets.items():
+            self.buckets[key] = list(dict.fromkeys(words))
+
+    def sample(self, word_data, count=3, exclude=(), rng=random):
+        """`count` distinct words near word_data, never the answer or anything in `exclude`."""
+        diff, theme, pos = word_data["difficulty"], word_data["theme"], guess_pos(word_data)
+        skip = {word_data["word"], *exclude}
+        for key in [(diff, theme, pos), (diff, pos), (diff,), ()]:
+            words = self.buckets.get(key, [])
+            if len(words) < count + len(skip):
+                continue
+            # At most len(skip) draws can be rejected, so this is one small sample
+            picked = [w for w in rng.sample(words, count + len(skip)) if w not in skip]
+            return picked[:count]
+        return ["optionA", "optionB", "optionC"][:count]  # Fallback
+
+
+def iter_bank(bank, target_count, rng=random):
+    """Yield `target_count` entries in shuffled passes over the bank, without copying it N times."""
+    generated = 0
+    while generated < target_count:
+        for i in rng.sample(range(len(bank)), len(bank)):
+            if generated >= target_count:
+                return
+            yield bank[i]
+            generated += 1
+
+
+def parse_mix(spec, cast=str):
+    """"1:2,5:1" -> {1: 2.0, 5: 1.0}; relative weights, anything unlisted is never drawn."""
+    mix = {}
+    for part in spec.split(","):
+        key, _, weight = part.rpartition(":")
+        if not key:
+            raise argparse.ArgumentTypeError(f"expected key:weight, got '{part}'")
+        mix[cast(key.strip())] = float(weight)
+    return mix
+
+
+def cumulative_weights(items, weight_of):
+    """(items with weight > 0, running totals) for bisect-based weighted draws."""
+    kept, totals, total = [], [], 0.0
+    for item in items:
+        weight = weight_of(item)
+        if weight > 0:
+            total += weight
+            kept.append(item)
+            totals.append(total)
+    return kept, totals
+
+
+def draw(items, totals, rng):
+    return items[bisect.bisect_right(totals, rng.random() * totals[-1], hi=len(items) - 1)]
+
+
+def iter_mixed(bank, target_count, difficulty_mix=None, theme_mix=None, rng=random):
+    """
+    Yield `target_count` entries drawn with replacement: first a difficulty by
+    difficulty_mix, then an entry of that difficulty weighted by theme_mix
+    (split evenly over the theme's entries, so a theme with few words still
+    gets its share). Without a mix every difficulty or theme weighs the same.
+    """
+    levels = {}
+    for word_data in bank:
+        levels.setdefault(word_data["difficulty"], []).append(word_data)
+    per_level = {}
+    for difficulty, entries in levels.items():
+        theme_sizes = {}
+        for word_data in entries:
+            theme_sizes[word_data["theme"]] = theme_sizes.get(word_data["theme"], 0) + 1
+        weight_of = lambda w: (theme_mix.get(w["theme"], 0) if theme_mix else 1.0) / theme_sizes[w["theme"]]
+        kept, totals = cumulative_weights(entries, weight_of)
+        if kept:
+            per_level[difficulty] = (kept, totals)
+    difficulties, difficulty_totals = cumulative_weights(
+        sorted(per_level), lambda d: difficulty_mix.get(d, 0) if difficulty_mix else 1.0)
+    if not difficulties:
+        raise ValueError("The difficulty/theme mix matches no bank entries")
+    for _ in range(target_count):
+        yield draw(*per_level[draw(difficulties, difficulty_totals, rng)], rng)
+
+
+def iter_questions(target_count, difficulty_mix=None, theme_mix=None, rng=random):
+    """Yield MCQs one at a time; memory use does not depend on target_count."""
+    distractors = DistractorIndex(vocab_bank)
+    if difficulty_mix or theme_mix:
+        entries = iter_mixed(vocab_bank, target_count, difficulty_mix, theme_mix, rng)
+    else:
+        entries = iter_bank(vocab_bank, target_count, rng)
+
+    for number, word_data in enumerate(entries, 1):
         word = word_data['word']
         diff = word_data['difficulty']
         theme = word_data['theme']
@@ -1265,13 +1400,13 @@ def generate_questions(original_questions):
         # Construct Question from Example
         q_text = example # The example already has the blank "_____"
         
-        # Options
-        opts = specific_distractors[:]
+        # Options: top up hand-picked distractors from the index
+        opts = specific_distractors[:3]
         if len(opts) < 3:
-            opts = get_distractors(word, vocab_bank)
+            opts += distractors.sample(word_data, 3 - len(opts), exclude=opts, rng=rng)
             
         final_options = opts + [word]
-        random.shuffle(final_options)
+        rng.shuffle(final_options)
         
         # Format options dictionary
         options_dict = {
@@ -1285,7 +1420,7 @@ def generate_questions(original_questions):
         ans_index = final_options.index(word) + 1
         
         new_q = {
-            "question_number": len(questions) + 1,
+            "question_number": number,
             "question": q_text,
             "options": options_dict,
             "answer": word,
@@ -1296,23 +1431,79 @@ def generate_questions(original_questions):
             "example": example.replace("_____", word) # Store full example for reference/tooltips
         }
         
-        questions.append(new_q)
-        generated_count += 1
+        yield new_q
 
-    return questions
 
-if __name__ == "__main__":
-    # Path to src/data/questions.json (output)
-    output_path = os.path.join(os.path.dirname(__file__), '../src/data/questions.json')
-    
-    try:
+def generate_questions(original_questions, target_count=5000):
+    return list(iter_questions(target_count))
+
+
+def write_stream(questions, path):
+    """
+    Write questions as they are produced: NDJSON for .ndjson/.jsonl paths,
+    otherwise a JSON array laid out exactly like json.dump(..., indent=2).
+    """
+    ndjson = path.endswith((".ndjson", ".jsonl"))
+    count = 0
+    with open(path, "w") as f:
+        if not ndjson:
+            f.write("[")
+        for question in questions:
+            if ndjson:
+                f.write(json.dumps(question) + "\n")
+            else:
+                f.write(",\n  " if count else "\n  ")
+                f.write(json.dumps(question, indent=2).replace("\n", "\n  "))
+            count += 1
+            if count % STREAM_PROGRESS_STEP == 0:
+                print(f"  {count:,} questions written...")
+        if not ndjson:
+            f.write("\n]" if count else "]")
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate questions.json, or stream synthetic MCQs for load testing")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--count", type=int, help="Number of questions to stream")
+    size.add_argument("--scale", type=float,
+                      help="Stream this many times the size of the current questions.json (10 = 10x)")
+    parser.add_argument("--output", help="Output path; .ndjson/.jsonl for one question per line, else a JSON array")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed; the same seed gives the same file")
+    parser.add_argument("--difficulty-mix", type=lambda spec: parse_mix(spec, int), default=None,
+                        metavar="D:W,...", help="Relative weight per difficulty, e.g. 1:1,5:2,9:1")
+    parser.add_argument("--theme-mix", type=parse_mix, default=None,
+                        metavar="THEME:W,...", help="Relative weight per theme, e.g. Emotions:3,Nature:1")
+    args = parser.parse_args()
+
+    for mix, field in [(args.difficulty_mix, "difficulty"), (args.theme_mix, "theme")]:
+        unknown = set(mix or {}) - {word_data[field] for word_data in vocab_bank}
+        if unknown:
+            parser.error(f"no bank entries with {field} {', '.join(map(str, sorted(unknown)))}")
+
+    streaming = args.count is not None or args.scale is not None
+    if streaming and not args.output:
+        parser.error("--output is required with --count/--scale so questions.json is not overwritten")
+
+    if not streaming:
+        # Path to src/data/questions.json (output)
+        output_path = args.output or DEFAULT_OUTPUT
         # We generate purely from our new high-quality bank
-        all_questions = generate_questions([])
-        
+        all_questions = list(iter_questions(5000, args.difficulty_mix, args.theme_mix, random.Random(args.seed)))
         with open(output_path, "w") as f:
             json.dump(all_questions, f, indent=2)
-            
         print(f"Successfully generated {len(all_questions)} questions in {output_path}")
-        
-    except Exception as e:
-        print(f"Error: {e}")
+        return
+
+    count = args.count
+    if args.scale is not None:
+        with open(DEFAULT_OUTPUT) as f:
+            count = int(len(json.load(f)) * args.scale)
+    print(f"Streaming {count:,} questions to {args.output}"
+          + (f" (seed {args.seed})" if args.seed is not None else ""))
+    written = write_stream(iter_questions(count, args.difficulty_mix, args.theme_mix,
+                                          random.Random(args.seed)), args.output)
+    print(f"Successfully generated {written:,} questions in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,48 +4,47 @@ Generates 30 questions per subcategory based on the S&T curriculum template.
 
 Target: 24 subcategories × 30 questions = 720 total questions
 
-Usage: python generate_synthesis_ai.py
+Usage: python generate_synthesis_ai.py [--concurrency 5] [--shard 3/8 --seed 0]
+
+With --plan (from plan_generation.py) only the subcategories short of
+QUESTIONS_PER_SUBCATEGORY are asked for, and the new questions are added to
+the existing file. --plan cannot be combined with --shard, since
+merge_shards.py replaces the file with the shards' questions.
 """
 
+import argparse
 import json
 import os
-import time
-from typing import List, Dict
+from collections import Counter
+from typing import List, Dict, Any
 
-try:
-    import vertexai
-    from vertexai.generative_models import GenerativeModel
-except ImportError:
-    print("Please install: pip install google-cloud-aiplatform")
-    exit(1)
+from content_schemas import accept_valid, response_schema
+from llm_runtime import (
+    Job, add_plan_args, add_runtime_args, add_shard_args, collect_results, load_plan, output_path, parse_json_items,
+    runner_options, shard_from_args,
+)
 
 # Configuration
-PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "vocab-gen-2025-njytim")
-LOCATION = "us-central1"
+MODEL_NAME = "gemini-2.0-flash-exp"
 TEMPLATE_FILE = os.path.join(os.path.dirname(__file__), "synthesis_template.json")
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "../src/data/synthesis_transformation.json")
-
-def init_vertex_ai():
-    """Initialize Vertex AI."""
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-    return GenerativeModel("gemini-2.0-flash-exp")
+QUESTIONS_PER_SUBCATEGORY = 30
 
 def load_template():
     """Load the S&T structure template."""
     with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def generate_questions_for_subcategory(
-    model: GenerativeModel,
+def build_subcategory_prompt(
     category_name: str,
     subcategory: Dict,
-    num_questions: int = 30
-) -> List[Dict]:
-    """Generate 30 questions for a specific subcategory."""
+    num_questions: int = QUESTIONS_PER_SUBCATEGORY
+) -> str:
+    """Build the prompt for `num_questions` questions in a specific subcategory."""
     
     triggers_str = ", ".join(f'"{t}"' for t in subcategory["triggers"])
     
-    prompt = f"""Generate {num_questions} Synthesis & Transformation questions for Singapore students.
+    return f"""Generate {num_questions} Synthesis & Transformation questions for Singapore students.
 
 **Category:** {category_name}
 **Subcategory:** {subcategory["sub_category_name"]}
@@ -90,43 +89,30 @@ Return ONLY a JSON array of {num_questions} objects, each with:
 - Answers must be grammatically perfect for Singapore English standards
 """
 
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        # Clean markdown if present
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        text = text.strip()
-        
-        questions = json.loads(text)
-        
-        # Ensure it's a list
-        if not isinstance(questions, list):
-            print(f"    Warning: Response not a list, wrapping...")
-            questions = [questions]
-        
-        # Add metadata
-        for q in questions:
-            q["type"] = "synthesis"
-            q["category"] = category_name
-            q["subcategory"] = subcategory["sub_category_name"]
-            q["difficulty"] = subcategory["difficulty"]
-            q["logic"] = subcategory["logic"]
-        
-        return questions
-        
-    except json.JSONDecodeError as e:
-        print(f"    JSON Error: {e}")
-        print(f"    Response text: {text[:200]}...")
-        return []
-    except Exception as e:
-        print(f"    Error: {e}")
-        return []
+def add_metadata(questions: List[Dict], category_name: str, subcategory: Dict) -> List[Dict]:
+    """Stamp category, subcategory, difficulty and logic onto each question."""
+    for q in questions:
+        q["type"] = "synthesis"
+        q["category"] = category_name
+        q["subcategory"] = subcategory["sub_category_name"]
+        q["difficulty"] = subcategory["difficulty"]
+        q["logic"] = subcategory["logic"]
+    
+    return questions
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate synthesis & transformation questions with Vertex AI")
+    add_runtime_args(parser)
+    add_shard_args(parser)
+    add_plan_args(parser)
+    args = parser.parse_args()
+    if args.plan and args.shard:
+        parser.error("--plan adds to the existing file and cannot be combined with --shard")
+    output_file = output_path(args, OUTPUT_FILE)
+    shard = shard_from_args(args)
+    if shard is not None:
+        output_file = shard.output(output_file)
+    
     print("=" * 70)
     print("SYNTHESIS &TRANSFORMATION QUESTION GENERATION")
     print("Target: 24 subcategories × 30 questions = 720 total")
@@ -134,52 +120,74 @@ def main():
     
     # Load template
     template = load_template()
-    model = init_vertex_ai()
     all_questions = []
-    question_id = 1
+    counts = {sub["sub_category_name"]: QUESTIONS_PER_SUBCATEGORY
+              for category in template["categories"] for sub in category["sub_categories"]}
     
-    total_subcats = sum(len(cat["sub_categories"]) for cat in template["categories"])
-    current_subcat = 0
+    # With a plan, only the short subcategories, added to what is already there
+    if args.plan:
+        counts = {job["subcategory"]: job["count"] for job in load_plan(args.plan, "synthesis")}
+        if os.path.exists(output_file):
+            with open(output_file, encoding="utf-8") as f:
+                all_questions = json.load(f)
+        print(f"Plan: {sum(counts.values())} questions for {len(counts)} subcategories, "
+              f"{len(all_questions)} already in {os.path.basename(output_file)}")
+    question_id = max((q["id"] for q in all_questions), default=0) + 1
     
-    for category in template["categories"]:
-        cat_name = category["category_name"]
-        print(f"\n{'=' * 70}")
-        print(f"CATEGORY: {cat_name}")
-        print(f"{'=' * 70}")
+    subcategories = [
+        (category, subcategory)
+        for category in template["categories"]
+        for subcategory in category["sub_categories"]
+        if subcategory["sub_category_name"] in counts
+        and (shard is None or shard.contains(subcategory["sub_category_name"]))
+    ]
+    total_subcats = len(subcategories)
+    if shard is not None:
+        print(f"Shard {shard} (seed {shard.seed}): {total_subcats} subcategories")
+    
+    jobs = (
+        Job(
+            key=subcategory["sub_category_name"],
+            prompt=build_subcategory_prompt(category["category_name"], subcategory,
+                                            num_questions=counts[subcategory["sub_category_name"]]),
+            meta={"category": category["category_name"], "subcategory": subcategory},
+            parse=parse_json_items,  # wraps a single object in a list
+            stream=True,
+            schema=response_schema("synthesis-draft"),
+        )
+        for category, subcategory in subcategories
+    )
+    print(f"\nGenerating {sum(counts[sub['sub_category_name']] for _, sub in subcategories)} questions "
+          f"for {total_subcats} subcategories...")
+    results = collect_results(jobs, model_name=MODEL_NAME, **runner_options(args))
+    
+    for current_subcat, result in enumerate(results, 1):
+        subcategory = result.job.meta["subcategory"]
+        print(f"[{current_subcat}/{total_subcats}] {subcategory['sub_category_name']} "
+              f"(Difficulty: {subcategory['difficulty']}/9)", end=" ")
         
-        for subcategory in category["sub_categories"]:
-            current_subcat += 1
-            subcat_name = subcategory["sub_category_name"]
-            difficulty = subcategory["difficulty"]
-            
-            print(f"\n[{current_subcat}/{total_subcats}] {subcat_name} (Difficulty: {difficulty}/9)")
-            print(f"  Generating 30 questions...", end=" ", flush=True)
-            
-            questions = generate_questions_for_subcategory(
-                model, cat_name, subcategory, num_questions=30
-            )
-            
-            if questions:
-                # Assign global IDs
-                for q in questions:
-                    q["id"] = question_id
-                    question_id += 1
-                
-                all_questions.extend(questions)
-                print(f"✓ Done ({len(questions)} questions)")
-            else:
-                print("✗ FAILED")
+        if result.ok and result.data:
+            rejected = Counter()
+            questions = accept_valid("synthesis-draft", result.data, rejected)
+            questions = add_metadata(questions, result.job.meta["category"], subcategory)
+            # Assign global IDs
+            for q in questions:
+                q["id"] = question_id
+                question_id += 1
             
-            # Rate limiting
-            time.sleep(2)
+            all_questions.extend(questions)
+            result.report(len(questions), rejected)
+            print(f"✓ Done ({len(questions)} questions)")
+        else:
+            print("✗ FAILED")
     
     # Save results
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    with open(output_file, "w", encoding="utf-8") as f:
         json.dump(all_questions, f, indent=2, ensure_ascii=False)
     
     print(f"\n{'=' * 70}")
     print(f"COMPLETE: {len(all_questions)} questions generated")
-    print(f"Saved to: {OUTPUT_FILE}")
+    print(f"Saved to: {output_file}")
     print("=" * 70)
     
     # Summary by category
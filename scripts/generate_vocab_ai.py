@@ -2,30 +2,52 @@
 Vocab Generation Script using Vertex AI
 Generates 8000 unique vocabulary words with:
 - Multiple themes per word
-- Difficulty levels 1-9 (Primary to JC)
+- Difficulty levels 1-9 (Primary to JC), 10 on request via --plan
 - Definition, example sentence, and 3 distractors
 
-Usage: python generate_vocab_ai.py
+Usage: python generate_vocab_ai.py [--concurrency 8] [--batch-size 100]
+
+Every request asks for one lexical slice (difficulty x initial letters x part
+of speech, see lexical_slices.py) and only lists the bank words that slice
+could repeat, so the duplicate rate stays flat as the bank fills up. Slices
+that keep returning duplicates are retired.
+
+Work-queue mode spreads one run over several processes or hosts: start any
+number of workers with the same --queue file. Jobs are lexical slices, and
+words are deduplicated globally through the queue's reservation table. A
+short batch is topped up, moving to another slice of its level once its own
+is used up, until the words are found or MAX_TOPUP_ROUNDS is reached. The
+first worker to see the queue finish claims the export and writes the
+output file, with any shortfall against the targets.
+
+    python generate_vocab_ai.py --queue /shared/vocab_queue.sqlite --concurrency 8
+
+With --plan (from plan_generation.py) only the missing words per level and
+theme are generated, avoiding everything already in questions.json; merge
+them in with merge_vocab.py.
 """
 
+import argparse
+import asyncio
 import json
 import os
-import time
-import random
-from typing import List, Dict, Any
-
-# Use google-cloud-aiplatform for Vertex AI
-try:
-    import vertexai
-    from vertexai.generative_models import GenerativeModel, Part
-except ImportError:
-    print("Please install: pip install google-cloud-aiplatform")
-    exit(1)
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
+
+from content_schemas import accept_valid, response_schema
+from lexical_slices import RETIRE_DUPLICATE_RATE, Slice, SliceBoard, plan_slices
+from lexicon_scan import lexicon_problem, to_british
+from llm_runtime import (
+    BatchSizer, Job, JobResult, Journal, QueuedJob, add_batch_args, add_plan_args, add_queue_args, add_runtime_args,
+    batch_sizer, Shard, add_shard_args, load_plan, open_queue, output_path, parse_json_items, run_jobs,
+    run_queue_worker, runner_options, shard_from_args, write_json_atomic,
+)
+from word_families import FamilyIndex, family_key
 
 # Configuration
-PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "vocab-gen-2025-njytim")
-LOCATION = "us-central1"
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "../src/data/vocab_8000.json")
+# The merged bank (see merge_vocab.py); --plan runs avoid its words
+BANK_FILE = os.path.join(os.path.dirname(__file__), "../src/data/questions.json")
 
 # Themes - comprehensive list for Singapore syllabus
 THEMES = [
@@ -57,21 +79,31 @@ DIFFICULTY_LEVELS = {
     6: "Secondary 1-2 (age 13-14): Secondary level (scrutinize, paramount, juxtapose)",
     7: "Secondary 3-4 (age 15-16): O-Level (ubiquitous, exacerbate, pragmatic)",
     8: "JC 1 (age 17): A-Level prep (perfunctory, inexorable, vicissitudes)",
-    9: "JC 2 (age 18): Advanced (sesquipedalian, perspicacious, antediluvian)"
+    9: "JC 2 (age 18): Advanced (sesquipedalian, perspicacious, antediluvian)",
+    10: "Beyond JC (age 18+): Rare and literary (pusillanimous, recondite, tergiversate)"
 }
 
-def init_vertex_ai():
-    """Initialize Vertex AI with project settings."""
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
-    return GenerativeModel("gemini-2.0-flash-001")
+MODEL_NAME = "gemini-2.0-flash-001"
 
-def generate_vocab_batch(model: GenerativeModel, difficulty: int, count: int, existing_words: set) -> List[Dict]:
-    """Generate a batch of vocabulary words using Vertex AI."""
+# Queue mode: move a short batch to another slice after this many batches in a row with no new words
+MAX_EMPTY_BATCHES = 5
+
+# Queue mode: give up on a batch's missing words after this many top-ups
+MAX_TOPUP_ROUNDS = 12
+
+# Smallest request sent to a slice that is already at its share of the level
+MIN_SLICE_REQUEST = 5
+
+def build_vocab_prompt(difficulty: int, count: int, exclude: List[str], theme: Optional[str] = None,
+                       slice_: Optional[Slice] = None) -> str:
+    """Build the generation prompt for one batch of vocabulary words."""
     
     difficulty_desc = DIFFICULTY_LEVELS[difficulty]
     themes_str = ", ".join(THEMES)
+    focus = f"\n- Choose words that are commonly used when talking about {theme}" if theme else ""
+    constraint = f"\n{slice_.constraint()}" if slice_ else ""
     
-    prompt = f"""Generate {count} unique English vocabulary words for Singapore students.
+    return f"""Generate {count} unique English vocabulary words for Singapore students.
 
 Difficulty Level: {difficulty} - {difficulty_desc}
 
@@ -83,10 +115,10 @@ For EACH word, provide a JSON object with:
 - "distractors": array of exactly 3 wrong answer options (semantically related but incorrect)
 
 IMPORTANT:
-- Words must be UNIQUE (not in this list: {', '.join(list(existing_words)[:50]) or 'none yet'})
+- Words must be UNIQUE (not in this list: {', '.join(exclude) or 'none yet'}){constraint}
 - Each word should have realistic, contextual examples
 - Distractors should be plausible but clearly wrong
-- Themes should accurately reflect word usage
+- Themes should accurately reflect word usage{focus}
 
 Return ONLY a valid JSON array of objects, no markdown formatting.
 Example format:
@@ -101,45 +133,273 @@ Example format:
 ]
 """
 
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
+def accept_vocab_words(words: List[Dict], difficulty: int, existing_words: FamilyIndex,
+                       rejected: Counter) -> List[Dict]:
+    """
+    Keep only words whose family is not already in existing_words, normalising
+    fields and counting rejections ("devised" is rejected once "devise" is in).
+    Banned words and American headwords are rejected; other American
+    spellings are respelt (lexicon_scan.py). Entries that do not fit the
+    vocab-words schema are rejected first (content_schemas.py).
+    """
+    valid_words = []
+    for w in accept_valid("vocab-words", words, rejected):
+        problem = lexicon_problem(w, answer_field="word")
+        existing = existing_words.find(w["word"])
+        if problem:
+            rejected[problem] += 1
+        elif existing is not None:
+            rejected["duplicate" if existing == w["word"].lower().strip() else "same family"] += 1
+        else:
+            to_british(w)
+            w["word"] = w["word"].lower()
+            w["difficulty"] = difficulty
+            # wordId will be assigned after collection (based on final index)
+            # Ensure themes is a list
+            if isinstance(w.get("themes"), str):
+                w["themes"] = [w["themes"]]
+            valid_words.append(w)
+            existing_words.add(w["word"])
+    
+    return valid_words
+
+class VocabRun:
+    """
+    Shared state for one generation run.
+    
+    Jobs are created on demand from the per-level shortfall, so the number of
+    words asked for never exceeds what is still missing. Each job goes to the
+    least-filled open slice of its level; a batch that comes back short
+    (duplicates, failures) is topped up by a follow-up job, and a level stops
+    once all its slices are retired.
+    """
+    
+    def __init__(self, targets: Dict[int, int], sizer: BatchSizer, journal: Journal,
+                 bank_words: List[Tuple[str, int]] = (), theme_gaps: Optional[Dict[int, Counter]] = None):
+        self.targets = targets
+        self.sizer = sizer
+        self.journal = journal
+        self.theme_gaps = theme_gaps
+        self.board = SliceBoard(targets, THEMES)
+        self.all_words = []
+        self.existing_words = FamilyIndex()
+        self.accepted = {d: 0 for d in targets}
+        self.outstanding = {d: 0 for d in targets}  # words asked for but not yet returned
         
-        # Clean up response (remove markdown code blocks if present)
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        text = text.strip()
+        # Resume from the journal of an interrupted run
+        for w in journal.replay():
+            self.all_words.append(w)
+            self.existing_words.add(w["word"])
+            self.accepted[w["difficulty"]] = self.accepted.get(w["difficulty"], 0) + 1
+        self.board.add_existing((w["word"], w["difficulty"]) for w in self.all_words)
         
-        words = json.loads(text)
+        # Words already in the merged bank are excluded but do not count towards the targets
+        for word, _ in bank_words:
+            self.existing_words.add(word)
+        self.board.add_existing(bank_words, credit=False)
+    
+    def shortfall(self, difficulty: int) -> int:
+        if not self.board.open_count(difficulty):
+            return 0
+        return self.targets[difficulty] - self.accepted[difficulty] - self.outstanding[difficulty]
+    
+    def make_job(self, difficulty: int) -> Job:
+        slice_ = self.board.next_slice(difficulty)
+        room = max(slice_.target - slice_.accepted - slice_.outstanding, MIN_SLICE_REQUEST)
+        count = min(self.sizer.size(f"vocab-d{difficulty}"), self.shortfall(difficulty), room)
+        self.outstanding[difficulty] += count
+        slice_.outstanding += count
+        theme = self.next_theme(difficulty, count) if self.theme_gaps else self.board.theme_for(slice_)
+        return Job(
+            key=f"vocab-d{difficulty}",
+            prompt=build_vocab_prompt(difficulty, count, self.board.exclusions(slice_), theme, slice_),
+            meta={"difficulty": difficulty, "count": count, "slice": slice_.key, "theme": theme},
+            parse=parse_json_items,
+            stream=True,
+            schema=response_schema("vocab-words"),
+        )
+    
+    def next_theme(self, difficulty: int, count: int) -> Optional[str]:
+        """The planned theme this level is furthest behind on."""
+        gaps = self.theme_gaps.get(difficulty)
+        if not gaps:
+            return None
+        theme = max(gaps, key=gaps.get)
+        gaps[theme] -= count
+        return theme
+    
+    def jobs(self):
+        """Round-robin across levels so concurrent requests span difficulties."""
+        while True:
+            open_levels = [d for d in self.targets if self.shortfall(d) > 0]
+            if not open_levels:
+                return
+            for difficulty in open_levels:
+                if self.shortfall(difficulty) > 0:
+                    yield self.make_job(difficulty)
+    
+    def handle(self, result: JobResult) -> List[Job]:
+        difficulty = result.job.meta["difficulty"]
+        slice_ = self.board.by_key[result.job.meta["slice"]]
+        self.outstanding[difficulty] -= result.job.meta["count"]
+        slice_.outstanding -= result.job.meta["count"]
         
-        # Validate and add difficulty + wordId
-        valid_words = []
-        for w in words:
-            if w.get("word") and w["word"].lower() not in existing_words:
-                w["word"] = w["word"].lower()
-                w["difficulty"] = difficulty
-                # wordId will be assigned after collection (based on final index)
-                # Ensure themes is a list
-                if isinstance(w.get("themes"), str):
-                    w["themes"] = [w["themes"]]
-                valid_words.append(w)
-                existing_words.add(w["word"])
+        batch = []
+        retired = False
+        if result.ok:
+            rejected = Counter()
+            batch = accept_vocab_words(result.data, difficulty, self.existing_words, rejected)
+            result.report(len(batch), rejected, slice=slice_.key)
+            duplicates = rejected["duplicate"] + rejected["same family"]
+            retired = self.board.record(slice_, len(result.data), duplicates, [w["word"] for w in batch])
+        self.all_words.extend(batch)
+        self.journal.extend(batch)
+        self.accepted[difficulty] += len(batch)
+        self.sizer.record(result.job.key, result, result.job.meta["count"], len(batch))
+        print(f"  [{slice_.key}] Got {len(batch)} words. "
+              f"Level: {self.accepted[difficulty]}/{self.targets[difficulty]} Total: {len(self.all_words)}")
         
-        return valid_words
+        if retired:
+            print(f"  [{slice_.key}] Mostly duplicates ({slice_.duplicate_rate:.0%}), retiring this slice; "
+                  f"{self.board.open_count(difficulty)} left for D{difficulty}")
         
-    except Exception as e:
-        print(f"Error generating batch: {e}")
+        if self.shortfall(difficulty) > 0:
+            return [self.make_job(difficulty)]
         return []
 
+def vocab_queue_plan(targets: Dict[int, int], batch_size: int,
+                     theme_gaps: Optional[Dict[int, Counter]] = None) -> List[Tuple[str, Dict]]:
+    """
+    One job per lexical slice (more if its share exceeds the batch size).
+    Themes are assigned in turn, or with a plan's theme_gaps to the theme the
+    level is furthest behind on, so every worker builds the same plan.
+    """
+    gaps = {d: Counter(g) for d, g in (theme_gaps or {}).items()}
+    plan = []
+    for i, slice_ in enumerate(plan_slices(targets)):
+        for n in range(0, slice_.target, batch_size):
+            count = min(batch_size, slice_.target - n)
+            if theme_gaps is None:
+                theme = THEMES[i % len(THEMES)]
+            else:
+                level = gaps[slice_.difficulty]
+                theme = max(level, key=level.get)
+                level[theme] -= count
+            key = f"vocab-{slice_.key}-{n // batch_size + 1}"
+            plan.append((key, {"difficulty": slice_.difficulty, "slice": slice_.key, "theme": theme,
+                               "count": count, "base": key, "round": 0, "planned": theme_gaps is not None}))
+    return plan
+
+def run_queue(args: argparse.Namespace, targets: Dict[int, int], output_file: str, shard: Optional[Shard] = None,
+              bank_words: List[Tuple[str, int]] = (), theme_gaps: Optional[Dict[int, Counter]] = None):
+    """
+    Work-queue mode: one of possibly many workers sharing args.queue.
+    
+    With a plan, the families of `bank_words` (questions.json) are reserved
+    so no worker stores them again, and jobs follow the plan's theme_gaps.
+    
+    A --shard run without --queue works through its share of the plan on a
+    private queue next to its output, which also makes it resumable.
+    """
+    queue = open_queue(args, "vocab", args.queue or f"{output_file}.queue.sqlite")
+    plan = vocab_queue_plan(targets, args.batch_size, theme_gaps)
+    if shard is not None:
+        plan = shard.select(plan)
+        print(f"Shard {shard} (seed {shard.seed}): {len(plan)} jobs")
+    added = queue.enqueue_many(plan)
+    queue.reserve(family_key(word) for word, _ in bank_words)
+    stored_words = queue.items()
+    existing_words = FamilyIndex([w["word"] for w in stored_words] + [word for word, _ in bank_words])
+    print(f"Worker {queue.worker_id}: {added} jobs added, {len(stored_words)} words already stored")
+    print(queue.summary())
+    # Exclusions come from the words stored so far; the reservation table catches the rest
+    board = SliceBoard(targets, THEMES)
+    board.add_existing((w["word"], w["difficulty"]) for w in stored_words)
+    board.add_existing(bank_words, credit=False)
+    
+    def make_job(leased: QueuedJob) -> Job:
+        p = leased.payload
+        slice_ = board.by_key[p["slice"]]
+        return Job(
+            key=leased.key,
+            prompt=build_vocab_prompt(p["difficulty"], p["count"], board.exclusions(slice_), p["theme"], slice_),
+            meta=dict(p),
+            parse=parse_json_items,
+            stream=True,
+            schema=response_schema("vocab-words"),
+        )
+    
+    async def handle(result: JobResult):
+        p = result.job.meta
+        if not result.ok:
+            await asyncio.to_thread(queue.fail, p["queue_id"], str(result.error))
+            return
+        rejected = Counter()
+        batch = accept_vocab_words(result.data, p["difficulty"], existing_words, rejected)
+        # Reserve word families, so two workers cannot store "run" and "running"
+        stored = await asyncio.to_thread(queue.complete, p["queue_id"], batch,
+                                         dedup_key=lambda w: family_key(w["word"]))
+        rejected["duplicate"] += len(batch) - len(stored)
+        result.report(len(stored), rejected, slice=p["slice"])
+        duplicates = rejected["duplicate"] + rejected["same family"]
+        board.record(board.by_key[p["slice"]], len(result.data), duplicates, [w["word"] for w in stored])
+        print(f"  [{result.job.key}] Got {len(stored)}/{p['count']} words")
+        
+        # Top up a short batch under a new key. A slice that keeps coming back empty or is
+        # mostly returning words we already have is used up: the rest moves to another slice
+        missing = p["count"] - len(stored)
+        if missing <= 0:
+            return
+        slice_ = board.by_key[p["slice"]]
+        streak = 0 if stored else p.get("empty_streak", 0) + 1
+        exhausted = bool(result.data) and duplicates / len(result.data) >= RETIRE_DUPLICATE_RATE
+        if streak >= MAX_EMPTY_BATCHES or exhausted:
+            slice_.retired = True
+            slice_, streak = board.next_slice(p["difficulty"]), 0
+        if slice_ is None or p["round"] >= MAX_TOPUP_ROUNDS:
+            reason = "no open slices left" if slice_ is None else f"{MAX_TOPUP_ROUNDS} top-ups"
+            print(f"  [{result.job.key}] Giving up on {missing} words at D{p['difficulty']}: {reason}")
+            return
+        payload = {k: v for k, v in p.items() if k != "queue_id"}
+        # A planned theme is kept: the plan asked for this many words on it
+        theme = p["theme"] if p.get("planned") else THEMES[(THEMES.index(p["theme"]) + 1) % len(THEMES)]
+        payload.update(count=missing, round=p["round"] + 1, empty_streak=streak, theme=theme, slice=slice_.key)
+        await asyncio.to_thread(queue.enqueue, f"{p['base']}-r{p['round'] + 1}", payload)
+    
+    all_stats = run_queue_worker(queue, make_job, handle, model_name=MODEL_NAME, **runner_options(args))
+    completed = sum(s.succeeded for s in all_stats)
+    print(f"\nThis worker: {completed} jobs completed")
+    print(board.summary())
+    print(queue.summary())
+    
+    if not queue.claim_export():
+        print("Another worker writes the output file.")
+        return
+    all_words = queue.items()
+    for i, word in enumerate(all_words):
+        word["wordId"] = f"w_{i+1:04d}"
+    write_json_atomic(output_file, all_words)
+    print(f"\n=== COMPLETE: {len(all_words)} words generated ===")
+    wanted = Counter()
+    for _, payload in plan:
+        wanted[payload["difficulty"]] += payload["count"]
+    got = Counter(w["difficulty"] for w in all_words)
+    short = {level: wanted[level] - got[level] for level in sorted(wanted) if got[level] < wanted[level]}
+    if short:
+        print(f"SHORT by {sum(short.values())} words: "
+              + ", ".join(f"D{level} {missing}" for level, missing in short.items()))
+    print(f"Saved to: {output_file}")
+
 def main():
     """Main generation loop."""
-    print("Initializing Vertex AI...")
-    model = init_vertex_ai()
-    
-    all_words = []
-    existing_words = set()
+    parser = argparse.ArgumentParser(description="Generate vocabulary words with Vertex AI")
+    add_batch_args(parser, default=100, maximum=200, minimum=5)
+    add_runtime_args(parser)
+    add_queue_args(parser)
+    add_shard_args(parser)
+    add_plan_args(parser)
+    args = parser.parse_args()
+    output_file = output_path(args, OUTPUT_FILE)
     
     # Target: 8000 words, distributed across difficulties
     # More words at lower levels (more primary students)
@@ -148,41 +408,52 @@ def main():
         5: 1000, 6: 1000, 7: 900, 8: 700, 9: 700
     }
     
-    batch_size = 100  # Maximum batch size for speed
+    # With a plan, only the gaps it lists (see plan_generation.py)
+    theme_gaps = None
+    bank_words = []
+    if args.plan:
+        theme_gaps = {}
+        for job in load_plan(args.plan, "vocab"):
+            theme_gaps.setdefault(job["difficulty"], Counter())[job["theme"]] += job["count"]
+        targets = {d: sum(gaps.values()) for d, gaps in sorted(theme_gaps.items())}
+        if os.path.exists(BANK_FILE):
+            with open(BANK_FILE, encoding="utf-8") as f:
+                bank_words = [(q["answer"].lower(), q.get("difficulty", 0)) for q in json.load(f) if q.get("answer")]
+        print(f"Plan: {sum(targets.values())} words across levels {', '.join(map(str, targets)) or 'none'}, "
+              f"avoiding {len(bank_words)} words already in the bank")
     
-    for difficulty, target in targets.items():
-        print(f"\n=== Generating Difficulty {difficulty} ({target} words) ===")
-        generated = 0
-        
-        while generated < target:
-            remaining = min(batch_size, target - generated)
-            print(f"  Batch: {generated}/{target}...", end=" ", flush=True)
-            
-            batch = generate_vocab_batch(model, difficulty, remaining, existing_words)
-            all_words.extend(batch)
-            generated += len(batch)
-            
-            print(f"Got {len(batch)} words. Total: {len(all_words)}")
-            
-            # Minimal delay - just to avoid burst limits
-            time.sleep(0.2)
-        
-        # Save checkpoint after each difficulty level
-        with open(OUTPUT_FILE, "w") as f:
-            json.dump(all_words, f, indent=2)
-        print(f"  Checkpoint saved: {len(all_words)} total words")
+    shard = shard_from_args(args)
+    if shard is not None:
+        output_file = shard.output(output_file)
+    if args.queue or shard is not None:
+        run_queue(args, targets, output_file, shard, bank_words, theme_gaps)
+        return
+    
+    journal = Journal(output_file)
+    run = VocabRun(targets, batch_sizer(args), journal, bank_words, theme_gaps)
+    resumed = len(run.all_words)
+    if resumed:
+        print(f"Resuming from journal: {resumed} words")
+    print(f"Running {args.concurrency} concurrent requests across {len(targets)} levels")
+    stats = run_jobs(run.jobs(), run.handle, model_name=MODEL_NAME, **runner_options(args))
+    all_words = run.all_words
+    
+    print(f"\n{stats.summary()}")
+    print(run.sizer.summary())
+    print(run.board.summary())
+    new_words = len(all_words) - resumed
+    print(f"Throughput: {new_words} words ({stats.per_minute(new_words):.1f} words/min)")
     
     # Assign wordIds after all words collected
     print("\nAssigning wordIds...")
     for i, word in enumerate(all_words):
         word["wordId"] = f"w_{i+1:04d}"
     
-    # Final save with wordIds
-    with open(OUTPUT_FILE, "w") as f:
-        json.dump(all_words, f, indent=2)
+    # Final save with wordIds (written once, replacing the journal)
+    journal.compact(all_words)
     
     print(f"\n=== COMPLETE: {len(all_words)} words generated ===")
-    print(f"Saved to: {OUTPUT_FILE}")
+    print(f"Saved to: {output_file}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,197 @@
+"""
+Generation Telemetry Report
+Summarises the JSONL records written by the generators (see
+llm_runtime/telemetry.py) into throughput and yield tables per run.
+
+For each run: calls by outcome, latency percentiles, token volume, the parse
+failure rate (replies that were unparseable or only partly parseable, to
+compare --structured runs against free-text ones), items accepted/rejected,
+accepted items per model call and per minute. Below that, one row per
+difficulty (or theme / job / vocab slice, with --by) and the most common
+rejection reasons.
+
+Usage: python generation_report.py [--last 3] [--run RUN_ID] [--by difficulty|theme|job|slice] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from llm_runtime.telemetry import DEFAULT_TELEMETRY_FILE
+
+OUTCOMES = ["ok", "salvaged", "cached", "parse_error", "error", "throttled", "empty"]
+
+
+def load_records(path: str) -> Dict[str, List[Dict]]:
+    """Group records by run id, in file order, skipping any torn line."""
+    runs = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            runs[record.get("run", "?")].append(record)
+    return runs
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+
+def group_key(record: Dict, by: str) -> str:
+    if by == "job":
+        # Drop batch numbers and retry suffixes: "cloze-d3-41-retry" -> "cloze-d3"
+        return re.sub(r"(-\d+)?(-retry)*$", "", str(record.get("job")))
+    value = record.get(by)
+    return "-" if value is None else str(value)
+
+
+def new_bucket() -> Dict:
+    return {"calls": 0, "outcomes": Counter(), "latencies": [], "prompt_tokens": 0, "response_tokens": 0,
+            "accepted": 0, "rejected": Counter(), "structured": 0}
+
+
+def add_record(bucket: Dict, record: Dict):
+    if record["type"] == "call":
+        bucket["calls"] += 1
+        bucket["outcomes"][record.get("outcome", "?")] += 1
+        if record.get("outcome") != "cached":
+            bucket["latencies"].append(record.get("latency", 0.0))
+        bucket["prompt_tokens"] += record.get("prompt_tokens") or 0
+        bucket["response_tokens"] += record.get("response_tokens") or 0
+        bucket["structured"] += bool(record.get("structured"))
+    elif record["type"] == "items":
+        bucket["accepted"] += record.get("accepted", 0)
+        bucket["rejected"].update(record.get("rejected") or {})
+
+
+def finish_bucket(bucket: Dict) -> Dict:
+    rejected = sum(bucket["rejected"].values())
+    kept = bucket["accepted"] + rejected
+    failed = sum(bucket["outcomes"][o] for o in ("parse_error", "error", "throttled", "empty"))
+    replies = sum(bucket["outcomes"][o] for o in ("ok", "salvaged", "parse_error"))
+    unparsed = bucket["outcomes"]["parse_error"] + bucket["outcomes"]["salvaged"]
+    model_calls = bucket["calls"] - bucket["outcomes"]["cached"]
+    return {
+        "calls": bucket["calls"],
+        "outcomes": dict(bucket["outcomes"]),
+        "structured_calls": bucket["structured"],
+        "failure_rate": round(failed / bucket["calls"], 4) if bucket["calls"] else 0.0,
+        "parse_failure_rate": round(unparsed / replies, 4) if replies else 0.0,
+        "latency_p50": round(percentile(bucket["latencies"], 50), 3),
+        "latency_p95": round(percentile(bucket["latencies"], 95), 3),
+        "latency_p99": round(percentile(bucket["latencies"], 99), 3),
+        "prompt_tokens": bucket["prompt_tokens"],
+        "response_tokens": bucket["response_tokens"],
+        "accepted": bucket["accepted"],
+        "rejected": rejected,
+        "yield": round(bucket["accepted"] / kept, 4) if kept else None,
+        "accepted_per_call": round(bucket["accepted"] / model_calls, 2) if model_calls else None,
+        "rejections": dict(bucket["rejected"].most_common()),
+    }
+
+
+def summarise_run(run_id: str, records: List[Dict], by: str) -> Dict:
+    total = new_bucket()
+    groups = defaultdict(new_bucket)
+    run_info = {}
+    for record in records:
+        if record["type"] == "run":
+            run_info = record
+            continue
+        add_record(total, record)
+        add_record(groups[group_key(record, by)], record)
+
+    timestamps = [r["ts"] for r in records if "ts" in r]
+    elapsed = run_info.get("elapsed") or (max(timestamps) - min(timestamps) if timestamps else 0.0)
+    summary = finish_bucket(total)
+    summary.update({
+        "run": run_id,
+        "script": records[0].get("script"),
+        "model": run_info.get("model") or next((r.get("model") for r in records if r.get("model")), None),
+        "elapsed": round(elapsed, 1),
+        "accepted_per_min": round(total["accepted"] * 60 / elapsed, 1) if elapsed else None,
+        "groups": {key: finish_bucket(bucket) for key, bucket in sorted(groups.items(), key=sort_key)},
+    })
+    return summary
+
+
+def sort_key(item):
+    key = item[0]
+    return (0, int(key), "") if key.isdigit() else (1, 0, key)
+
+
+def print_run(summary: Dict, by: str):
+    outcomes = ", ".join(f"{summary['outcomes'][o]} {o}" for o in OUTCOMES if summary["outcomes"].get(o))
+    yield_text = f"{summary['yield']:.0%}" if summary["yield"] is not None else "n/a"
+    rate = f"{summary['accepted_per_min']:.1f}/min" if summary["accepted_per_min"] is not None else "n/a"
+    print("=" * 78)
+    print(f"Run {summary['run']}  {summary['script']}  ({summary['model']})")
+    print("=" * 78)
+    mode = ", structured output" if summary["structured_calls"] else ""
+    print(f"Calls: {summary['calls']} ({outcomes or 'none'}{mode})")
+    print(f"Parse failure rate: {summary['parse_failure_rate']:.1%} of replies")
+    print(f"Latency: p50 {summary['latency_p50']:.1f}s, p95 {summary['latency_p95']:.1f}s, "
+          f"p99 {summary['latency_p99']:.1f}s over {summary['elapsed']:.0f}s")
+    print(f"Tokens (est.): {summary['prompt_tokens']:,} prompt, {summary['response_tokens']:,} response")
+    per_call = f"{summary['accepted_per_call']:.1f}" if summary["accepted_per_call"] is not None else "n/a"
+    print(f"Items: {summary['accepted']} accepted, {summary['rejected']} rejected "
+          f"(yield {yield_text}), {per_call} per model call, {rate}")
+
+    print(f"\n{by:<24} {'calls':>6} {'fail':>6} {'parse':>6} {'p50 s':>7} {'p95 s':>7} {'accepted':>9} "
+          f"{'rejected':>9} {'yield':>6}")
+    for key, group in summary["groups"].items():
+        group_yield = f"{group['yield']:.0%}" if group["yield"] is not None else "-"
+        print(f"{key[:24]:<24} {group['calls']:>6} {group['failure_rate']:>6.0%} {group['parse_failure_rate']:>6.0%} "
+              f"{group['latency_p50']:>7.1f} {group['latency_p95']:>7.1f} {group['accepted']:>9} "
+              f"{group['rejected']:>9} {group_yield:>6}")
+
+    if summary["rejections"]:
+        print("\nRejections:")
+        for reason, count in summary["rejections"].items():
+            print(f"  {reason:<30} {count:>6}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise generator telemetry per run")
+    parser.add_argument("--file", default=DEFAULT_TELEMETRY_FILE,
+                        help="Telemetry JSONL file (default: scripts/generation_telemetry.jsonl)")
+    parser.add_argument("--run", action="append", help="Only this run id (repeatable)")
+    parser.add_argument("--last", type=int, default=3, help="Show the most recent N runs (default: 3)")
+    parser.add_argument("--script", help="Only runs of this script, e.g. generate_vocab_ai")
+    parser.add_argument("--by", choices=["difficulty", "theme", "job", "slice"], default="difficulty",
+                        help="Breakdown inside each run (default: difficulty)")
+    parser.add_argument("--json", action="store_true", help="Print the summaries as JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"No telemetry at {args.file}")
+        return
+
+    runs = load_records(args.file)
+    run_ids = list(runs)
+    if args.script:
+        run_ids = [r for r in run_ids if runs[r][0].get("script") == args.script]
+    if args.run:
+        run_ids = [r for r in run_ids if r in args.run]
+    else:
+        run_ids = run_ids[-args.last:]
+
+    summaries = [summarise_run(run_id, runs[run_id], args.by) for run_id in run_ids]
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    for summary in summaries:
+        print_run(summary, args.by)
+
+
+if __name__ == "__main__":
+    main()
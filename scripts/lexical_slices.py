@@ -0,0 +1,220 @@
+"""
+Lexical slices for vocabulary generation.
+
+Asking the model for "N more words, not in this list" stops working as the
+bank grows: the list can only ever show a fraction of the bank, so most of
+what comes back is a word we already have, and the prompt keeps growing.
+
+Instead each request gets its own corner of the lexical space: one
+difficulty, one range of initial letters and one part of speech (with a
+rotating theme as a soft focus). Slices do not overlap, so two requests can
+only collide when the model strays outside its slice, and the exclusion list
+for a slice only needs the bank words that could actually collide: same
+initial letters, same or unknown part of speech, nearby difficulty.
+
+SliceBoard hands out the least-filled open slice for a level and records the
+duplicate rate of every call. A slice whose recent calls come back mostly
+duplicates is exhausted and retired, so calls are not wasted on it while
+other slices still have room.
+
+Used by generate_vocab_ai.py and ai_word_generator.py.
+"""
+
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+# Initial-letter ranges, with their approximate share of English headwords.
+# Rare letters are grouped so every slice has a similar amount of room.
+LETTER_GROUPS: List[Tuple[str, float]] = [
+    ("a", 0.060), ("b", 0.055), ("c", 0.095), ("d", 0.060), ("e", 0.040), ("fg", 0.075),
+    ("hi", 0.075), ("jkl", 0.045), ("m", 0.055), ("no", 0.045), ("pq", 0.083), ("r", 0.055),
+    ("s", 0.110), ("t", 0.050), ("uv", 0.040), ("wxyz", 0.030),
+]
+
+PARTS_OF_SPEECH: List[Tuple[str, float]] = [
+    ("noun", 0.45), ("verb", 0.25), ("adjective or adverb", 0.30),
+]
+
+# Nearest-difficulty bank words listed in a slice's prompt
+EXCLUDE_LIMIT = 150
+
+# Retire a slice when its last RETIRE_WINDOW calls were at least this share duplicates
+RETIRE_DUPLICATE_RATE = 0.5
+RETIRE_WINDOW = 2
+
+# Bank sizes at which the duplicate-rate trend is reported
+PROGRESS_STEP = 1000
+
+
+def letter_group(word: str) -> str:
+    """The LETTER_GROUPS entry a word falls into, by its first letter."""
+    initial = next((c for c in word.lower() if c.isalpha()), "")
+    for letters, _ in LETTER_GROUPS:
+        if initial in letters:
+            return letters
+    return LETTER_GROUPS[-1][0]
+
+
+def describe_letters(letters: str) -> str:
+    if len(letters) == 1:
+        return f"the letter '{letters}'"
+    return "one of the letters " + ", ".join(f"'{c}'" for c in letters)
+
+
+@dataclass
+class Slice:
+    difficulty: int
+    letters: str
+    pos: str
+    target: int
+    accepted: int = 0
+    outstanding: int = 0
+    calls: int = 0
+    returned: int = 0
+    duplicates: int = 0
+    off_slice: int = 0
+    retired: bool = False
+    recent: Deque[Tuple[int, int]] = field(default_factory=lambda: deque(maxlen=RETIRE_WINDOW))
+
+    @property
+    def key(self) -> str:
+        return f"d{self.difficulty}-{self.letters}-{self.pos.split()[0]}"
+
+    @property
+    def fill(self) -> float:
+        return (self.accepted + self.outstanding) / max(1, self.target)
+
+    @property
+    def duplicate_rate(self) -> float:
+        return self.duplicates / self.returned if self.returned else 0.0
+
+    def constraint(self) -> str:
+        """Prompt lines that pin a request to this slice."""
+        return (f"- Every word must start with {describe_letters(self.letters)}\n"
+                f"- Every word must be a {self.pos}")
+
+
+def split_target(total: int, weights: List[float]) -> List[int]:
+    """Largest-remainder split of `total` in proportion to `weights`."""
+    scale = total / sum(weights)
+    shares = [w * scale for w in weights]
+    counts = [int(s) for s in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda i: counts[i] - shares[i])
+    for i in by_remainder[: total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def plan_slices(targets: Dict[int, int]) -> List[Slice]:
+    """Every (difficulty, letters, part of speech) slice with its share of the level's target."""
+    cells = [(letters, pos, lw * pw) for letters, lw in LETTER_GROUPS for pos, pw in PARTS_OF_SPEECH]
+    slices = []
+    for difficulty, total in targets.items():
+        for (letters, pos, _), target in zip(cells, split_target(total, [w for _, _, w in cells])):
+            slices.append(Slice(difficulty, letters, pos, target))
+    return slices
+
+
+class SliceBoard:
+    """Slice assignment, the bank index used for exclusions, and per-slice duplicate tracking."""
+
+    def __init__(self, targets: Dict[int, int], themes: Optional[List[str]] = None):
+        self.slices = plan_slices(targets)
+        self.by_key = {s.key: s for s in self.slices}
+        self.themes = themes or []
+        # letters -> [(difficulty, pos or None, word)] for every word in the bank
+        self.bank: Dict[str, List[Tuple[int, Optional[str], str]]] = defaultdict(list)
+        self.size = 0
+        # (bank size bucket) -> [calls, returned, duplicates]
+        self.progress: Dict[int, List[int]] = defaultdict(lambda: [0, 0, 0])
+
+    def add_existing(self, words: Iterable[Tuple[str, int]], credit: bool = True):
+        """
+        Index words already in the bank and credit them to the least-filled
+        slice they fit. With credit=False they only count as exclusions (the
+        targets are gaps on top of them).
+        """
+        for word, difficulty in words:
+            letters = letter_group(word)
+            self.index(word, difficulty, letters, None)
+            if not credit:
+                continue
+            candidates = [s for s in self.slices if s.difficulty == difficulty and s.letters == letters]
+            if candidates:
+                min(candidates, key=lambda s: s.fill).accepted += 1
+
+    def index(self, word: str, difficulty: int, letters: str, pos: Optional[str]):
+        self.bank[letters].append((difficulty, pos, word))
+        self.size += 1
+
+    def next_slice(self, difficulty: int) -> Optional[Slice]:
+        """The least-filled slice of a level that is not retired (past its target if all are)."""
+        open_slices = [s for s in self.slices if s.difficulty == difficulty and not s.retired]
+        if not open_slices:
+            return None
+        return min(open_slices, key=lambda s: s.fill)
+
+    def theme_for(self, slice_: Slice) -> Optional[str]:
+        """Rotate the soft theme focus across calls to the same slice."""
+        if not self.themes:
+            return None
+        return self.themes[(self.slices.index(slice_) + slice_.calls) % len(self.themes)]
+
+    def exclusions(self, slice_: Slice, limit: int = EXCLUDE_LIMIT) -> List[str]:
+        """Bank words this slice could repeat: same letters, compatible part of speech, nearest difficulty."""
+        candidates = [
+            (abs(difficulty - slice_.difficulty), word)
+            for difficulty, pos, word in self.bank[slice_.letters]
+            if pos in (None, slice_.pos) and abs(difficulty - slice_.difficulty) <= 1
+        ]
+        candidates.sort(key=lambda c: c[0])
+        return [word for _, word in candidates[:limit]]
+
+    def record(self, slice_: Slice, returned: int, duplicates: int, accepted_words: List[str]) -> bool:
+        """Book one call's outcome. Returns True on the call that retires the slice for returning duplicates."""
+        slice_.calls += 1
+        slice_.returned += returned
+        slice_.duplicates += duplicates
+        slice_.accepted += len(accepted_words)
+        progress = self.progress[self.size // PROGRESS_STEP]
+        progress[0] += 1
+        progress[1] += returned
+        progress[2] += duplicates
+        for word in accepted_words:
+            letters = letter_group(word)
+            if letters != slice_.letters:
+                slice_.off_slice += 1
+            self.index(word, slice_.difficulty, letters, slice_.pos if letters == slice_.letters else None)
+
+        slice_.recent.append((returned, duplicates))
+        recent_returned = sum(r for r, _ in slice_.recent)
+        recent_duplicates = sum(d for _, d in slice_.recent)
+        if slice_.retired or len(slice_.recent) < RETIRE_WINDOW:
+            return False
+        if recent_returned == 0 or recent_duplicates / recent_returned >= RETIRE_DUPLICATE_RATE:
+            slice_.retired = True
+            return True
+        return False
+
+    def open_count(self, difficulty: int) -> int:
+        return sum(1 for s in self.slices if s.difficulty == difficulty and not s.retired)
+
+    def summary(self) -> str:
+        """Duplicate rate per level and by bank size, so a rising trend is easy to spot."""
+        lines = ["Slices:"]
+        for difficulty in sorted({s.difficulty for s in self.slices}):
+            level = [s for s in self.slices if s.difficulty == difficulty]
+            returned = sum(s.returned for s in level)
+            duplicates = sum(s.duplicates for s in level)
+            rate = duplicates / returned if returned else 0.0
+            lines.append(f"  D{difficulty}: {sum(s.calls for s in level)} calls, {rate:.0%} duplicates, "
+                         f"{sum(s.retired for s in level)}/{len(level)} slices retired, "
+                         f"{sum(s.off_slice for s in level)} off-slice words")
+        lines.append("Duplicate rate by bank size:")
+        for bucket in sorted(self.progress):
+            calls, returned, duplicates = self.progress[bucket]
+            rate = duplicates / returned if returned else 0.0
+            lines.append(f"  {bucket * PROGRESS_STEP:>5}-{(bucket + 1) * PROGRESS_STEP:<5} "
+                         f"{calls:>4} calls, {rate:.0%} duplicates")
+        return "\n".join(lines)
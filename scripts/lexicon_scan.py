@@ -0,0 +1,342 @@
+"""
+Lexicon Scanner
+Finds American spellings, American word choices and words that do not
+belong in a children's question bank, in every text field of every bank, in
+one pass.
+
+All patterns (US spellings and US words with their British forms, and the
+banned list)
+are compiled into one Aho-Corasick automaton, so each string is read once
+no matter how many patterns there are. A match only counts on whole-word
+boundaries ("color" in "colorful" is its own entry; "tire" inside "entire"
+is not a match). Every hit comes back with the bank, item key and field
+path, e.g. vocab-cloze:12 paragraphs[1].blanks[0].options[2].
+
+The US -> UK table lists base forms; inflections (colors, colored,
+realizing, realization, traveled, traveling, ...) are generated from them.
+Forms that are correct in British English too (meter, program, tire, check,
+license, practice, draft, size, prize) are left out on purpose. Only true
+spelling variants are in US_UK; a different word for the same thing ("mom",
+"airplane") is in US_WORDS, reported as "us-word" but never rewritten, since
+it may be a character's voice in a dialogue or a speaker label.
+
+The generators use the same scanner inline. lexicon_problem() rejects an
+item containing a banned word, or whose answer is itself an American
+spelling or word (the question is about that word). Any other American
+spelling is rewritten in place by to_british(), keeping its capitalisation,
+so a cloze passage is not thrown away over one "realized" in an explanation.
+
+Usage:
+    python lexicon_scan.py [--bank vocab-mcq] [--kind us-spelling|us-word|banned] [--json hits.json]
+"""
+
+import argparse
+import json
+from collections import Counter, deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from content_store import BANKS, bank_path
+
+# American -> British base forms: spelling variants of the same word, safe to rewrite
+US_UK = {
+    # -or / -our
+    "color": "colour", "honor": "honour", "humor": "humour", "labor": "labour", "neighbor": "neighbour",
+    "favor": "favour", "flavor": "flavour", "behavior": "behaviour", "harbor": "harbour",
+    "rumor": "rumour", "vapor": "vapour", "vigor": "vigour", "valor": "valour", "odor": "odour",
+    "armor": "armour", "clamor": "clamour", "endeavor": "endeavour", "glamor": "glamour", "parlor": "parlour",
+    "savor": "savour", "splendor": "splendour", "tumor": "tumour", "rancor": "rancour", "candor": "candour",
+    "ardor": "ardour", "fervor": "fervour", "demeanor": "demeanour", "misdemeanor": "misdemeanour",
+    "favorite": "favourite", "honorable": "honourable",
+    # -er / -re
+    "center": "centre", "theater": "theatre", "fiber": "fibre", "liter": "litre", "caliber": "calibre",
+    "somber": "sombre", "meager": "meagre", "saber": "sabre", "specter": "spectre", "luster": "lustre",
+    "sepulcher": "sepulchre", "maneuver": "manoeuvre", "centimeter": "centimetre", "kilometer": "kilometre",
+    "millimeter": "millimetre", "milliliter": "millilitre",
+    # -ize / -ise and -yze / -yse
+    "realize": "realise", "organize": "organise", "recognize": "recognise", "apologize": "apologise",
+    "criticize": "criticise", "emphasize": "emphasise", "memorize": "memorise", "summarize": "summarise",
+    "sympathize": "sympathise", "symbolize": "symbolise", "specialize": "specialise", "utilize": "utilise",
+    "visualize": "visualise", "prioritize": "prioritise", "categorize": "categorise", "characterize": "characterise",
+    "civilize": "civilise", "colonize": "colonise", "finalize": "finalise", "harmonize": "harmonise",
+    "idolize": "idolise", "legalize": "legalise", "maximize": "maximise", "minimize": "minimise",
+    "mobilize": "mobilise", "modernize": "modernise", "neutralize": "neutralise", "normalize": "normalise",
+    "penalize": "penalise", "popularize": "popularise", "publicize": "publicise", "scrutinize": "scrutinise",
+    "socialize": "socialise", "stabilize": "stabilise", "standardize": "standardise", "sterilize": "sterilise",
+    "subsidize": "subsidise", "terrorize": "terrorise", "agonize": "agonise", "antagonize": "antagonise",
+    "authorize": "authorise", "capitalize": "capitalise", "fertilize": "fertilise", "hospitalize": "hospitalise",
+    "immunize": "immunise", "jeopardize": "jeopardise", "mesmerize": "mesmerise", "patronize": "patronise",
+    "revolutionize": "revolutionise", "tantalize": "tantalise", "vaporize": "vaporise", "energize": "energise",
+    "analyze": "analyse", "paralyze": "paralyse", "catalyze": "catalyse",
+    # -ense / -ence, -og / -ogue and others
+    "defense": "defence", "offense": "offence", "pretense": "pretence",
+    "catalog": "catalogue", "dialog": "dialogue", "monolog": "monologue", "analog": "analogue",
+    "gray": "grey", "mold": "mould", "smolder": "smoulder", "plow": "plough", "pajamas": "pyjamas",
+    "aluminum": "aluminium", "jewelry": "jewellery", "mustache": "moustache", "cozy": "cosy",
+    "skeptic": "sceptic", "skeptical": "sceptical", "sulfur": "sulphur",
+    "aging": "ageing", "judgment": "judgement", "acknowledgment": "acknowledgement", "fulfill": "fulfil",
+    "enroll": "enrol", "enrollment": "enrolment", "installment": "instalment", "willful": "wilful",
+    "skillful": "skilful", "woolen": "woollen", "pediatric": "paediatric", "encyclopedia": "encyclopaedia",
+    "anemia": "anaemia", "anesthetic": "anaesthetic", "archeology": "archaeology", "esophagus": "oesophagus",
+    "artifact": "artefact", "omelet": "omelette",
+}
+
+# American words with a British counterpart that is a different word, not a
+# spelling: reported, but never rewritten automatically
+US_WORDS = {
+    "mom": "mum", "ax": "axe", "airplane": "aeroplane", "tidbit": "titbit", "donut": "doughnut",
+}
+
+# Verbs whose final l is doubled in British English: traveled -> travelled
+L_DOUBLING = [
+    "travel", "cancel", "label", "model", "fuel", "level", "signal", "counsel", "marvel", "quarrel",
+    "jewel", "tunnel", "shovel", "rival", "channel", "dial", "duel", "panel", "pedal",
+    "snorkel", "spiral", "total", "yodel", "grovel", "revel", "swivel", "unravel",
+]
+
+# Not for a children's bank; matched as whole words like the spellings
+# (words with an innocent everyday sense, e.g. "weed", "drunk", "ass", are left out).
+BANNED = {
+    "damn", "damned", "dammit", "goddamn", "hell", "crap", "crappy", "piss", "pissed", "bastard",
+    "bitch", "bitches", "bullshit", "shit", "shitty", "fuck", "fucking", "fucked", "asshole",
+    "arse", "arsehole", "bloody hell", "wanker", "bollocks", "slut", "whore",
+    "sexy", "porn", "pornography", "nude", "erotic", "orgasm", "condom",
+    "suicide", "suicidal", "kill yourself", "self-harm", "cocaine", "heroin", "marijuana", "vape", "rape",
+}
+
+# Keys that hold identifiers, URLs or audio settings rather than text
+SKIP_KEYS = {"id", "wordId", "type", "audio_url", "voice_pool", "voices", "ambience_recipe"}
+
+
+def inflections(us: str, uk: str) -> Iterator[Tuple[str, str]]:
+    """The base pair plus its regular inflections."""
+    yield us, uk
+    if us.endswith(("ize", "yze")) and uk.endswith(("ise", "yse")):
+        for suffix in ("s", "d", "r", "rs"):
+            yield us + suffix, uk + suffix
+        for suffix in ("ing", "ation", "ations"):
+            yield us[:-1] + suffix, uk[:-1] + suffix
+    elif us.endswith("or") and uk.endswith("our"):
+        for suffix in ("s", "ed", "ing", "ful", "less", "able", "ably", "ite", "ites"):
+            yield us + suffix, uk + suffix
+    elif us.endswith("er") and uk.endswith("re"):
+        yield us + "s", uk + "s"
+        yield us + "ed", uk[:-1] + "ed"
+        yield us + "ing", uk[:-1] + "ing"
+    elif not us.endswith("s"):
+        yield us + "s", uk + "s"
+
+
+def inflection_table(pairs: Dict[str, str]) -> Dict[str, str]:
+    table = {}
+    for us, uk in pairs.items():
+        if us != uk:
+            table.update(inflections(us, uk))
+    return table
+
+
+def spelling_table() -> Dict[str, str]:
+    table = inflection_table(US_UK)
+    for verb in L_DOUBLING:
+        for suffix in ("ed", "ing", "er", "ers"):
+            table[verb + suffix] = verb + "l" + suffix
+    return table
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every occurrence of every pattern."""
+
+    def __init__(self, patterns: List[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[str]] = [[]]
+        for pattern in patterns:
+            node = 0
+            for ch in pattern:
+                if ch not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            self.out[node].append(pattern)
+
+        # Breadth-first: each node's failure link is the longest proper suffix that is also in the trie
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(ch, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text: str) -> Iterator[Tuple[int, str]]:
+        """(start index, pattern) for every match in text."""
+        node = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern in out[node]:
+                yield i - len(pattern) + 1, pattern
+
+
+@dataclass
+class Hit:
+    path: str
+    start: int
+    term: str
+    kind: str  # "us-spelling", "us-word" or "banned"
+    suggestion: Optional[str]
+    context: str
+
+
+def match_case(word: str, like: str) -> str:
+    if like.isupper() and len(like) > 1:
+        return word.upper()
+    if like[:1].isupper():
+        return word[:1].upper() + word[1:]
+    return word
+
+
+class LexiconScanner:
+    """US spellings, US words and banned words compiled into one automaton."""
+
+    def __init__(self, spellings: Optional[Dict[str, str]] = None, banned=BANNED,
+                 words: Optional[Dict[str, str]] = None):
+        self.spellings = spelling_table() if spellings is None else spellings
+        self.words = inflection_table(US_WORDS) if words is None else words
+        self.banned = set(banned)
+        self.automaton = AhoCorasick(sorted(set(self.spellings) | set(self.words) | self.banned))
+
+    def scan_text(self, text: str, path: str = "") -> Iterator[Hit]:
+        lower = text.lower()
+        if len(lower) != len(text):  # lowercasing changed the length; quote the lowercased text
+            text = lower
+        for start, term in self.automaton.find(lower):
+            end = start + len(term)
+            if (start > 0 and lower[start - 1].isalpha()) or (end < len(lower) and lower[end].isalpha()):
+                continue
+            context = text[max(0, start - 30):end + 30]
+            if term in self.banned:
+                yield Hit(path, start, term, "banned", None, context)
+            elif term in self.words:
+                yield Hit(path, start, term, "us-word", self.words[term], context)
+            else:
+                yield Hit(path, start, term, "us-spelling", self.spellings[term], context)
+
+    def british(self, text: str) -> Tuple[str, int]:
+        """`text` with every American spelling replaced, and the number replaced."""
+        if len(text.lower()) != len(text):
+            return text, 0
+        pieces, last, count = [], 0, 0
+        for hit in self.scan_text(text):
+            if hit.kind != "us-spelling" or hit.start < last:
+                continue
+            end = hit.start + len(hit.term)
+            pieces.append(text[last:hit.start])
+            pieces.append(match_case(hit.suggestion, text[hit.start:end]))
+            last = end
+            count += 1
+        return ("".join(pieces) + text[last:], count) if count else (text, 0)
+
+    def scan_item(self, value: Any, path: str = "") -> Iterator[Hit]:
+        """Every hit in every string inside `value`, with its field path."""
+        if isinstance(value, str):
+            yield from self.scan_text(value, path)
+        elif isinstance(value, dict):
+            for key, child in value.items():
+                if key not in SKIP_KEYS:
+                    yield from self.scan_item(child, f"{path}.{key}" if path else str(key))
+        elif isinstance(value, list):
+            for i, child in enumerate(value):
+                yield from self.scan_item(child, f"{path}[{i}]")
+
+
+@lru_cache(maxsize=1)
+def default_scanner() -> LexiconScanner:
+    return LexiconScanner()
+
+
+def lexicon_problem(item: Dict, answer_field: Optional[str] = None) -> Optional[str]:
+    """
+    Rejection reason for a generated item: "banned word" anywhere in it, or
+    "American spelling" / "American word" in its answer field. None if it
+    can be kept.
+    """
+    scanner = default_scanner()
+    if any(hit.kind == "banned" for hit in scanner.scan_item(item)):
+        return "banned word"
+    if answer_field:
+        kinds = {hit.kind for hit in scanner.scan_text(str(item.get(answer_field, "")))}
+        if "us-spelling" in kinds:
+            return "American spelling"
+        if "us-word" in kinds:
+            return "American word"
+    return None
+
+
+def to_british(value: Any) -> int:
+    """Rewrite American spellings in every string of a dict/list in place. Returns the number fixed."""
+    scanner = default_scanner()
+    fixed = 0
+    children = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else []
+    for key, child in list(children):
+        if key in SKIP_KEYS:
+            continue
+        if isinstance(child, str):
+            value[key], count = scanner.british(child)
+            fixed += count
+        else:
+            fixed += to_british(child)
+    return fixed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan the question banks for American spellings and banned words")
+    parser.add_argument("--bank", choices=list(BANKS), action="append",
+                        help="Bank to scan (repeatable; default: all)")
+    parser.add_argument("--kind", choices=["us-spelling", "us-word", "banned"], default=None,
+                        help="Only report this kind")
+    parser.add_argument("--json", metavar="PATH", default=None, help="Write every hit as JSON")
+    parser.add_argument("--show", type=int, default=15, help="Hits to print per bank (default: 15)")
+    args = parser.parse_args()
+
+    scanner = default_scanner()
+    report = []
+    print("=" * 60)
+    print(f"{len(scanner.spellings)} US spellings, {len(scanner.words)} US words "
+          f"and {len(scanner.banned)} banned words")
+    print("=" * 60)
+    for bank in args.bank or list(BANKS):
+        with open(bank_path(bank), encoding="utf-8") as f:
+            items = json.load(f)
+        hits = []
+        for position, item in enumerate(items):
+            key = str(BANKS[bank].key(item))
+            for hit in scanner.scan_item(item):
+                if args.kind is None or hit.kind == args.kind:
+                    hits.append({"bank": bank, "key": key, "path": hit.path, "term": hit.term, "kind": hit.kind,
+                                 "suggestion": hit.suggestion, "context": hit.context})
+        report.extend(hits)
+        terms = Counter(h["term"] for h in hits)
+        print(f"  {bank:<15} {len(items):>6} items, {len(hits):>4} hits"
+              + (f"  ({', '.join(f'{t} x{n}' for t, n in terms.most_common(6))})" if hits else ""))
+        for hit in hits[:args.show]:
+            fix = f" -> {hit['suggestion']}" if hit["suggestion"] else ""
+            print(f"      {hit['key']} {hit['path']}: {hit['term']}{fix}  \"...{hit['context']}...\"")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nHits saved to: {args.json}")
+    raise SystemExit(1 if report else 0)
+
+
+if __name__ == "__main__":
+    main()
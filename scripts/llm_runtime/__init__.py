@@ -0,0 +1,85 @@
+"""
+Shared runtime for the generate_*_ai.py scripts.
+
+Owns the pooled Vertex AI model client, response parsing, the on-disk
+response cache, the append-only checkpoint journal, adaptive rate limiting,
+adaptive batch sizing, call telemetry, an offline stand-in model, the
+concurrent job runner, a shared SQLite work queue, deterministic sharding
+and gap-driven plans, so each generator only has to describe its jobs (a
+prompt plus metadata) and what to do with a parsed result.
+
+Usage (from a script in scripts/):
+    from llm_runtime import Job, add_runtime_args, run_jobs, runner_options
+"""
+
+from .batching import BatchSizer, add_batch_args, batch_sizer
+from .cache import ResponseCache, make_key
+from .client import LOCATION, PROJECT_ID, generate_text, get_model, init_vertex_ai, stream_text
+from .fake_model import FakeGenerativeModel
+from .journal import Journal
+from .plan import add_plan_args, load_plan
+from .parsing import ParsedItems, StreamingArrayParser, parse_json_items, parse_json_response, strip_code_fences
+from .ratelimit import AdaptiveRateLimiter, is_throttle_error
+from .runner import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MODEL,
+    Job,
+    JobResult,
+    JobRunner,
+    RunStats,
+    add_runtime_args,
+    collect_results,
+    output_path,
+    run_jobs,
+    runner_options,
+)
+from .sharding import Shard, add_shard_args, find_shard_files, shard_from_args
+from .telemetry import Telemetry
+from .workqueue import QueuedJob, WorkQueue, add_queue_args, open_queue, run_queue_worker, write_json_atomic
+
+__all__ = [
+    "AdaptiveRateLimiter",
+    "BatchSizer",
+    "DEFAULT_CONCURRENCY",
+    "DEFAULT_MODEL",
+    "FakeGenerativeModel",
+    "LOCATION",
+    "PROJECT_ID",
+    "Job",
+    "JobResult",
+    "JobRunner",
+    "Journal",
+    "ParsedItems",
+    "QueuedJob",
+    "ResponseCache",
+    "RunStats",
+    "Shard",
+    "StreamingArrayParser",
+    "Telemetry",
+    "WorkQueue",
+    "add_batch_args",
+    "add_plan_args",
+    "add_queue_args",
+    "add_runtime_args",
+    "add_shard_args",
+    "batch_sizer",
+    "collect_results",
+    "find_shard_files",
+    "generate_text",
+    "get_model",
+    "init_vertex_ai",
+    "is_throttle_error",
+    "load_plan",
+    "make_key",
+    "open_queue",
+    "output_path",
+    "parse_json_items",
+    "parse_json_response",
+    "run_jobs",
+    "run_queue_worker",
+    "runner_options",
+    "shard_from_args",
+    "stream_text",
+    "strip_code_fences",
+    "write_json_atomic",
+]
@@ -0,0 +1,165 @@
+"""
+Adaptive batch sizing.
+
+How many items to ask for per call is a trade-off: small batches pay the
+fixed per-call latency over and over, large ones run into output limits
+(truncation, malformed JSON) and more duplicates that get rejected. The
+best size differs per job type and difficulty, so BatchSizer measures it.
+
+Each batch key (e.g. "vocab-d3") walks a geometric ladder of sizes. After
+every `window` calls at a size it compares the smoothed yield, in accepted
+items per second of call time, with the neighbouring sizes. It probes a
+neighbour it has not tried yet, moves to a better one, and re-probes now
+and then so that drift (a level running out of fresh words) is noticed.
+Latency, parse failures and the accepted/requested ratio all feed into
+that one number. Per-key counters are kept for the end-of-run summary.
+"""
+
+import argparse
+import math
+from typing import Dict, List, Optional
+
+from .runner import JobResult
+
+
+def size_ladder(minimum: int, maximum: int, ratio: float = 1.5) -> List[int]:
+    """Distinct batch sizes from `minimum` to `maximum`, roughly `ratio` apart."""
+    sizes = [minimum]
+    while sizes[-1] < maximum:
+        sizes.append(min(maximum, max(sizes[-1] + 1, round(sizes[-1] * ratio))))
+    return sizes
+
+
+class BatchArm:
+    """Measurements and current position on the ladder for one batch key."""
+
+    def __init__(self, ladder: List[int], initial: int):
+        self.ladder = ladder
+        self.index = min(range(len(ladder)), key=lambda i: abs(math.log(ladder[i] / initial)))
+        self.rates: List[Optional[float]] = [None] * len(ladder)
+        self.samples = [0] * len(ladder)
+        self.since_move = 0
+        self.stays = 0
+        self.probe_up = True
+        self.calls = 0
+        self.attempts = 0
+        self.failures = 0
+        self.requested = 0
+        self.accepted = 0
+        self.latency = 0.0
+
+    @property
+    def size(self) -> int:
+        return self.ladder[self.index]
+
+    def rung_for(self, requested: int) -> int:
+        return min(range(len(self.ladder)), key=lambda i: abs(math.log(self.ladder[i] / max(1, requested))))
+
+    def observe(self, rung: int, rate: float, smoothing: float):
+        old = self.rates[rung]
+        self.rates[rung] = rate if old is None else old + smoothing * (rate - old)
+        self.samples[rung] += 1
+        if rung == self.index:
+            self.since_move += 1
+
+    def step(self, window: int, reprobe_after: int):
+        """Move to the best of the current size and its neighbours once enough calls are in."""
+        if self.since_move < window:
+            return
+        neighbours = [i for i in (self.index - 1, self.index + 1) if 0 <= i < len(self.ladder)]
+        untried = [i for i in neighbours if self.rates[i] is None]
+        if untried:
+            self.move(untried[-1] if self.probe_up else untried[0])
+            self.probe_up = not self.probe_up
+            return
+        best = max([self.index] + neighbours, key=lambda i: self.rates[i])
+        if best != self.index:
+            self.move(best)
+            return
+        self.stays += 1
+        self.since_move = 0
+        if self.stays >= reprobe_after and neighbours:
+            # Neighbour estimates go stale as the run progresses; look again
+            self.move(neighbours[-1] if self.probe_up or len(neighbours) == 1 else neighbours[0])
+            self.probe_up = not self.probe_up
+
+    def move(self, index: int):
+        self.index = index
+        self.since_move = 0
+        self.stays = 0
+
+
+class BatchSizer:
+    """Picks a batch size per key and learns from each finished call."""
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: Optional[int] = None,
+                 adaptive: bool = True, window: int = 3, smoothing: float = 0.3, reprobe_after: int = 4):
+        maximum = max(initial, maximum or initial)
+        minimum = max(1, min(minimum, initial))
+        self.ladder = size_ladder(minimum, maximum)
+        self.initial = initial
+        self.adaptive = adaptive
+        self.window = window
+        self.smoothing = smoothing
+        self.reprobe_after = reprobe_after
+        self.arms: Dict[str, BatchArm] = {}
+
+    def arm(self, key: str) -> BatchArm:
+        arm = self.arms.get(key)
+        if arm is None:
+            arm = self.arms[key] = BatchArm(self.ladder, self.initial)
+        return arm
+
+    def size(self, key: str) -> int:
+        """Batch size to request next for `key`."""
+        if not self.adaptive:
+            return self.initial
+        return self.arm(key).size
+
+    def record(self, key: str, result: JobResult, requested: int, accepted: int):
+        """Feed back one finished job: `accepted` of `requested` items were kept."""
+        if result.cached:
+            return  # no latency to learn from
+        arm = self.arm(key)
+        arm.calls += 1
+        arm.attempts += result.attempts
+        arm.failures += result.attempts - (1 if result.ok else 0)
+        arm.requested += requested
+        arm.accepted += accepted
+        arm.latency += result.latency
+        if not self.adaptive:
+            return
+        arm.observe(arm.rung_for(requested), accepted / max(result.latency, 1e-3), self.smoothing)
+        arm.step(self.window, self.reprobe_after)
+
+    def summary(self) -> str:
+        lines = ["Batch sizes:"]
+        for key, arm in sorted(self.arms.items()):
+            if not arm.calls:
+                continue
+            yield_ratio = arm.accepted / arm.requested if arm.requested else 0
+            fail_rate = arm.failures / arm.attempts if arm.attempts else 0
+            rate = arm.accepted / arm.latency if arm.latency else 0
+            lines.append(
+                f"  {key}: size {arm.size}, {arm.calls} calls, {yield_ratio:.0%} accepted, "
+                f"{fail_rate:.0%} failed attempts, {arm.latency / arm.calls:.1f}s/call, {rate:.2f} items/s"
+            )
+        return "\n".join(lines)
+
+
+def add_batch_args(parser: argparse.ArgumentParser, default: int, maximum: int, minimum: int = 1):
+    """Add --batch-size (the starting size), its bounds and --fixed-batch-size."""
+    parser.add_argument("--batch-size", type=int, default=default,
+                        help=f"Items requested per call; the starting point when adaptive (default: {default})")
+    parser.add_argument("--min-batch-size", type=int, default=minimum,
+                        help=f"Smallest batch the sizer may try (default: {minimum})")
+    parser.add_argument("--max-batch-size", type=int, default=maximum,
+                        help=f"Largest batch the sizer may try (default: {maximum})")
+    parser.add_argument("--fixed-batch-size", action="store_true",
+                        help="Always request --batch-size items instead of tuning it")
+
+
+def batch_sizer(args: argparse.Namespace) -> BatchSizer:
+    """Build a BatchSizer from the flags added by add_batch_args."""
+    return BatchSizer(args.batch_size, args.min_batch_size, args.max_batch_size,
+                      adaptive=not args.fixed_batch_size)
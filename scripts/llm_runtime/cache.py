@@ -0,0 +1,121 @@
+"""
+Content-addressed on-disk cache of model responses.
+
+Entries live in a local SQLite file and are keyed by a SHA-256 of the model
+name, prompt, generation parameters and the sample number of that prompt
+within the run. The sample number keeps repeated identical prompts (e.g. 100
+cloze passages at one difficulty) distinct, while a re-run after a crash
+replays the same responses for the same prompts.
+
+Only responses that parsed completely are stored; salvaged or truncated ones
+are retried on the next run. Entries older than `max_age_days` are dropped and
+the least recently used ones are evicted once the file holds more than
+`max_mb` of response text.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.dirname(__file__), "..", ".llm_cache.sqlite")
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_MB = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+"""
+
+
+def make_key(model_name: str, prompt: str, params: Optional[Dict[str, Any]] = None, sample: int = 0) -> str:
+    """Hash everything that determines a response into a cache key."""
+    payload = json.dumps(
+        {"model": model_name, "prompt": prompt, "params": params or {}, "sample": sample},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with age/size eviction and hit counters."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_FILE, max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+                 max_mb: float = DEFAULT_MAX_MB):
+        self.path = path
+        self.max_age = max_age_days * 86400
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.evict()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.conn:
+            self.conn.execute(
+                "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+        return row[0]
+
+    def put(self, key: str, model_name: str, response: str):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, len(response.encode("utf-8")), now, now),
+            )
+        self.stores += 1
+
+    def discard(self, key: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until under the size cap."""
+        removed = 0
+        with self.conn:
+            removed += self.conn.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,)
+            ).rowcount
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in self.conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    total -= size
+                    removed += 1
+        return removed
+
+    def summary(self) -> str:
+        entries, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0
+        return (f"Cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), "
+                f"{self.stores} stored; {entries} entries, {total / 1024 / 1024:.1f} MB on disk")
+
+    def close(self):
+        self.conn.close()
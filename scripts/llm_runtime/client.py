@@ -0,0 +1,79 @@
+"""
+Pooled Vertex AI model client.
+
+vertexai.init() runs once per process and one GenerativeModel is kept per
+model name, so every concurrent request shares the same underlying channel.
+Generation configs are plain dicts (so they can be cache keys); one with a
+response_schema is wrapped in a GenerationConfig, which is the only way
+vertexai accepts a schema given as a dict.
+"""
+
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .fake_model import FakeGenerativeModel
+
+PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT", "vocab-gen-2025-njytim")
+LOCATION = "us-central1"
+
+_models: Dict[str, object] = {}
+_initialized = False
+
+
+def init_vertex_ai():
+    """Initialize Vertex AI with project settings (idempotent)."""
+    global _initialized
+    if _initialized:
+        return
+    try:
+        import vertexai
+    except ImportError:
+        print("Please install: pip install google-cloud-aiplatform")
+        raise SystemExit(1)
+    vertexai.init(project=PROJECT_ID, location=LOCATION)
+    _initialized = True
+
+
+def get_model(name: str):
+    """Return the shared GenerativeModel for `name`, creating it on first use."""
+    model = _models.get(name)
+    if model is None:
+        init_vertex_ai()
+        from vertexai.generative_models import GenerativeModel
+        model = _models[name] = GenerativeModel(name)
+    return model
+
+
+def generation_config(model, params: Optional[Dict[str, Any]]):
+    """The config to send: a GenerationConfig for a real model when there is a response schema."""
+    if not params or "response_schema" not in params or isinstance(model, FakeGenerativeModel):
+        return params
+    from vertexai.generative_models import GenerationConfig
+    return GenerationConfig(**params)
+
+
+async def generate_text(model, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Send one prompt (with optional generation config) and return the response text."""
+    params = generation_config(model, params)
+    if params:
+        response = await model.generate_content_async(prompt, generation_config=params)
+    else:
+        response = await model.generate_content_async(prompt)
+    return response.text
+
+
+async def stream_text(model, prompt: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Send one prompt with streaming on and yield the response text chunk by chunk."""
+    params = generation_config(model, params)
+    if params:
+        responses = await model.generate_content_async(prompt, generation_config=params, stream=True)
+    else:
+        responses = await model.generate_content_async(prompt, stream=True)
+    async for response in responses:
+        try:
+            text = response.text
+        except ValueError:
+            # Chunks without a text part (e.g. only a finish reason)
+            continue
+        if text:
+            yield text
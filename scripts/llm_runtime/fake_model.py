@@ -0,0 +1,360 @@
+"""
+Offline stand-in for vertexai's GenerativeModel.
+
+FakeGenerativeModel recognises the prompt of each generate_*_ai.py script and
+answers with JSON in the shape that script expects (vocab words, cloze and
+grammar cloze passages, grammar MCQs, comprehension passages, synthesis
+questions, and the single blanks, paragraphs and questions
+repair_passages.py asks for). Latency, transport errors, 429 throttling, malformed output and
+duplicate items are all configurable, so the concurrency, retry, rate-limit
+and dedup paths can be exercised on a laptop or in CI with no network.
+Like the real model under structured output, a call whose generation config
+asks for application/json never gets code fences or trailing chatter; it
+can still be cut off at the output token limit.
+
+Enable it on any generator with --fake (see add_runtime_args).
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ONSETS = ["b", "br", "c", "cl", "d", "dr", "f", "fl", "g", "gr", "h", "j", "l", "m", "n",
+          "p", "pl", "qu", "r", "s", "sc", "st", "t", "tr", "v", "w"]
+VOWELS = ["a", "e", "i", "o", "u", "ea", "ai", "ou", "io"]
+CODAS = ["", "", "n", "r", "l", "s", "t", "nt", "rd", "st", "x", "ck"]
+SUFFIXES = ["", "", "ous", "ent", "ive", "ate", "ish", "ment", "ity", "ise", "ful"]
+TOPIC_WORDS = ["garden", "river", "market", "school", "museum", "harbour", "forest", "library",
+               "festival", "village", "laboratory", "stadium", "kitchen", "island", "mountain"]
+
+
+class FakeServiceError(Exception):
+    """Simulated transport/server failure."""
+
+
+class ResourceExhausted(Exception):
+    """Simulated 429; named like google.api_core's so is_throttle_error() matches it."""
+    code = 429
+
+
+def structured(generation_config) -> bool:
+    """True if the call asked for JSON output (structured output mode)."""
+    return bool(generation_config) and generation_config.get("response_mime_type") == "application/json"
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, response_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = response_tokens
+        self.total_token_count = prompt_tokens + response_tokens
+
+
+class FakeResponse:
+    def __init__(self, text: str, prompt: str):
+        self.text = text
+        self.usage_metadata = FakeUsage(len(prompt) // 4, len(text) // 4)
+
+
+class FakeGenerativeModel:
+    """Drop-in replacement for GenerativeModel with a configurable failure mix."""
+
+    def __init__(
+        self,
+        model_name: str = "fake",
+        latency_median: float = 1.0,
+        latency_sigma: float = 0.5,
+        latency_per_item: float = 0.05,
+        max_output_tokens: int = 8192,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        duplicate_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.model_name = model_name
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.latency_per_item = latency_per_item
+        self.max_output_tokens = max_output_tokens
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.malformed_rate = malformed_rate
+        self.duplicate_rate = duplicate_rate
+        self.rng = random.Random(seed)
+        self.emitted_words: List[str] = []
+        self.emitted_items: List[Any] = []
+        self.calls = 0
+        self.builders: List[Tuple[re.Pattern, Callable[[str], Any]]] = [
+            (re.compile(r"Repair one grammar cloze blank"), self.repair_blank),
+            (re.compile(r"Rewrite one paragraph of a grammar cloze"), self.repair_paragraph),
+            (re.compile(r"Repair one reading comprehension question"), self.repair_question),
+            (re.compile(r"unique English vocabulary words"), self.vocab_batch),
+            (re.compile(r"unique English cloze passages"), self.cloze_batch),
+            (re.compile(r"grammar MCQ questions"), self.grammar_batch),
+            (re.compile(r"grammar cloze passage"), self.grammar_cloze_passage),
+            (re.compile(r"reading comprehension passage"), self.comprehension_passage),
+            (re.compile(r"Synthesis & Transformation questions"), self.synthesis_batch),
+        ]
+
+    # --- GenerativeModel interface ---
+
+    def generate_content(self, prompt: str, generation_config=None, **kwargs) -> FakeResponse:
+        text, latency = self.respond(prompt)
+        time.sleep(latency)
+        return self.finish(text, prompt, structured(generation_config))
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False, **kwargs):
+        text, latency = self.respond(prompt)
+        if stream:
+            return self.stream_chunks(text, prompt, latency, structured(generation_config))
+        await asyncio.sleep(latency)
+        return self.finish(text, prompt, structured(generation_config))
+
+    async def stream_chunks(self, text: str, prompt: str, latency: float, json_only: bool = False,
+                            chunks: int = 8):
+        """Yield the response in pieces; a transport error can cut the stream off midway."""
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            await asyncio.sleep(latency / chunks)
+            raise ResourceExhausted("429 Quota exceeded (fake)")
+        drop_after = self.rng.randint(0, chunks - 1) if roll < self.throttle_rate + self.error_rate else None
+        if not json_only and self.rng.random() < self.malformed_rate:
+            text = self.malform(text)
+        step = max(1, -(-len(text) // chunks))
+        for n, start in enumerate(range(0, len(text), step)):
+            await asyncio.sleep(latency / chunks)
+            if n == drop_after:
+                raise FakeServiceError("503 Stream reset (fake)")
+            yield FakeResponse(text[start:start + step], prompt)
+
+    # --- Simulation ---
+
+    def respond(self, prompt: str) -> Tuple[str, float]:
+        self.calls += 1
+        payload = self.build(prompt)
+        items = len(payload) if isinstance(payload, list) else 1
+        text = json.dumps(payload, indent=2, ensure_ascii=False)
+        # Like the real model, output stops at the token limit mid-JSON
+        limit = self.max_output_tokens * 4
+        if len(text) > limit:
+            items = items * limit / len(text)
+            text = text[:limit]
+        latency = self.rng.lognormvariate(0, self.latency_sigma) * self.latency_median
+        latency += items * self.latency_per_item
+        return text, latency
+
+    def finish(self, text: str, prompt: str, json_only: bool = False) -> FakeResponse:
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            raise ResourceExhausted("429 Quota exceeded (fake)")
+        if roll < self.throttle_rate + self.error_rate:
+            raise FakeServiceError("503 Service unavailable (fake)")
+        if not json_only and self.rng.random() < self.malformed_rate:
+            text = self.malform(text)
+        elif not json_only and self.rng.random() < 0.3:
+            text = f"```json\n{text}\n```"
+        return FakeResponse(text, prompt)
+
+    def malform(self, text: str) -> str:
+        """Truncate mid-output or append chatter, like a cut-off or chatty model."""
+        if self.rng.random() < 0.7:
+            return text[: self.rng.randint(1, max(1, len(text) - 1))]
+        return text + "\n\nI hope these help with your students!"
+
+    def build(self, prompt: str) -> Any:
+        for pattern, builder in self.builders:
+            if pattern.search(prompt):
+                return builder(prompt)
+        return []
+
+    def maybe_duplicate(self, item: Any) -> Any:
+        if self.emitted_items and self.rng.random() < self.duplicate_rate:
+            return json.loads(json.dumps(self.rng.choice(self.emitted_items)))
+        self.emitted_items.append(item)
+        return item
+
+    # --- Prompt parsing helpers ---
+
+    @staticmethod
+    def count(prompt: str, default: int = 1) -> int:
+        match = re.search(r"Generate (\d+)", prompt)
+        return int(match.group(1)) if match else default
+
+    @staticmethod
+    def field(prompt: str, label: str, default: str = "") -> str:
+        match = re.search(rf"{label}:\**\s*([^\n]+)", prompt)
+        return match.group(1).strip() if match else default
+
+    def difficulty(self, prompt: str, default: int = 5) -> int:
+        match = re.search(r"Difficulty(?: Level)?:\**\s*(\d+)", prompt)
+        return int(match.group(1)) if match else default
+
+    # --- Content ---
+
+    def word(self, reuse: bool = False, letters: str = "", exclude: frozenset = frozenset()) -> str:
+        """
+        A pronounceable pseudo-word, starting with one of `letters` if given.
+        
+        With `reuse`, sometimes an earlier word instead; like the real model
+        it mostly steers clear of the words it was told to avoid.
+        """
+        if reuse and self.emitted_words and self.rng.random() < self.duplicate_rate:
+            pool = [w for w in self.emitted_words if not letters or w[0] in letters]
+            if pool and self.rng.random() < 0.8:
+                pool = [w for w in pool if w not in exclude]
+            if pool:
+                return self.rng.choice(pool)
+        syllables = self.rng.randint(1, 3)
+        w = "".join(self.rng.choice(ONSETS) + self.rng.choice(VOWELS) for _ in range(syllables))
+        w += self.rng.choice(CODAS) + self.rng.choice(SUFFIXES)
+        if letters and w[0] not in letters:
+            w = self.rng.choice(letters) + w
+        self.emitted_words.append(w)
+        return w
+
+    def sentence(self, blank: str = "") -> str:
+        place = self.rng.choice(TOPIC_WORDS)
+        return f"Everyone at the {place} agreed that the plan was {blank or self.word()} and worth trying again."
+
+    def options(self, answer: str) -> Tuple[Dict[str, str], int]:
+        opts = [answer] + [self.word() for _ in range(3)]
+        self.rng.shuffle(opts)
+        return {str(i + 1): o for i, o in enumerate(opts)}, opts.index(answer) + 1
+
+    def vocab_batch(self, prompt: str) -> List[Dict]:
+        themes = [t.strip() for t in self.field(prompt, r"applicable themes from", "General").split(",")]
+        match = re.search(r"must start with (?:the letter|one of the letters) ([^\n]+)", prompt)
+        letters = "".join(re.findall(r"'(\w)'", match.group(1))) if match else ""
+        exclude = frozenset(self.field(prompt, r"not in this list").rstrip(")").split(", "))
+        items = []
+        for _ in range(self.count(prompt)):
+            items.append({
+                "word": self.word(reuse=True, letters=letters, exclude=exclude),
+                "themes": self.rng.sample(themes, min(len(themes), self.rng.randint(1, 3))),
+                "definition": f"Describing something that is {self.word()} or {self.word()}.",
+                "example": self.sentence("_____"),
+                "distractors": [self.word() for _ in range(3)],
+            })
+        return items
+
+    def blank(self, blank_id: int, **extra) -> Dict:
+        answer = self.word()
+        opts = [answer] + [self.word() for _ in range(3)]
+        self.rng.shuffle(opts)
+        return {"id": blank_id, "answer": answer, "options": opts, **extra}
+
+    def cloze_batch(self, prompt: str) -> List[Dict]:
+        theme = self.field(prompt, "Theme", "General")
+        passages = []
+        for _ in range(self.count(prompt)):
+            blank_id = 0
+            paragraphs = []
+            for _ in range(self.rng.randint(2, 4)):
+                blanks = []
+                sentences = []
+                for _ in range(self.rng.randint(2, 3)):
+                    blank_id += 1
+                    blanks.append(self.blank(blank_id))
+                    sentences.append(self.sentence(f"__{blank_id}__"))
+                paragraphs.append({"text": " ".join(sentences), "blanks": blanks})
+            passages.append(self.maybe_duplicate({
+                "title": f"The {self.word().title()} of the {self.rng.choice(TOPIC_WORDS).title()}",
+                "theme": theme,
+                "paragraphs": paragraphs,
+            }))
+        return passages
+
+    def grammar_batch(self, prompt: str) -> List[Dict]:
+        subunit = self.field(prompt, "Grammar Topic", "Grammar")
+        low, high = (int(x) for x in re.search(r"Difficulty Range: (\d+)-(\d+)", prompt).groups())
+        questions = []
+        for _ in range(self.count(prompt, 20)):
+            answer = self.word()
+            options, index = self.options(answer)
+            questions.append(self.maybe_duplicate({
+                "question": self.sentence("________"),
+                "options": options,
+                "answer": answer,
+                "answer_index": index,
+                "subunit": subunit,
+                "difficulty": self.rng.randint(low, high),
+                "explanation": f"'{answer}' is correct because it agrees with the subject.",
+                "example": self.sentence(answer),
+            }))
+        return questions
+
+    def grammar_cloze_passage(self, prompt: str) -> Dict:
+        topics = re.findall(r"Paragraph \d+: ([^\n]+)", prompt) or ["Grammar"] * 5
+        paragraphs = []
+        for p, topic in enumerate(topics):
+            ids = [p * 2 + 1, p * 2 + 2]
+            text = " ".join([self.sentence(f"__{ids[0]}__"), self.sentence(), self.sentence(f"__{ids[1]}__"),
+                             self.sentence()])
+            blanks = [self.blank(i, subunit=topic.strip(), explanation="It fits the tense of the sentence.")
+                      for i in ids]
+            paragraphs.append({"text": text, "blanks": blanks})
+        return self.maybe_duplicate({"title": f"A Day at the {self.rng.choice(TOPIC_WORDS).title()}",
+                                     "paragraphs": paragraphs})
+
+    def comprehension_question(self, question_id: int) -> Dict:
+        answer = f"Because it was {self.word()}"
+        opts = [answer] + [f"Because it was {self.word()}" for _ in range(3)]
+        self.rng.shuffle(opts)
+        return {
+            "id": question_id,
+            "question": f"Why did the villagers return to the {self.rng.choice(TOPIC_WORDS)}?",
+            "options": {str(i + 1): o for i, o in enumerate(opts)},
+            "answer": answer,
+            "answer_index": opts.index(answer) + 1,
+            "explanation": "The second paragraph explains the reason directly.",
+        }
+
+    def comprehension_passage(self, prompt: str) -> Dict:
+        difficulty = self.difficulty(prompt)
+        theme = self.field(prompt, "Theme", "General")
+        match = re.search(r"with (\d+) multiple-choice questions", prompt)
+        num_questions = int(match.group(1)) if match else 5
+        passage = "\n\n".join(" ".join(self.sentence() for _ in range(4)) for _ in range(3))
+        questions = [self.comprehension_question(q + 1) for q in range(num_questions)]
+        return self.maybe_duplicate({"title": f"The {self.word().title()} Summer", "difficulty": difficulty,
+                                     "theme": theme, "passage": passage, "questions": questions})
+
+    def repair_blank(self, prompt: str) -> Dict:
+        blank_id = int(re.search(r"for blank __(\d+)__", prompt).group(1))
+        return self.blank(blank_id, subunit=self.field(prompt, "Grammar Topic", "Grammar"),
+                          explanation="It fits the tense of the sentence.")
+
+    def repair_paragraph(self, prompt: str) -> Dict:
+        markers = re.search(r"The paragraph with the blanks marked ([^\n]+)", prompt).group(1)
+        ids = [int(i) for i in re.findall(r"__(\d+)__", markers)]
+        subunit = self.field(prompt, "Grammar Topic", "Grammar")
+        text = " ".join(self.sentence(f"__{i}__") for i in ids)
+        return {"text": text, "blanks": [self.blank(i, subunit=subunit, explanation="It agrees with the subject.")
+                                         for i in ids]}
+
+    def repair_question(self, prompt: str) -> Dict:
+        return self.comprehension_question(int(re.search(r'"id": (\d+)', prompt).group(1)))
+
+    def synthesis_batch(self, prompt: str) -> List[Dict]:
+        subcategory = self.field(prompt, r"\*\*Subcategory", "Synthesis")
+        category = self.field(prompt, r"\*\*Category", "Synthesis")
+        difficulty = int(self.field(prompt, r"\*\*Difficulty", "5").split("/")[0])
+        triggers = re.findall(r'"([^"]+)"', self.field(prompt, r"\*\*Key Triggers/Connectors", '"Although"'))
+        questions = []
+        for n in range(self.count(prompt, 30)):
+            trigger = self.rng.choice(triggers or ["Although"])
+            first = f"the {self.rng.choice(TOPIC_WORDS)} was {self.word()}"
+            second = f"we visited the {self.rng.choice(TOPIC_WORDS)}"
+            questions.append(self.maybe_duplicate({
+                "id": n + 1,
+                "question": f"{first.capitalize()}. {second.capitalize()}.",
+                "answer": f"{trigger} {first}, {second}.",
+                "subcategory": subcategory,
+                "category": category,
+                "difficulty": difficulty,
+                "trigger_used": trigger,
+            }))
+        return questions
@@ -0,0 +1,90 @@
+"""
+Append-only JSONL checkpoint journal.
+
+Generators used to rewrite their whole output JSON after every batch, which
+makes I/O grow quadratically over a run. Instead, accepted items are
+appended to `<output>.journal.jsonl` one line each, with fsync batched
+every `fsync_every` records or `fsync_interval` seconds. On restart the
+journal is replayed to resume where the crash left off, and at the end
+`compact()` writes the canonical JSON file once and removes the journal.
+"""
+
+import json
+import os
+import time
+from typing import Any, Iterable, List, Optional
+
+
+def journal_path(output_file: str) -> str:
+    return output_file + ".journal.jsonl"
+
+
+class Journal:
+    """Append-only record of accepted items for one output file."""
+
+    def __init__(self, output_file: str, fsync_every: int = 50, fsync_interval: float = 5.0):
+        self.output_file = output_file
+        self.path = journal_path(output_file)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.file = None
+
+    def replay(self) -> List[Any]:
+        """Return every complete record, dropping a torn last line from a crash."""
+        if not os.path.exists(self.path):
+            return []
+        items = []
+        good_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                good_bytes += len(line)
+        if good_bytes < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good_bytes)
+        return items
+
+    def append(self, item: Any):
+        self.extend([item])
+
+    def extend(self, items: Iterable[Any]):
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        for item in items:
+            self.file.write(json.dumps(item, ensure_ascii=False) + "\n")
+            self.pending += 1
+        self.file.flush()
+        if self.pending >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.file is not None and self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def compact(self, items: List[Any], indent: Optional[int] = 2, ensure_ascii: bool = True):
+        """Write `items` as the canonical JSON output, then drop the journal."""
+        self.close()
+        tmp = self.output_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(items, f, indent=indent, ensure_ascii=ensure_ascii)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.output_file)
+        if os.path.exists(self.path):
+            os.remove(self.path)
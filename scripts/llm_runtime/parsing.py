@@ -0,0 +1,156 @@
+"""Helpers for turning model output into JSON."""
+
+import json
+from typing import Any
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding ```json ... ``` block if the model added one."""
+    text = text.strip()
+    if text.startswith("```"):
+        parts = text.split("```")
+        if len(parts) >= 2:
+            text = parts[1]
+            if text.startswith("json"):
+                text = text[4:]
+    return text.strip()
+
+
+def parse_json_response(text: str) -> Any:
+    """Parse a model response as JSON, tolerating markdown code fences."""
+    return json.loads(strip_code_fences(text))
+
+
+class ParsedItems(list):
+    """Items recovered from a JSON array response, with salvage counters."""
+
+    def __init__(self, items=(), salvaged: int = 0, lost: int = 0):
+        super().__init__(items)
+        self.salvaged = salvaged  # items kept from a response that was not valid JSON as a whole
+        self.lost = lost          # elements that were malformed or cut off
+
+
+class StreamingArrayParser:
+    """
+    Incrementally pulls complete elements out of a JSON array.
+
+    feed() accepts text as it arrives and returns every element that became
+    complete, so items are usable as soon as they are readable. One malformed
+    element only loses that element, and a truncated response keeps every
+    element before the cut. Text before the opening '[' (prose, ``` fences)
+    is skipped; if the first bracket is '{' the response is not an array and
+    `not_array` is set so the caller can fall back to a plain parse.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.started = False
+        self.finished = False
+        self.not_array = False
+        self.item_start = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.items = []
+        self.lost = 0
+        self.damaged = False
+
+    def finish_item(self, raw: str, new: list):
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError:
+            self.lost += 1
+            self.damaged = True
+            return
+        self.items.append(item)
+        new.append(item)
+
+    def feed(self, chunk: str) -> list:
+        new = []
+        buf = self.buffer + chunk
+        i = self.pos
+        while i < len(buf) and not (self.finished or self.not_array):
+            c = buf[i]
+            if not self.started:
+                if c == "[":
+                    self.started = True
+                elif c == "{":
+                    self.not_array = True
+                i += 1
+                continue
+            if self.item_start is None:
+                if c in " \t\r\n,":
+                    i += 1
+                    continue
+                if c == "]":
+                    self.finished = True
+                    i += 1
+                    continue
+                self.item_start = i
+                self.depth = 0
+                self.in_string = False
+                self.escape = False
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c in "{[":
+                self.depth += 1
+            elif c in "}]":
+                if self.depth == 0:
+                    # A scalar element closed by the array's own ']'
+                    self.finish_item(buf[self.item_start:i], new)
+                    self.item_start = None
+                    self.finished = c == "]"
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self.finish_item(buf[self.item_start:i + 1], new)
+                        self.item_start = None
+            elif c == "," and self.depth == 0:
+                self.finish_item(buf[self.item_start:i], new)
+                self.item_start = None
+            i += 1
+
+        # Keep only the unfinished element in memory
+        keep_from = i if self.item_start is None else self.item_start
+        self.buffer = buf[keep_from:]
+        self.pos = i - keep_from
+        if self.item_start is not None:
+            self.item_start = 0
+        return new
+
+    def close(self) -> ParsedItems:
+        if self.item_start is not None and self.buffer[self.item_start:].strip():
+            self.lost += 1
+            self.damaged = True
+        if self.started and not self.finished:
+            self.damaged = True
+        return ParsedItems(self.items, salvaged=len(self.items) if self.damaged else 0, lost=self.lost)
+
+
+def parse_json_items(text: str) -> ParsedItems:
+    """
+    Parse an array response element by element, salvaging what is readable.
+
+    A single object is wrapped in a list. Raises ValueError only when nothing
+    at all could be recovered, so the runner retries the call.
+    """
+    parser = StreamingArrayParser()
+    parser.feed(text)
+    if not parser.started:
+        data = parse_json_response(text)
+        return ParsedItems(data if isinstance(data, list) else [data])
+    items = parser.close()
+    if not items:
+        raise ValueError(f"no complete items in response ({items.lost} malformed or truncated)")
+    return items
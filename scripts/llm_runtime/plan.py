@@ -0,0 +1,27 @@
+"""
+Generation plans written by scripts/plan_generation.py.
+
+A plan file holds, per bank, the cells that are short of their quota and by
+how much, e.g. {"difficulty": 1, "theme": "Mathematics", "count": 37} for
+vocab, {"subunit_id": 33, "count": 20} for grammar or {"subcategory":
+"Statements", "count": 10} for synthesis. A generator run with
+--plan asks only for those items instead of its fixed targets.
+"""
+
+import argparse
+import json
+from typing import Any, Dict, List
+
+
+def add_plan_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--plan", default=None, metavar="PATH",
+                        help="Only generate what this plan says is missing (see plan_generation.py)")
+
+
+def load_plan(path: str, bank: str) -> List[Dict[str, Any]]:
+    """The job list for `bank` from a plan file; an empty list if the bank is already full."""
+    with open(path, encoding="utf-8") as f:
+        plan = json.load(f)
+    if bank not in plan.get("banks", {}):
+        raise SystemExit(f"{path} has no plan for '{bank}' (planned: {', '.join(plan.get('banks', {})) or 'none'})")
+    return [job for job in plan["banks"][bank]["jobs"] if job.get("count", 0) > 0]
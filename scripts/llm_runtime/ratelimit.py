@@ -0,0 +1,127 @@
+"""
+Quota-aware adaptive rate limiting.
+
+Two token buckets pace calls against a requests/min and a tokens/min
+budget. Callers reserve capacity before each call and sleep off any debt, so
+concurrent workers are spaced out instead of bursting.
+
+The configured budgets are ceilings (set them to the project quota). Pacing
+is AIMD: a 429 / ResourceExhausted halves the current rates (at most once per
+cooldown, since a burst of in-flight calls tends to fail together), and
+successful calls raise them again linearly over time until the ceiling is
+reached, so throughput settles just under whatever the service allows.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+DEFAULT_RPM = 300
+DEFAULT_TPM = 1_000_000
+
+THROTTLE_ERRORS = {"ResourceExhausted", "TooManyRequests"}
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """True for quota/throttling errors from the Vertex AI client."""
+    if type(exc).__name__ in THROTTLE_ERRORS:
+        return True
+    code = getattr(exc, "code", None)
+    return code == 429 or getattr(code, "value", None) == 429
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English)."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Leaky-bucket reservation: reserving beyond the level puts it in debt."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 1.0):
+        self.per_minute = per_minute
+        self.burst_seconds = burst_seconds
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        return max(1.0, self.per_minute / 60 * self.burst_seconds)
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` and return how long to wait before it is covered."""
+        self.refill(now)
+        self.level -= amount
+        return max(0.0, -self.level * 60 / self.per_minute)
+
+    def drain(self):
+        self.level = min(self.level, 0.0)
+
+
+class AdaptiveRateLimiter:
+    """Paces calls to requests/min and tokens/min ceilings with AIMD backoff."""
+
+    def __init__(self, rpm: float = DEFAULT_RPM, tpm: Optional[float] = DEFAULT_TPM,
+                 decrease: float = 0.5, increase_per_sec: float = 0.02, floor: float = 0.05,
+                 cooldown: float = 2.0):
+        self.max_rpm = rpm
+        self.max_tpm = tpm
+        self.decrease = decrease
+        self.increase_per_sec = increase_per_sec
+        self.floor = floor
+        self.cooldown = cooldown
+        self.scale = 1.0
+        self.adjusted = time.monotonic()
+        self.last_throttle = float("-inf")
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.throttles = 0
+        self.waited = 0.0
+        self.lowest_scale = 1.0
+
+    def apply_scale(self):
+        self.requests.per_minute = self.max_rpm * self.scale
+        if self.tokens is not None:
+            self.tokens.per_minute = self.max_tpm * self.scale
+
+    async def acquire(self, tokens: int = 1):
+        now = time.monotonic()
+        delay = self.requests.reserve(1, now)
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(tokens, now))
+        if delay > 0:
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+    def on_success(self, response_tokens: int = 0):
+        """Charge the response tokens and creep back towards the ceiling."""
+        now = time.monotonic()
+        if self.tokens is not None and response_tokens:
+            self.tokens.reserve(response_tokens, now)
+        if self.scale < 1.0:
+            self.scale = min(1.0, self.scale + self.increase_per_sec * (now - self.adjusted))
+            self.apply_scale()
+        self.adjusted = now
+
+    def on_throttle(self):
+        """Back off multiplicatively and stop the current burst."""
+        self.throttles += 1
+        now = time.monotonic()
+        if now - self.last_throttle >= self.cooldown:
+            self.last_throttle = now
+            self.scale = max(self.floor, self.scale * self.decrease)
+            self.lowest_scale = min(self.lowest_scale, self.scale)
+            self.apply_scale()
+        self.adjusted = now
+        self.requests.drain()
+        if self.tokens is not None:
+            self.tokens.drain()
+
+    def summary(self) -> str:
+        tpm = f", {self.max_tpm * self.scale:,.0f}/{self.max_tpm:,.0f} tokens/min" if self.tokens else ""
+        return (f"Rate limit: {self.throttles} throttles, now {self.max_rpm * self.scale:.0f}/{self.max_rpm:.0f} "
+                f"req/min{tpm} (lowest {self.lowest_scale:.0%}), {self.waited:.1f}s spent waiting")
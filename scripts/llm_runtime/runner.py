@@ -0,0 +1,563 @@
+"""
+Bounded-concurrency job runner.
+
+A Job is one prompt plus the metadata its script needs to post-process the
+answer. JobRunner keeps up to `concurrency` jobs in flight, retries failed
+calls (transport errors and unparseable output alike) with jittered
+exponential backoff, and hands every finished JobResult to a handler.
+
+Jobs are pulled from the input iterable lazily, only when a slot frees up,
+so a generator can build each prompt from the latest shared state. The
+input may also be an async iterator, and the handler a coroutine function,
+so a source or handler that does blocking I/O (the work queue's SQLite
+calls) can move it off the event loop with asyncio.to_thread. The handler
+runs on the event loop thread one result at a time, which means it can
+update seen-word sets, id counters and output lists without locks. It may
+return follow-up jobs, which are dispatched before the rest of the input.
+
+Jobs with `stream=True` (the ones returning a JSON array) are read as a
+stream through StreamingArrayParser: if the connection drops after some
+elements have arrived, the call still succeeds with what was readable, and
+parse_json_items keeps every good element of a truncated or partly malformed
+array. Salvaged and lost element counts are reported in RunStats.
+
+With structured output on (--structured), a job that carries a response
+schema is sent with response_mime_type application/json and that schema,
+so the model is constrained to emit parseable JSON of the right shape.
+RunStats counts responses that still could not be parsed, or only in part,
+as the parse failure rate.
+
+With hedging on, a call still running past the given percentile of recent
+call latencies gets a duplicate request. Whichever answer arrives first wins
+and the other is cancelled, so a single straggler no longer sets the pace.
+Duplicates are capped at `hedge_budget` of all calls.
+"""
+
+import argparse
+import asyncio
+import inspect
+import os
+import random
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .cache import DEFAULT_CACHE_FILE, DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_MB, ResponseCache, make_key
+from .client import generate_text, get_model, stream_text
+from .fake_model import FakeGenerativeModel
+from .parsing import ParsedItems, StreamingArrayParser, parse_json_response
+from .ratelimit import DEFAULT_RPM, DEFAULT_TPM, AdaptiveRateLimiter, estimate_tokens, is_throttle_error
+from .telemetry import DEFAULT_TELEMETRY_FILE, Telemetry
+
+DEFAULT_MODEL = "gemini-2.0-flash-001"
+DEFAULT_CONCURRENCY = 5
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_BUDGET = 0.1
+HEDGE_MIN_SAMPLES = 10
+
+
+@dataclass
+class Job:
+    """One model call: a prompt, how to parse the reply, and script metadata."""
+    key: str
+    prompt: str
+    meta: Dict[str, Any] = field(default_factory=dict)
+    parse: Callable[[str], Any] = parse_json_response
+    params: Dict[str, Any] = field(default_factory=dict)  # generation config
+    stream: bool = False  # read the reply as a stream of JSON array elements
+    schema: Optional[Dict[str, Any]] = None  # response_schema used when structured output is on
+
+
+@dataclass
+class JobResult:
+    """Outcome of a job after all retries."""
+    job: Job
+    seq: int
+    data: Any = None
+    text: Optional[str] = None
+    error: Optional[Exception] = None
+    attempts: int = 0
+    latency: float = 0.0
+    cached: bool = False
+    telemetry: Optional[Telemetry] = field(default=None, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def report(self, accepted: int, rejected: Optional[Dict[str, int]] = None, **fields: Any):
+        """Log how many items the script kept from this job and why it dropped the rest."""
+        if self.telemetry is not None:
+            self.telemetry.items(self.job.key, accepted, rejected, seq=self.seq,
+                                 difficulty=self.job.meta.get("difficulty"), theme=self.job.meta.get("theme"),
+                                 **fields)
+
+
+# Called with every finished result; may return follow-up jobs, directly or from a coroutine
+Handler = Callable[[JobResult], Union[Optional[Iterable[Job]], Awaitable[Optional[Iterable[Job]]]]]
+
+
+@dataclass
+class RunStats:
+    """Counters for one runner invocation."""
+    jobs: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    calls: int = 0
+    cached: int = 0
+    damaged: int = 0   # responses that were truncated or partly malformed
+    salvaged: int = 0  # items recovered from those responses
+    lost: int = 0      # elements that could not be recovered
+    hedges: int = 0    # duplicate requests sent for slow calls
+    hedge_wins: int = 0
+    responses: int = 0     # model replies received (not from cache)
+    parse_errors: int = 0  # replies that could not be parsed at all
+    latencies: List[float] = field(default_factory=list)  # per successful job, retries included
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished if self.finished is not None else time.monotonic()
+        return max(end - self.started, 1e-6)
+
+    def per_minute(self, count: int) -> float:
+        return count * 60 / self.elapsed
+
+    def percentile(self, pct: float) -> float:
+        return percentile(sorted(self.latencies), pct)
+
+    @property
+    def parse_failure_rate(self) -> float:
+        """Share of model replies that were unparseable or only partly parseable."""
+        return (self.parse_errors + self.damaged) / self.responses if self.responses else 0.0
+
+    def record_parse(self, data: Any):
+        if isinstance(data, ParsedItems) and (data.salvaged or data.lost):
+            self.damaged += 1
+            self.salvaged += data.salvaged
+            self.lost += data.lost
+
+    def summary(self) -> str:
+        text = (f"{self.succeeded}/{self.jobs} jobs succeeded, {self.failed} failed, "
+                f"{self.calls} model calls, {self.cached} from cache in {self.elapsed:.1f}s")
+        if self.damaged:
+            text += (f"; salvaged {self.salvaged} items from {self.damaged} damaged responses "
+                     f"({self.lost} lost)")
+        if self.responses:
+            text += (f"; parse failure rate {self.parse_failure_rate:.1%} "
+                     f"({self.parse_errors} unparseable, {self.damaged} damaged of {self.responses})")
+        if self.latencies:
+            text += f"; job latency p50 {self.percentile(50):.1f}s, p99 {self.percentile(99):.1f}s"
+        if self.hedges:
+            text += f"; {self.hedges} hedged calls, {self.hedge_wins} won by the duplicate"
+        return text
+
+
+class JobRunner:
+    """Runs jobs against one model with bounded concurrency and retries."""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        model=None,
+        cache: Optional[ResponseCache] = None,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+        telemetry: Optional[Telemetry] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_budget: float = DEFAULT_HEDGE_BUDGET,
+        structured: bool = False,
+    ):
+        self.model_name = model_name
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache
+        self.limiter = limiter
+        self.telemetry = telemetry
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.structured = structured
+        self.call_latencies = deque(maxlen=200)
+        self.stats = RunStats()
+        self.samples = Counter()
+
+    def params(self, job: Job) -> Dict[str, Any]:
+        """The job's generation config, with its response schema added when structured output is on."""
+        if not (self.structured and job.schema):
+            return job.params
+        return {**job.params, "response_mime_type": "application/json", "response_schema": job.schema}
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (0-based) attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def hedge_after(self) -> Optional[float]:
+        """Seconds after which a call gets a duplicate, or None if hedging is off or out of budget."""
+        if not self.hedge_percentile or len(self.call_latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        if self.stats.hedges >= self.hedge_budget * self.stats.calls:
+            return None
+        return percentile(sorted(self.call_latencies), self.hedge_percentile)
+
+    async def call(self, job: Job) -> Tuple[str, float]:
+        """One model call, hedged with a duplicate request if it runs long; returns (text, latency)."""
+        delay = self.hedge_after()
+        if delay is None:
+            return await self.attempt(job)
+        tasks = [asyncio.ensure_future(self.attempt(job))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or self.hedge_after() is None:
+                return await tasks[0]
+            self.stats.hedges += 1
+            self.stats.calls += 1
+            tasks.append(asyncio.ensure_future(self.attempt(job)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=tasks.index):
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+            raise tasks[0].exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # mark the loser's error as retrieved
+
+    async def attempt(self, job: Job) -> Tuple[str, float]:
+        """Send the prompt once, after any rate-limit wait; latency excludes that wait."""
+        if self.limiter is not None:
+            await self.limiter.acquire(estimate_tokens(job.prompt))
+        started = time.monotonic()
+        try:
+            if job.stream:
+                text = await self.call_streaming(job)
+            else:
+                text = await generate_text(self.model, job.prompt, self.params(job))
+        except Exception as e:
+            if self.limiter is not None and is_throttle_error(e):
+                self.limiter.on_throttle()
+            raise
+        if self.limiter is not None:
+            self.limiter.on_success(estimate_tokens(text))
+        latency = time.monotonic() - started
+        self.call_latencies.append(latency)
+        return text, latency
+
+    async def call_streaming(self, job: Job) -> str:
+        """Stream the reply; keep the partial text if the stream breaks after complete items."""
+        parser = StreamingArrayParser()
+        chunks = []
+        try:
+            async for chunk in stream_text(self.model, job.prompt, self.params(job)):
+                chunks.append(chunk)
+                parser.feed(chunk)
+        except Exception as e:
+            if not parser.items or is_throttle_error(e):
+                raise
+            print(f"  [{job.key}] stream broke after {len(parser.items)} items ({e}); keeping them")
+        return "".join(chunks)
+
+    def cache_key(self, job: Job) -> str:
+        """Key for this job, numbering repeats of an identical prompt within the run."""
+        params = self.params(job)
+        prompt_key = make_key(self.model_name, job.prompt, params)
+        sample = self.samples[prompt_key]
+        self.samples[prompt_key] += 1
+        return make_key(self.model_name, job.prompt, params, sample)
+
+    def from_cache(self, result: JobResult, key: str) -> bool:
+        text = self.cache.get(key)
+        if text is None:
+            return False
+        try:
+            result.data = result.job.parse(text)
+        except Exception:
+            self.cache.discard(key)
+            return False
+        result.text = text
+        result.cached = True
+        self.stats.cached += 1
+        self.log_call(result, "cached", 0.0, text)
+        return True
+
+    def log_call(self, result: JobResult, outcome: str, latency: float, text: Optional[str],
+                 error: Optional[Exception] = None, hedged: bool = False):
+        if self.telemetry is None:
+            return
+        job = result.job
+        record = {
+            "job": job.key,
+            "seq": result.seq,
+            "attempt": result.attempts,
+            "difficulty": job.meta.get("difficulty"),
+            "theme": job.meta.get("theme"),
+            "model": self.model_label,
+            "outcome": outcome,
+            "latency": round(latency, 3),
+            "prompt_chars": len(job.prompt),
+            "prompt_tokens": estimate_tokens(job.prompt),
+            "response_chars": len(text) if text is not None else 0,
+            "response_tokens": estimate_tokens(text) if text else 0,
+        }
+        if "slice" in job.meta:
+            record["slice"] = job.meta["slice"]
+        if self.structured and job.schema:
+            record["structured"] = True
+        if outcome in ("ok", "salvaged", "cached") and isinstance(result.data, list):
+            record["items"] = len(result.data)
+        if isinstance(result.data, ParsedItems) and outcome == "salvaged":
+            record["salvaged"] = result.data.salvaged
+            record["lost"] = result.data.lost
+        if hedged:
+            record["hedged"] = True
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"[:300]
+        self.telemetry.write("call", **record)
+
+    @property
+    def model_label(self) -> str:
+        if isinstance(self.model, FakeGenerativeModel):
+            return f"fake:{self.model_name}"
+        return self.model_name
+
+    async def execute(self, job: Job, seq: int) -> JobResult:
+        result = JobResult(job=job, seq=seq, telemetry=self.telemetry)
+        started = time.monotonic()
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache_key(job)
+            if self.from_cache(result, cache_key):
+                result.latency = time.monotonic() - started
+                return result
+        for attempt in range(self.max_retries + 1):
+            result.attempts = attempt + 1
+            self.stats.calls += 1
+            latency = None
+            attempt_started = time.monotonic()
+            hedges = self.stats.hedges
+            result.text = None
+            try:
+                result.text, latency = await self.call(job)
+                self.stats.responses += 1
+                result.data = job.parse(result.text)
+                result.error = None
+                self.stats.record_parse(result.data)
+                damaged = isinstance(result.data, ParsedItems) and (result.data.salvaged or result.data.lost)
+                # A truncated or partly malformed reply is used but not cached, so a later run asks again
+                if cache_key is not None and not damaged:
+                    self.cache.put(cache_key, self.model_name, result.text)
+                self.log_call(result, "salvaged" if damaged else "ok", latency, result.text,
+                              hedged=self.stats.hedges > hedges)
+                break
+            except Exception as e:
+                result.error = e
+                if is_throttle_error(e):
+                    outcome = "throttled"
+                elif result.text is not None:
+                    outcome = "parse_error"
+                    self.stats.parse_errors += 1
+                else:
+                    outcome = "error"
+                if latency is None:
+                    latency = time.monotonic() - attempt_started
+                self.log_call(result, outcome, latency, result.text, e, hedged=self.stats.hedges > hedges)
+                if attempt == self.max_retries:
+                    break
+                delay = self.backoff(attempt)
+                print(f"  [{job.key}] attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        result.latency = time.monotonic() - started
+        return result
+
+    async def run(self, jobs: Union[Iterable[Job], AsyncIterator[Job]], handle: Optional[Handler] = None) -> RunStats:
+        if self.model is None:
+            self.model = get_model(self.model_name)
+
+        self.stats = stats = RunStats()
+        source = jobs if hasattr(jobs, "__anext__") else iter(jobs)
+        followups = deque()
+        in_flight = set()
+        seq = 0
+
+        try:
+            while True:
+                while len(in_flight) < self.concurrency:
+                    if followups:
+                        job = followups.popleft()
+                    else:
+                        job = await next_job(source)
+                        if job is None:
+                            break
+                    in_flight.add(asyncio.create_task(self.execute(job, seq)))
+                    seq += 1
+                    stats.jobs += 1
+
+                if not in_flight:
+                    break
+
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t.result().seq):
+                    result = task.result()
+                    if result.ok:
+                        stats.succeeded += 1
+                        if not result.cached:
+                            stats.latencies.append(result.latency)
+                    else:
+                        stats.failed += 1
+                        print(f"  [{result.job.key}] FAILED after {result.attempts} attempts: {result.error}")
+                    if handle is not None:
+                        extra = handle(result)
+                        if inspect.isawaitable(extra):
+                            extra = await extra
+                        if extra:
+                            followups.extend(extra)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            stats.finished = time.monotonic()
+            if self.telemetry is not None:
+                self.telemetry.write(
+                    "run", model=self.model_label, concurrency=self.concurrency, jobs=stats.jobs,
+                    succeeded=stats.succeeded, failed=stats.failed, calls=stats.calls, cached=stats.cached,
+                    hedges=stats.hedges, responses=stats.responses, parse_errors=stats.parse_errors,
+                    damaged=stats.damaged, structured=self.structured, elapsed=round(stats.elapsed, 3),
+                )
+            if self.cache is not None:
+                print(self.cache.summary())
+            if self.limiter is not None:
+                print(self.limiter.summary())
+
+        return stats
+
+
+async def next_job(source) -> Optional[Job]:
+    """The next job from a plain or async iterator, or None when it is used up."""
+    if hasattr(source, "__anext__"):
+        try:
+            return await source.__anext__()
+        except StopAsyncIteration:
+            return None
+    return next(source, None)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+
+def run_jobs(jobs: Union[Iterable[Job], AsyncIterator[Job]], handle: Optional[Handler] = None,
+             **options) -> RunStats:
+    """Run `jobs` to completion, passing each result to `handle`."""
+    return asyncio.run(JobRunner(**options).run(jobs, handle))
+
+
+def collect_results(jobs: Iterable[Job], **options) -> List[JobResult]:
+    """Run `jobs` and return their results in submission order."""
+    results = []
+    stats = run_jobs(jobs, results.append, **options)
+    print(stats.summary())
+    results.sort(key=lambda r: r.seq)
+    return results
+
+
+def add_runtime_args(parser: argparse.ArgumentParser, concurrency: int = DEFAULT_CONCURRENCY):
+    """Add the runner tuning flags shared by every generator."""
+    group = parser.add_argument_group("runtime")
+    group.add_argument("--concurrency", type=int, default=concurrency,
+                       help=f"Model requests in flight at once (default: {concurrency})")
+    group.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                       help=f"Retries per job after the first attempt (default: {DEFAULT_MAX_RETRIES})")
+    group.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_FILE, default=None, metavar="PATH",
+                       help="Reuse responses from a local SQLite cache (default path: scripts/.llm_cache.sqlite)")
+    group.add_argument("--cache-max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS,
+                       help=f"Drop cached responses older than this (default: {DEFAULT_MAX_AGE_DAYS})")
+    group.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_MB,
+                       help=f"Evict least recently used responses above this size (default: {DEFAULT_MAX_MB})")
+    group.add_argument("--rpm", type=float, default=DEFAULT_RPM,
+                       help=f"Requests/min ceiling, normally the project quota (default: {DEFAULT_RPM}, 0 = unlimited)")
+    group.add_argument("--tpm", type=float, default=DEFAULT_TPM,
+                       help=f"Tokens/min ceiling (default: {DEFAULT_TPM}, 0 = unlimited)")
+    group.add_argument("--hedge", nargs="?", type=float, const=DEFAULT_HEDGE_PERCENTILE, default=None,
+                       metavar="PERCENTILE",
+                       help=f"Send a duplicate request when a call runs past this latency percentile "
+                            f"(default when given: {DEFAULT_HEDGE_PERCENTILE})")
+    group.add_argument("--hedge-budget", type=float, default=DEFAULT_HEDGE_BUDGET,
+                       help=f"Most duplicate requests as a fraction of all calls (default: {DEFAULT_HEDGE_BUDGET})")
+    group.add_argument("--telemetry", default=DEFAULT_TELEMETRY_FILE, metavar="PATH",
+                       help="Append one JSON line per model call here (default: scripts/generation_telemetry.jsonl)")
+    group.add_argument("--no-telemetry", dest="telemetry", action="store_const", const=None,
+                       help="Do not write call telemetry")
+    group.add_argument("--structured", action="store_true",
+                       help="Constrain replies to the script's JSON response schema (Vertex structured output)")
+    group.add_argument("--output", default=None,
+                       help="Write results here instead of the script's usual data file")
+
+    fake = parser.add_argument_group("offline stand-in model")
+    fake.add_argument("--fake", action="store_true",
+                      help="Use the local FakeGenerativeModel instead of Vertex AI "
+                           "(output defaults to <file>.fake.json)")
+    fake.add_argument("--fake-latency", type=float, default=1.0, help="Median seconds per call (default: 1.0)")
+    fake.add_argument("--fake-latency-sigma", type=float, default=0.5,
+                      help="Log-normal spread of call latency (default: 0.5)")
+    fake.add_argument("--fake-error-rate", type=float, default=0.0, help="Fraction of calls failing with a 503")
+    fake.add_argument("--fake-throttle-rate", type=float, default=0.0, help="Fraction of calls failing with a 429")
+    fake.add_argument("--fake-malformed-rate", type=float, default=0.0,
+                      help="Fraction of responses truncated or followed by chatter")
+    fake.add_argument("--fake-duplicate-rate", type=float, default=0.0,
+                      help="Fraction of items repeating an earlier word/passage")
+    fake.add_argument("--fake-seed", type=int, default=None, help="Seed for reproducible fake runs")
+    return group
+
+
+def output_path(args: argparse.Namespace, default: str) -> str:
+    """Resolve --output; fake runs never overwrite the real data file by default."""
+    if args.output:
+        return args.output
+    if args.fake:
+        root, ext = os.path.splitext(default)
+        return f"{root}.fake{ext}"
+    return default
+
+
+def runner_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """Map parsed runtime flags to JobRunner keyword arguments."""
+    options = {
+        "concurrency": args.concurrency,
+        "max_retries": args.max_retries,
+        "hedge_percentile": args.hedge,
+        "hedge_budget": args.hedge_budget,
+        "structured": args.structured,
+    }
+    if args.fake:
+        options["model"] = FakeGenerativeModel(
+            latency_median=args.fake_latency,
+            latency_sigma=args.fake_latency_sigma,
+            error_rate=args.fake_error_rate,
+            throttle_rate=args.fake_throttle_rate,
+            malformed_rate=args.fake_malformed_rate,
+            duplicate_rate=args.fake_duplicate_rate,
+            seed=args.fake_seed,
+        )
+    if args.rpm:
+        options["limiter"] = AdaptiveRateLimiter(args.rpm, args.tpm or None)
+    if args.telemetry:
+        options["telemetry"] = Telemetry(args.telemetry)
+    if args.cache:
+        options["cache"] = ResponseCache(args.cache, args.cache_max_age_days, args.cache_max_mb)
+    return options
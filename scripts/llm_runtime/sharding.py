@@ -0,0 +1,94 @@
+"""
+Deterministic sharding of a generator's job space.
+
+`--shard I/N` (1-based) keeps only the units of work (difficulty x theme
+slices, grammar subunits, synthesis subcategories) whose SHA-256 of
+"<seed>:<unit key>" falls into bucket I of N. Every process can compute its
+share on its own, so N shards cover the whole space exactly once without
+any coordination. The same seed always gives the same split.
+
+Each shard writes `<output>.shard-I-of-N<ext>` next to the usual data file.
+merge_shards.py then joins them, drops cross-shard duplicates and assigns
+IDs in a stable content order.
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import random
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+SHARD_PATTERN = re.compile(r"\.shard-(\d+)-of-(\d+)$")
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int  # 1-based
+    count: int
+    seed: int = 0
+
+    def contains(self, key: str) -> bool:
+        digest = hashlib.sha256(f"{self.seed}:{key}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") % self.count == self.index - 1
+
+    def select(self, units: Iterable[Tuple[str, T]]) -> List[Tuple[str, T]]:
+        """Keep the (key, value) units that belong to this shard."""
+        return [(key, value) for key, value in units if self.contains(key)]
+
+    @property
+    def suffix(self) -> str:
+        return f"shard-{self.index}-of-{self.count}"
+
+    def output(self, path: str) -> str:
+        root, ext = os.path.splitext(path)
+        return f"{root}.{self.suffix}{ext}"
+
+    def seed_random(self):
+        """Seed the global `random` module so prompt choices repeat for the same seed and shard."""
+        random.seed(f"{self.seed}:{self.suffix}")
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    match = re.fullmatch(r"(\d+)/(\d+)", text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError("expected I/N, e.g. 3/8")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {count}")
+    return index, count
+
+
+def add_shard_args(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("sharding")
+    group.add_argument("--shard", type=parse_shard, default=None, metavar="I/N",
+                       help="Only generate shard I of N (1-based); join the shards with merge_shards.py")
+    group.add_argument("--seed", type=int, default=0,
+                       help="Seed for the shard split and prompt choices (use the same one on every shard)")
+    return group
+
+
+def shard_from_args(args: argparse.Namespace) -> Optional[Shard]:
+    if args.shard is None:
+        return None
+    shard = Shard(args.shard[0], args.shard[1], args.seed)
+    shard.seed_random()
+    return shard
+
+
+def find_shard_files(output_file: str) -> List[Tuple[int, int, str]]:
+    """(index, count, path) of every shard output next to `output_file`, by index."""
+    root, ext = os.path.splitext(output_file)
+    found = []
+    for path in glob.glob(f"{glob.escape(root)}.shard-*-of-*{ext}"):
+        match = SHARD_PATTERN.search(os.path.splitext(path)[0])
+        if match:
+            found.append((int(match.group(1)), int(match.group(2)), path))
+    return sorted(found)
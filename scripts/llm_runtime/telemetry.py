@@ -0,0 +1,48 @@
+"""
+Structured generation telemetry.
+
+Every model call appends one JSON line to a telemetry file (default
+scripts/generation_telemetry.jsonl) with the run, script, job, difficulty and
+theme, latency, prompt/response size and the parse outcome. Once a script
+has decided what to keep from a result it calls JobResult.report(), which
+adds an "items" line with the accepted count and rejections by reason.
+
+Records from all runs share the file; scripts/generation_report.py turns
+them into throughput and yield tables per run.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_TELEMETRY_FILE = os.path.join(os.path.dirname(__file__), "..", "generation_telemetry.jsonl")
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+class Telemetry:
+    """Line-buffered JSONL writer shared by everything in one run."""
+
+    def __init__(self, path: str = DEFAULT_TELEMETRY_FILE, run_id: Optional[str] = None,
+                 script: Optional[str] = None):
+        self.path = path
+        self.run_id = run_id or new_run_id()
+        self.script = script or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+        self.file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def write(self, record_type: str, **fields: Any):
+        record = {"type": record_type, "run": self.run_id, "script": self.script, "ts": round(time.time(), 3)}
+        record.update(fields)
+        self.file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def items(self, job: str, accepted: int, rejected: Optional[Dict[str, int]] = None, **fields: Any):
+        """Record what a script kept from one job's output."""
+        rejected = {reason: n for reason, n in (rejected or {}).items() if n}
+        self.write("items", job=job, accepted=accepted, rejected=rejected, **fields)
+
+    def close(self):
+        self.file.close()
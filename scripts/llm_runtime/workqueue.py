@@ -0,0 +1,388 @@
+"""
+SQLite-backed work queue for running one generation across many workers.
+
+A queue database holds four tables:
+- jobs: one row per unit of work (e.g. vocab difficulty x theme), with a
+  status, a lease owner/expiry and an attempt counter. Workers lease one
+  job at a time and a heartbeat thread keeps their leases alive; a crashed
+  worker's leases simply expire and the jobs are handed out again, until
+  `max_attempts` is reached and the job is marked failed.
+- items: the accepted output, appended in the same transaction that marks
+  the job done, so a result is stored exactly once.
+- reservations: the global dedup table. An item is only stored if its
+  dedup key (e.g. the lowercased word) could be inserted, so duplicates
+  are rejected across all workers without any worker loading the others'
+  output.
+- exports: which worker claimed writing the finished queue's output, so
+  exactly one of the workers that see the queue finish writes the file.
+
+Every SQLite call can wait up to a minute on another worker's write lock, so
+the runner reaches the queue through asyncio.to_thread (queue_jobs leases in
+a worker thread, and queue handlers should do the same for complete, fail
+and enqueue); the event loop keeps streaming the calls in flight meanwhile.
+The heartbeat has its own thread and connection.
+
+Every worker enqueues the full job plan with INSERT OR IGNORE, so starting
+more workers against the same file is safe and needs no separate seeding
+step. Each worker paces itself with its own rate limiter.
+
+The file can live on a shared filesystem for workers on several hosts. The
+rollback journal (not WAL) is used because WAL needs shared memory on one
+host; locking is then down to the filesystem, so use a share that
+implements POSIX locks properly.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .runner import Handler, Job, RunStats, run_jobs
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    queue TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (queue, key)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(queue, status, id);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    queue TEXT NOT NULL,
+    job_id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    worker TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_queue ON items(queue, id);
+CREATE TABLE IF NOT EXISTS reservations (
+    queue TEXT NOT NULL,
+    key TEXT NOT NULL,
+    job_id INTEGER,
+    worker TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (queue, key)
+);
+CREATE TABLE IF NOT EXISTS exports (
+    queue TEXT PRIMARY KEY,
+    worker TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    # Used from asyncio.to_thread workers, one call at a time (see WorkQueue.lock)
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout = 60000")
+    return conn
+
+
+@dataclass
+class QueuedJob:
+    """A leased job row."""
+    id: int
+    key: str
+    payload: Dict[str, Any]
+    attempts: int
+
+
+class WorkQueue:
+    """One named queue inside a shared SQLite file, seen from one worker."""
+
+    def __init__(self, path: str, queue: str, worker_id: Optional[str] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = connect(path)
+        self.conn.executescript(SCHEMA)
+        # Serialises use of self.conn across the threads asyncio.to_thread runs calls on
+        self.lock = threading.RLock()
+        self.heartbeat_stop: Optional[threading.Event] = None
+        self.heartbeat_thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def transaction(self, conn: Optional[sqlite3.Connection] = None):
+        """BEGIN IMMEDIATE so concurrent workers serialise on the write lock, not on commit."""
+        conn = conn or self.conn
+        with self.lock if conn is self.conn else nullcontext():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # --- Jobs ---
+
+    def enqueue_many(self, jobs: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Add (key, payload) jobs; keys already in the queue are left alone.
+        Returns how many were new. New jobs release a previous export claim,
+        since the output will change.
+        """
+        now = time.time()
+        added = 0
+        with self.transaction() as conn:
+            for key, payload in jobs:
+                added += conn.execute(
+                    "INSERT OR IGNORE INTO jobs (queue, key, payload, created, updated) VALUES (?, ?, ?, ?, ?)",
+                    (self.queue, key, json.dumps(payload), now, now),
+                ).rowcount
+            if added:
+                conn.execute("DELETE FROM exports WHERE queue = ?", (self.queue,))
+        return added
+
+    def enqueue(self, key: str, payload: Dict[str, Any]) -> bool:
+        return self.enqueue_many([(key, payload)]) == 1
+
+    def lease(self) -> Optional[QueuedJob]:
+        """Claim the oldest pending job (or one whose lease expired), or None if there is none."""
+        with self.transaction() as conn:
+            while True:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT id, key, payload, attempts FROM jobs WHERE queue = ? AND "
+                    "(status = 'pending' OR (status = 'leased' AND lease_expires < ?)) ORDER BY id LIMIT 1",
+                    (self.queue, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, key, payload, attempts = row
+                if attempts >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires = NULL, updated = ?, "
+                        "error = COALESCE(error, 'lease expired') WHERE id = ?",
+                        (now, job_id),
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (self.worker_id, now + self.lease_seconds, now, job_id),
+                )
+                return QueuedJob(job_id, key, json.loads(payload), attempts + 1)
+
+    def complete(self, job_id: int, items: List[Any],
+                 dedup_key: Optional[Callable[[Any], str]] = None) -> List[Any]:
+        """Store the items whose dedup key is still free and mark the job done; returns the stored items."""
+        now = time.time()
+        stored = []
+        with self.transaction() as conn:
+            for item in items:
+                if dedup_key is not None:
+                    reserved = conn.execute(
+                        "INSERT OR IGNORE INTO reservations (queue, key, job_id, worker, created) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (self.queue, dedup_key(item), job_id, self.worker_id, now),
+                    ).rowcount
+                    if not reserved:
+                        continue
+                conn.execute(
+                    "INSERT INTO items (queue, job_id, data, worker, created) VALUES (?, ?, ?, ?, ?)",
+                    (self.queue, job_id, json.dumps(item, ensure_ascii=False), self.worker_id, now),
+                )
+                stored.append(item)
+            conn.execute(
+                "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL, error = NULL, "
+                "updated = ? WHERE id = ?",
+                (now, job_id),
+            )
+        return stored
+
+    def reserve(self, keys: Iterable[str]) -> int:
+        """Take dedup keys that belong to no job (e.g. items already in the bank). Returns how many were new."""
+        now = time.time()
+        added = 0
+        with self.transaction() as conn:
+            for key in keys:
+                added += conn.execute(
+                    "INSERT OR IGNORE INTO reservations (queue, key, job_id, worker, created) VALUES (?, ?, NULL, ?, ?)",
+                    (self.queue, key, self.worker_id, now),
+                ).rowcount
+        return added
+
+    def fail(self, job_id: int, error: str):
+        """Give the job back for another attempt, or mark it failed once attempts run out."""
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_owner = NULL, lease_expires = NULL, error = ?, updated = ? WHERE id = ?",
+                (self.max_attempts, error[:500], time.time(), job_id),
+            )
+
+    def claim_export(self) -> bool:
+        """
+        True for exactly one worker once no job is pending or leased: that
+        worker writes the output file, the others leave it alone.
+        """
+        with self.transaction() as conn:
+            busy = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE queue = ? AND status IN ('pending', 'leased')", (self.queue,)
+            ).fetchone()[0]
+            if busy:
+                return False
+            return conn.execute(
+                "INSERT OR IGNORE INTO exports (queue, worker, created) VALUES (?, ?, ?)",
+                (self.queue, self.worker_id, time.time()),
+            ).rowcount == 1
+
+    # --- Heartbeat ---
+
+    def heartbeat(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        """Extend every lease this worker holds."""
+        now = time.time()
+        with self.transaction(conn) as conn:
+            return conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE queue = ? AND status = 'leased' AND lease_owner = ?",
+                (now + self.lease_seconds, self.queue, self.worker_id),
+            ).rowcount
+
+    def start_heartbeat(self, interval: Optional[float] = None):
+        """Refresh this worker's leases from a background thread (with its own connection)."""
+        interval = interval or self.lease_seconds / 3
+        self.heartbeat_stop = stop = threading.Event()
+
+        def beat():
+            conn = connect(self.path)
+            try:
+                while not stop.wait(interval):
+                    try:
+                        self.heartbeat(conn)
+                    except sqlite3.Error as e:
+                        print(f"  [queue] heartbeat failed: {e}")
+            finally:
+                conn.close()
+
+        self.heartbeat_thread = threading.Thread(target=beat, name="queue-heartbeat", daemon=True)
+        self.heartbeat_thread.start()
+
+    def stop_heartbeat(self):
+        if self.heartbeat_stop is not None:
+            self.heartbeat_stop.set()
+            self.heartbeat_thread.join()
+            self.heartbeat_stop = self.heartbeat_thread = None
+
+    # --- Inspection ---
+
+    def query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.query("SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (self.queue,)))
+
+    def reserved_keys(self) -> set:
+        return {key for key, in self.query("SELECT key FROM reservations WHERE queue = ?", (self.queue,))}
+
+    def items(self) -> List[Any]:
+        """Every stored item, in the order it was accepted."""
+        rows = self.query("SELECT data FROM items WHERE queue = ? ORDER BY id", (self.queue,))
+        return [json.loads(data) for data, in rows]
+
+    def summary(self) -> str:
+        counts = self.counts()
+        stored = self.query("SELECT COUNT(*) FROM items WHERE queue = ?", (self.queue,))[0][0]
+        states = ", ".join(f"{counts.get(s, 0)} {s}" for s in ("pending", "leased", "done", "failed"))
+        return f"Queue '{self.queue}' ({self.path}): {states}; {stored} items stored"
+
+    def close(self):
+        self.stop_heartbeat()
+        with self.lock:
+            self.conn.close()
+
+
+async def queue_jobs(queue: WorkQueue, make_job: Callable[[QueuedJob], Job]) -> AsyncIterator[Job]:
+    """
+    Lease jobs one at a time as the runner asks for them; stops when none are
+    available. The lease runs in a worker thread, so waiting on another
+    worker's write lock does not stall the calls already in flight.
+    """
+    while True:
+        leased = await asyncio.to_thread(queue.lease)
+        if leased is None:
+            return
+        job = make_job(leased)
+        job.meta["queue_id"] = leased.id
+        yield job
+
+
+def run_queue_worker(
+    queue: WorkQueue,
+    make_job: Callable[[QueuedJob], Job],
+    handle: Handler,
+    idle_wait: float = 5.0,
+    **options,
+) -> List[RunStats]:
+    """
+    Work the queue until every job is done or failed.
+
+    While other workers still hold leases this worker waits and looks again,
+    so it can pick up the jobs of a worker that died.
+    """
+    all_stats = []
+    queue.start_heartbeat()
+    try:
+        while True:
+            all_stats.append(run_jobs(queue_jobs(queue, make_job), handle, **options))
+            counts = queue.counts()
+            if counts.get("pending"):
+                continue
+            if not counts.get("leased"):
+                break
+            print(f"  [queue] {counts['leased']} jobs leased by other workers; checking again in {idle_wait:.0f}s")
+            time.sleep(idle_wait)
+    finally:
+        queue.stop_heartbeat()
+    return all_stats
+
+
+def write_json_atomic(path: str, items: List[Any], indent: int = 2, ensure_ascii: bool = True):
+    """Write `items` via a per-process temp file so concurrent exporters cannot interleave."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(items, f, indent=indent, ensure_ascii=ensure_ascii)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def add_queue_args(parser: argparse.ArgumentParser):
+    """Add the --queue flags for scripts that support work-queue mode."""
+    group = parser.add_argument_group("work queue")
+    group.add_argument("--queue", metavar="PATH", default=None,
+                       help="Run as a worker on a shared SQLite queue file (start as many workers as you like)")
+    group.add_argument("--worker-id", default=None, help="Name for this worker (default: host-pid)")
+    group.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                       help=f"How long a job stays claimed without a heartbeat (default: {DEFAULT_LEASE_SECONDS})")
+    group.add_argument("--queue-max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                       help=f"Leases per job before it is marked failed (default: {DEFAULT_MAX_ATTEMPTS})")
+    return group
+
+
+def open_queue(args: argparse.Namespace, name: str, path: Optional[str] = None) -> WorkQueue:
+    """Open queue `name` in args.queue, or in `path` when the script picks the file itself."""
+    return WorkQueue(path or args.queue, name, args.worker_id, args.lease_seconds, args.queue_max_attempts)
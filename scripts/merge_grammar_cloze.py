@@ -5,33 +5,35 @@ Merge additional grammar cloze passages with existing ones
 import json
 import os
 
+from content_store import bank_path, open_store
+
 # File paths
-EXISTING_FILE = os.path.join(os.path.dirname(__file__), "../src/data/grammar_cloze_full.json")
 ADDITIONAL_FILE = os.path.join(os.path.dirname(__file__), "../src/data/grammar_cloze_additional.json")
-OUTPUT_FILE = EXISTING_FILE  # Overwrite the existing file
+OUTPUT_FILE = bank_path("grammar-cloze")  # Exported from the content store
 
 def main():
     print("=" * 60)
     print("MERGING GRAMMAR CLOZE PASSAGES")
     print("=" * 60)
     
-    # Load existing passages
-    with open(EXISTING_FILE, "r", encoding="utf-8") as f:
-        existing = json.load(f)
-    print(f"\nExisting passages: {len(existing)}")
-    
-    # Load additional passages
-    with open(ADDITIONAL_FILE, "r", encoding="utf-8") as f:
-        additional = json.load(f)
-    print(f"Additional passages: {len(additional)}")
-    
-    # Merge
-    merged = existing + additional
-    print(f"Total passages: {len(merged)}")
-    
-    # Save
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(merged, f, indent=2, ensure_ascii=False)
+    with open_store() as store:
+        print(f"\nExisting passages: {store.count('grammar-cloze')}")
+        
+        # Load additional passages
+        with open(ADDITIONAL_FILE, "r", encoding="utf-8") as f:
+            additional = json.load(f)
+        print(f"Additional passages: {len(additional)}")
+        
+        # Merge: renumber after the highest id in the bank (it has gaps, so not
+        # its length), so no existing passage is ever replaced
+        start_id = store.max_number("grammar-cloze") + 1
+        for offset, passage in enumerate(additional):
+            passage["id"] = start_id + offset
+        
+        # Save: only the new passages are written to the end of the file
+        store.append("grammar-cloze", additional)
+        print(f"Added {len(additional)} (IDs {start_id}-{start_id + len(additional) - 1})")
+        print(f"Total passages: {store.count('grammar-cloze')}")
     
     print(f"\n✅ Merged successfully!")
     print(f"Saved to: {OUTPUT_FILE}")
@@ -0,0 +1,166 @@
+"""
+Merge Sharded Generator Output
+Joins the <output>.shard-I-of-N.json files written by a generator run with
+--shard I/N into the usual data file.
+
+Items are put in a stable content order (not the order the shards happened
+to finish in), duplicates across shards are dropped keeping the first in
+that order, and IDs are assigned afresh. Merging the same shard files
+always gives the same output.
+
+Cloze shards only hold new passages (the generator appends to its bank), so
+they are added to the existing cloze_generated.json instead: passages whose
+title is already in it are dropped and IDs continue after its last one.
+
+Usage:
+    python merge_shards.py vocab [--output PATH] [--allow-partial] [--keep-shards]
+    python merge_shards.py cloze | grammar | synthesis
+"""
+
+import argparse
+import json
+import os
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import generate_cloze_ai
+import generate_grammar_ai
+import generate_synthesis_ai
+import generate_vocab_ai
+from llm_runtime import find_shard_files, write_json_atomic
+from word_families import family_key
+
+
+def normalise(text) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+def number_words(words: List[Dict], first: int = 1) -> List[Dict]:
+    for i, word in enumerate(words, first):
+        word["wordId"] = f"w_{i:04d}"
+    return words
+
+
+def number_passages(passages: List[Dict], first: int = 1) -> List[Dict]:
+    numbered = []
+    for p in passages:
+        numbered.extend(generate_cloze_ai.finalize_passages([p], p["difficulty"], first + len(numbered), Counter()))
+    return numbered
+
+
+def number_questions(field: str) -> Callable[[List[Dict], int], List[Dict]]:
+    def assign(questions: List[Dict], first: int = 1) -> List[Dict]:
+        for i, q in enumerate(questions, first):
+            q[field] = i
+        return questions
+    return assign
+
+
+class Bank(NamedTuple):
+    output_file: str
+    order: Callable[[Dict], tuple]
+    dedup_key: Callable[[Dict], str]
+    number: Callable[[List[Dict], int], List[Dict]]
+    ensure_ascii: bool = False  # match how the generator writes the file
+    append_to: str = ""  # ID field, when shards are added to the existing file rather than replacing it
+
+
+BANKS = {
+    "vocab": Bank(
+        generate_vocab_ai.OUTPUT_FILE,
+        order=lambda w: (w.get("difficulty", 0), normalise(w.get("word"))),
+        dedup_key=lambda w: family_key(str(w.get("word", ""))),
+        number=number_words,
+        ensure_ascii=True,
+    ),
+    "cloze": Bank(
+        generate_cloze_ai.OUTPUT_FILE,
+        order=lambda p: (p.get("difficulty", 0), normalise(p.get("title"))),
+        dedup_key=generate_cloze_ai.passage_title,
+        number=number_passages,
+        ensure_ascii=True,
+        append_to="id",
+    ),
+    "grammar": Bank(
+        generate_grammar_ai.OUTPUT_FILE,
+        order=lambda q: (str(q.get("category")), str(q.get("subunit")), normalise(q.get("question"))),
+        dedup_key=lambda q: f"{normalise(q.get('question'))}|{normalise(q.get('answer'))}",
+        number=number_questions("question_number"),
+    ),
+    "synthesis": Bank(
+        generate_synthesis_ai.OUTPUT_FILE,
+        order=lambda q: (str(q.get("category")), str(q.get("subcategory")), normalise(q.get("question"))),
+        dedup_key=lambda q: f"{q.get('type', '')}|{normalise(q.get('question'))}",
+        number=number_questions("id"),
+    ),
+}
+
+
+def merge(items: List[Dict], bank: Bank, existing: List[Dict] = ()) -> Tuple[List[Dict], int]:
+    """
+    Sort, drop duplicates (including items already in `existing`) and number
+    after the last existing ID; returns the new items and how many were dropped.
+    """
+    seen = {bank.dedup_key(item) for item in existing}
+    first = max([item[bank.append_to] for item in existing], default=0) + 1
+    merged = []
+    for item in sorted(items, key=bank.order):
+        key = bank.dedup_key(item)
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(item)
+    return bank.number(merged, first), len(items) - len(merged)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join the output of a sharded generator run")
+    parser.add_argument("bank", choices=sorted(BANKS), help="Which generator's shards to merge")
+    parser.add_argument("--output", help="Unsharded output file the shards were named after (default: the generator's)")
+    parser.add_argument("--allow-partial", action="store_true", help="Merge even if some shards are missing")
+    parser.add_argument("--keep-shards", action="store_true", help="Do not delete the shard files after merging")
+    args = parser.parse_args()
+    bank = BANKS[args.bank]
+    output_file = args.output or bank.output_file
+
+    shards = find_shard_files(output_file)
+    if not shards:
+        print(f"No shard files found for {output_file}")
+        return
+    counts = {count for _, count, _ in shards}
+    if len(counts) > 1:
+        raise SystemExit(f"Shard files from different splits ({sorted(counts)} shards); remove the stale ones first")
+    count = counts.pop()
+    missing = sorted(set(range(1, count + 1)) - {index for index, _, _ in shards})
+    if missing and not args.allow_partial:
+        raise SystemExit(f"Missing shards {missing} of {count}; rerun them or pass --allow-partial")
+
+    items = []
+    for index, _, path in shards:
+        with open(path, encoding="utf-8") as f:
+            shard_items = json.load(f)
+        print(f"  shard {index}/{count}: {len(shard_items)} items ({os.path.basename(path)})")
+        items.extend(shard_items)
+
+    existing = []
+    if bank.append_to and os.path.exists(output_file):
+        with open(output_file, encoding="utf-8") as f:
+            existing = json.load(f)
+        print(f"  existing: {len(existing)} items ({os.path.basename(output_file)})")
+
+    merged, dropped = merge(items, bank, existing)
+    write_json_atomic(output_file, existing + merged, ensure_ascii=bank.ensure_ascii)
+    print(f"\nMerged {len(shards)}/{count} shards: {len(merged)} new items, {dropped} duplicates dropped, "
+          f"{len(existing) + len(merged)} in file")
+    print(f"Saved to: {output_file}")
+
+    if not args.keep_shards and not missing:
+        for _, _, path in shards:
+            os.remove(path)
+            # The private work queue a shard run keeps for resuming (see run_queue in the generators)
+            if os.path.exists(f"{path}.queue.sqlite"):
+                os.remove(f"{path}.queue.sqlite")
+
+
+if __name__ == "__main__":
+    main()
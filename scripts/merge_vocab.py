@@ -1,111 +1,163 @@
+"""
+Merge generated vocab (vocab_8000.json) into the vocab MCQ bank (questions.json).
 
+The merge is incremental. The content store (content_store.py) keeps the bank
+with an indexed answer-family column, so "is this word already in?" is one
+lookup, and a high-water mark records how far into vocab_8000.json the last
+merge read: a byte offset, the file size and a digest of the WINDOW bytes
+just before the offset. A re-run seeks to the mark and reads and parses only
+the bytes after it, then appends the new questions to the end of
+questions.json; neither file is read or rewritten in full. If the generator
+rewrote vocab_8000.json (e.g. merge_shards.py re-sorted it) the bytes before
+the mark no longer match and the whole file is read again, which is still
+one indexed lookup per entry. An edit that leaves those bytes alone is not
+noticed; pass --full after editing earlier entries by hand.
+
+Usage: python scripts/merge_vocab.py [--full]
+"""
+
+import argparse
+import hashlib
 import json
 import os
 import random
+from typing import BinaryIO, Dict, Iterator, Tuple
+
+from content_store import DATA_DIR, bank_path, open_store
+from word_families import FamilyIndex
+
+BANK = "vocab-mcq"
+QUESTIONS_FILE = bank_path(BANK)
+NEW_VOCAB_FILE = os.path.join(DATA_DIR, "vocab_8000.json")  # generate_vocab_ai.py OUTPUT_FILE
+OUTPUT_FILE = QUESTIONS_FILE  # Appended to in place
+WINDOW = 4096  # Bytes before the high-water mark that must be unchanged to resume from it
+
 
-QUESTIONS_FILE = "src/data/questions.json"
-NEW_VOCAB_FILE = "src/data/vocab_8000.json"
-OUTPUT_FILE = "src/data/questions.json" # Overwrite or create new
+def iter_entries(text: str, start: int) -> Iterator[Tuple[Dict, int]]:
+    """(entry, offset just past it) for each object of the JSON array in `text` after `start`."""
+    decoder = json.JSONDecoder()
+    pos = start
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,[":
+            pos += 1
+        if pos >= len(text) or text[pos] == "]":
+            return
+        entry, pos = decoder.raw_decode(text, pos)
+        yield entry, pos
 
-def load_json(path):
-    if not os.path.exists(path):
-        return []
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
 
-def save_json(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def window_digest(f: BinaryIO, offset: int) -> str:
+    """Digest of the WINDOW bytes before `offset` in the open source file."""
+    start = max(0, offset - WINDOW)
+    f.seek(start)
+    return hashlib.sha256(f.read(offset - start)).hexdigest()
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Merge vocab_8000.json into questions.json")
+    parser.add_argument("--full", action="store_true", help="Ignore the high-water mark and read the whole source")
+    args = parser.parse_args()
+
+    if not os.path.exists(NEW_VOCAB_FILE):
+        print(f"{NEW_VOCAB_FILE} not found, nothing to merge.")
+        return
+
     print("Loading data...")
-    existing_questions = load_json(QUESTIONS_FILE)
-    new_vocab = load_json(NEW_VOCAB_FILE)
-    
-    print(f"Existing questions: {len(existing_questions)}")
-    print(f"New vocab entries: {len(new_vocab)}")
-
-    # Build existence set (normalize to lowercase)
-    existing_words = set()
-    for q in existing_questions:
-        if 'answer' in q:
-            existing_words.add(q['answer'].lower().strip())
-
-    max_id = 0
-    for q in existing_questions:
-        if 'question_number' in q:
-            if q['question_number'] > max_id:
-                max_id = q['question_number']
-    
-    print(f"Max ID: {max_id}")
-    print(f"Unique existing answers: {len(existing_words)}")
-
-    merged_count = 0
-    skipped_count = 0
-    
-    for entry in new_vocab:
-        word = entry['word'].lower().strip()
-        
-        # Uniqueness Check
-        if word in existing_words:
-            skipped_count += 1
-            continue
+    with open_store(banks=[BANK]) as store, open(NEW_VOCAB_FILE, "rb") as f:
+        source = os.path.abspath(NEW_VOCAB_FILE)
+        size = os.fstat(f.fileno()).st_size
+        mark = store.high_water(source)
+        start = 0
+        if mark and not args.full:
+            offset, _, window = mark
+            if offset <= size and window_digest(f, offset) == window:
+                start = offset
+            else:
+                print("Source changed before the high-water mark; reading all of it.")
+        f.seek(start)
+        text = f.read().decode("utf-8")
+
+        max_id = store.max_number(BANK)
+        print(f"Existing questions: {store.count(BANK)}")
+        print(f"Max ID: {max_id}")
+        print(f"Reading {NEW_VOCAB_FILE} from byte {start:,} of {size:,}")
+
+        # Words added in this run; the store holds everything merged before
+        batch_words = FamilyIndex()
+        new_questions = []
+        read_count = 0
+        skipped_count = 0
+        family_count = 0
+        end = 0
+
+        for entry, end in iter_entries(text, 0):
+            read_count += 1
+            word = entry['word'].lower().strip()
+
+            # Uniqueness Check (whole word family)
+            member = store.family_member(BANK, word)
+            existing = member[0] if member else batch_words.find(word)
+            if existing is not None:
+                skipped_count += 1
+                if existing != word:
+                    family_count += 1
+                continue
+            
+            # Transform Schema
+            # Target: question_number, question, options, answer, answer_index, theme, difficulty, definition, example
+            
+            # 1. Options & Answer Index
+            opts = [word] + entry['distractors'][:3] # Ensure max 4
+            random.shuffle(opts)
+            
+            answer_index = -1
+            options_map = {}
+            for idx, opt in enumerate(opts):
+                key = str(idx + 1)
+                options_map[key] = opt
+                if opt == word:
+                    answer_index = idx + 1
             
-        # Transform Schema
-        # Target: question_number, question, options, answer, answer_index, theme, difficulty, definition, example
-        
-        # 1. Options & Answer Index
-        opts = [word] + entry['distractors'][:3] # Ensure max 4
-        random.shuffle(opts)
-        
-        answer_index = -1
-        options_map = {}
-        for idx, opt in enumerate(opts):
-            key = str(idx + 1)
-            options_map[key] = opt
-            if opt == word:
-                answer_index = idx + 1
-        
-        # 2. Theme (Pick first or default)
-        theme = "General"
-        if 'themes' in entry and len(entry['themes']) > 0:
-            theme = entry['themes'][0]
-        
-        # 3. Question (Use example validation)
-        question_text = entry.get('example', '').replace('_____', '________') # Standardize blank
-        if '________' not in question_text:
-             # Fallback if no blank found (rare but possible given AI gen)
-             question_text = f"Choose the word that means: {entry['definition']}"
-        
-        max_id += 1
-        
-        new_q = {
-            "question_number": max_id,
-            "question": question_text,
-            "options": options_map,
-            "answer": word,
-            "answer_index": answer_index,
-            "theme": theme,
-            "difficulty": entry.get('difficulty', 1),
-            "definition": entry.get('definition', ''),
-            "example": entry.get('example', '')
-        }
-        
-        existing_questions.append(new_q)
-        existing_words.add(word)
-        merged_count += 1
-
-    print(f"Skipped {skipped_count} duplicates.")
-    print(f"Merged {merged_count} new questions.")
-    print(f"Total questions now: {len(existing_questions)}")
-
-    # Verify Logic
-    if merged_count > 0:
-        print("Saving merged file...")
-        save_json(OUTPUT_FILE, existing_questions)
-        print("Success.")
-    else:
-        print("No new unique entries found to merge.")
+            # 2. Theme (Pick first or default)
+            theme = "General"
+            if 'themes' in entry and len(entry['themes']) > 0:
+                theme = entry['themes'][0]
+            
+            # 3. Question (Use example validation)
+            question_text = entry.get('example', '').replace('_____', '________') # Standardize blank
+            if '________' not in question_text:
+                 # Fallback if no blank found (rare but possible given AI gen)
+                 question_text = f"Choose the word that means: {entry['definition']}"
+            
+            new_q = {
+                "question_number": max_id + len(new_questions) + 1,
+                "question": question_text,
+                "options": options_map,
+                "answer": word,
+                "answer_index": answer_index,
+                "theme": theme,
+                "difficulty": entry.get('difficulty', 1),
+                "definition": entry.get('definition', ''),
+                "example": entry.get('example', '')
+            }
+            
+            new_questions.append(new_q)
+            batch_words.add(word)
+
+        print(f"New vocab entries read: {read_count}")
+        print(f"Skipped {skipped_count} duplicates ({family_count} matched by word family, not exact spelling).")
+        print(f"Merged {len(new_questions)} new questions.")
+
+        if new_questions:
+            print("Appending to questions.json...")
+            store.append(BANK, new_questions)
+            print("Success.")
+        else:
+            print("No new unique entries found to merge.")
+        print(f"Total questions now: {store.count(BANK)}")
+        # iter_entries counts characters; the mark is in bytes
+        end = start + len(text[:end].encode("utf-8"))
+        store.set_high_water(source, end, size, window_digest(f, end))
 
 if __name__ == "__main__":
     main()
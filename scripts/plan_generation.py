@@ -0,0 +1,184 @@
+"""
+Gap-Driven Generation Planner
+Reads the current banks in src/data, counts what is there per difficulty x
+theme (per difficulty for grammar cloze, per subunit for grammar, per
+subcategory for synthesis) and writes the smallest job list that brings
+every cell up to its quota. The generators take the plan with --plan and
+only ask the model for those items.
+
+Within a level the missing items go to the thinnest themes first, so a level
+with plenty of "Science & Technology" words but none on "Mathematics" is
+filled with Mathematics. Levels missing entirely (vocab level 10) show up
+as a full-quota gap.
+
+Vocab is measured on questions.json, the merged bank; run merge_vocab.py
+before planning so freshly generated words are counted.
+
+Usage:
+    python plan_generation.py [--bank vocab --bank cloze ...] [--output generation_plan.json]
+    python generate_vocab_ai.py --plan generation_plan.json
+
+Banks: vocab, cloze, grammar, grammar-cloze, comprehension, synthesis.
+"""
+
+import argparse
+import heapq
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import generate_cloze_ai
+import generate_comprehension_ai
+import generate_grammar_ai
+import generate_grammar_cloze_ai
+import generate_synthesis_ai
+import generate_vocab_ai
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "../src/data")
+DEFAULT_PLAN_FILE = os.path.join(os.path.dirname(__file__), "generation_plan.json")
+
+# Target bank sizes per difficulty (vocab includes level 10, which the app expects)
+VOCAB_QUOTAS = {1: 800, 2: 900, 3: 1000, 4: 1000, 5: 1000, 6: 1000, 7: 900, 8: 700, 9: 700, 10: 300}
+CLOZE_QUOTAS = {3: 100, 4: 100, 5: 100, 6: 100, 7: 100}
+# Grammar cloze is the generated passages plus merge_grammar_cloze.py's additional set
+GRAMMAR_CLOZE_QUOTAS = {3: 100, 4: 100, 5: 100, 6: 100, 7: 100}
+
+
+def load_bank(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def fill_gaps(have: Dict[str, int], names: List[str], gap: int) -> Dict[str, int]:
+    """Hand out `gap` items one at a time to whichever name currently has the fewest."""
+    heap = [(have.get(name, 0), i, name) for i, name in enumerate(names)]
+    heapq.heapify(heap)
+    added = Counter()
+    for _ in range(gap):
+        count, i, name = heapq.heappop(heap)
+        added[name] += 1
+        heapq.heappush(heap, (count + 1, i, name))
+    return {name: added[name] for name in names if added[name]}
+
+
+def plan_levels(items: List[Dict], quotas: Dict[int, int], themes: Optional[List[str]], source: str) -> Dict:
+    """
+    Difficulty x theme plan for a bank whose items carry "difficulty" and
+    "theme"; per difficulty only when the bank has no themes.
+    """
+    by_level = defaultdict(Counter)
+    for item in items:
+        by_level[item.get("difficulty")][item.get("theme")] += 1
+    jobs = []
+    for difficulty, quota in quotas.items():
+        gap = quota - sum(by_level[difficulty].values())
+        if gap <= 0:
+            continue
+        if not themes:
+            jobs.append({"difficulty": difficulty, "count": gap})
+            continue
+        for theme, count in fill_gaps(by_level[difficulty], themes, gap).items():
+            jobs.append({"difficulty": difficulty, "theme": theme, "count": count})
+    return {
+        "source": os.path.relpath(source, DATA_DIR),
+        "have": {str(d): sum(by_level[d].values()) for d in quotas},
+        "quota": {str(d): q for d, q in quotas.items()},
+        "jobs": jobs,
+    }
+
+
+def plan_vocab() -> Dict:
+    path = os.path.join(DATA_DIR, "questions.json")
+    return plan_levels(load_bank(path), VOCAB_QUOTAS, generate_vocab_ai.THEMES, path)
+
+
+def plan_cloze() -> Dict:
+    path = generate_cloze_ai.OUTPUT_FILE
+    return plan_levels(load_bank(path), CLOZE_QUOTAS, generate_cloze_ai.THEMES, path)
+
+
+def plan_grammar() -> Dict:
+    """Per-subunit plan: every subunit should have QUESTIONS_PER_SUBUNIT questions."""
+    path = generate_grammar_ai.OUTPUT_FILE
+    have = Counter(q.get("subunit") for q in load_bank(path))
+    quota = generate_grammar_ai.QUESTIONS_PER_SUBUNIT
+    jobs = [
+        {"subunit_id": s["id"], "subunit": s["name"], "count": quota - have[s["name"]]}
+        for s in generate_grammar_ai.GRAMMAR_SUBUNITS
+        if have[s["name"]] < quota
+    ]
+    return {
+        "source": os.path.relpath(path, DATA_DIR),
+        "have": {s["name"]: have[s["name"]] for s in generate_grammar_ai.GRAMMAR_SUBUNITS},
+        "quota": {s["name"]: quota for s in generate_grammar_ai.GRAMMAR_SUBUNITS},
+        "jobs": jobs,
+    }
+
+
+def plan_grammar_cloze() -> Dict:
+    path = generate_grammar_cloze_ai.OUTPUT_FILE
+    return plan_levels(load_bank(path), GRAMMAR_CLOZE_QUOTAS, None, path)
+
+
+def plan_comprehension() -> Dict:
+    path = generate_comprehension_ai.OUTPUT_FILE
+    return plan_levels(load_bank(path), generate_comprehension_ai.TARGETS, generate_comprehension_ai.THEMES, path)
+
+
+def plan_synthesis() -> Dict:
+    """Per-subcategory plan: every template subcategory should have QUESTIONS_PER_SUBCATEGORY questions."""
+    path = generate_synthesis_ai.OUTPUT_FILE
+    have = Counter(q.get("subcategory") for q in load_bank(path))
+    quota = generate_synthesis_ai.QUESTIONS_PER_SUBCATEGORY
+    names = [sub["sub_category_name"] for category in generate_synthesis_ai.load_template()["categories"]
+             for sub in category["sub_categories"]]
+    return {
+        "source": os.path.relpath(path, DATA_DIR),
+        "have": {name: have[name] for name in names},
+        "quota": {name: quota for name in names},
+        "jobs": [{"subcategory": name, "count": quota - have[name]} for name in names if have[name] < quota],
+    }
+
+
+PLANNERS = {
+    "vocab": plan_vocab, "cloze": plan_cloze, "grammar": plan_grammar,
+    "grammar-cloze": plan_grammar_cloze, "comprehension": plan_comprehension, "synthesis": plan_synthesis,
+}
+
+
+def print_plan(bank: str, plan: Dict):
+    missing = sum(job["count"] for job in plan["jobs"])
+    print("=" * 60)
+    print(f"{bank} ({plan['source']}): {missing} items missing in {len(plan['jobs'])} cells")
+    print("=" * 60)
+    for cell, quota in plan["quota"].items():
+        have = plan["have"][cell]
+        if have < quota:
+            print(f"  {cell[:40]:<40} {have:>5}/{quota:<5} -{quota - have}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan generation jobs from what the banks are missing")
+    parser.add_argument("--bank", choices=sorted(PLANNERS), action="append",
+                        help="Bank to plan (repeatable; default: all)")
+    parser.add_argument("--output", default=DEFAULT_PLAN_FILE,
+                        help="Where to write the plan (default: scripts/generation_plan.json)")
+    args = parser.parse_args()
+
+    plan = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "banks": {}}
+    for bank in args.bank or sorted(PLANNERS):
+        plan["banks"][bank] = PLANNERS[bank]()
+        print_plan(bank, plan["banks"][bank])
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2, ensure_ascii=False)
+    print(f"Plan saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+Passage Repair
+Fixes grammar cloze and comprehension passages that fail their checks
+(content_schemas.py) without regenerating them whole.
+
+First the fixes that need no model: an answer that matches an option except
+for case or spacing is set to that option, a comprehension answer_index is
+pointed at the option holding the answer, and totalBlanks is recounted.
+Whatever is still broken is regenerated part by part, with a small prompt
+that shows the model the rest of the passage as context:
+
+- a grammar cloze blank whose answer is not an option, whose options repeat
+  or whose fields are missing gets a new answer, options and explanation
+  for the same __n__ marker;
+- a grammar cloze paragraph whose markers and blanks disagree (a marker
+  lost from the text, a marker used twice) or that has fewer than
+  BLANKS_PER_PARAGRAPH blanks is rewritten with the right number of blanks,
+  and the passage's blanks are renumbered 1, 2, ... afterwards;
+- a comprehension question that fails its checks is replaced with a new
+  question with the same id.
+
+Each reply is validated against the part's schema before it is patched in,
+and a passage is only written back once it passes its bank schema whole.
+The summary compares the tokens spent with a rough estimate for
+regenerating the same passages from scratch. Patched passages are upserted
+into the content store and the banks exported; fake runs (and --output)
+write a separate file instead.
+
+Usage:
+    python repair_passages.py [--bank grammar-cloze] [--dry-run] [--concurrency 5]
+    python repair_passages.py --fake --fake-latency 0.05
+"""
+
+import argparse
+import copy
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import generate_comprehension_ai
+import generate_grammar_cloze_ai
+from content_schemas import MARKER, accept_valid, response_schema, validate_batch
+from content_store import BANKS, bank_path, open_store
+from llm_runtime import DEFAULT_MODEL, Job, add_runtime_args, collect_results, output_path, runner_options
+from llm_runtime import write_json_atomic
+from llm_runtime.ratelimit import estimate_tokens
+
+REPAIRABLE = ["grammar-cloze", "comprehension"]
+BLANKS_PER_PARAGRAPH = 2  # generate_grammar_cloze_ai.py: 5 paragraphs x 2 blanks
+
+# Schema each kind of part is regenerated against
+PART_SCHEMAS = {
+    "blank": "grammar-cloze-blank",
+    "paragraph": "grammar-cloze-paragraph",
+    "question": "comprehension-question",
+}
+
+
+@dataclass
+class Repair:
+    """One part of a passage to regenerate."""
+    bank: str
+    passage_id: int
+    kind: str  # "blank", "paragraph" or "question"
+    index: int  # paragraph or question position
+    reason: str
+    blank_id: Optional[int] = None
+    ids: List[int] = field(default_factory=list)  # blank ids a rewritten paragraph must have
+
+    @property
+    def key(self) -> str:
+        suffix = f"-{self.blank_id}" if self.blank_id is not None else ""
+        return f"{self.bank}-{self.passage_id}-{self.kind}-{self.index}{suffix}"
+
+
+# --- Fixes that need no model ---
+
+def matching_option(answer, options: List) -> Optional[str]:
+    """The one option equal to `answer` once case and spacing are ignored, if `answer` is not an option."""
+    answer = " ".join(str(answer).split()).lower()
+    matches = [o for o in options if " ".join(str(o).split()).lower() == answer]
+    return matches[0] if len(matches) == 1 else None
+
+
+def fix_locally(bank: str, passage: Dict) -> List[str]:
+    """Apply the model-free fixes in place; returns what was changed."""
+    fixes = []
+    if bank == "grammar-cloze":
+        for paragraph in passage.get("paragraphs", []):
+            for blank in paragraph.get("blanks", []):
+                options = blank.get("options") or []
+                if blank.get("answer") not in options and matching_option(blank.get("answer", ""), options):
+                    blank["answer"] = matching_option(blank["answer"], options)
+                    fixes.append("answer")
+        total = sum(len(p.get("blanks", [])) for p in passage.get("paragraphs", []))
+        if passage.get("totalBlanks") != total:
+            passage["totalBlanks"] = total
+            fixes.append("totalBlanks")
+    else:
+        for question in passage.get("questions", []):
+            options = question.get("options")
+            if not isinstance(options, dict):
+                continue
+            if question.get("answer") not in options.values():
+                match = matching_option(question.get("answer", ""), list(options.values()))
+                if match is None:
+                    continue
+                question["answer"] = match
+                fixes.append("answer")
+            keys = [k for k, v in options.items() if v == question["answer"]]
+            if len(keys) == 1 and str(question.get("answer_index")) != keys[0] and keys[0].isdigit():
+                question["answer_index"] = int(keys[0])
+                fixes.append("answer_index")
+    return fixes
+
+
+# --- Finding the parts to regenerate ---
+
+def paragraph_ids(passage: Dict, paragraph: Dict) -> Optional[List[int]]:
+    """Blank ids a paragraph needs rewriting with, or None if its markers and blanks agree."""
+    markers = [int(m) for m in MARKER.findall(paragraph.get("text", ""))]
+    ids = [b.get("id") for b in paragraph.get("blanks", []) if isinstance(b.get("id"), int)]
+    wanted = sorted(set(markers) | set(ids))
+    if sorted(markers) == sorted(ids) == wanted and len(wanted) >= BLANKS_PER_PARAGRAPH:
+        return None
+    # Pad with ids above any in the passage; renumber() makes them sequential afterwards
+    top = max([int(m) for p in passage["paragraphs"] for m in MARKER.findall(p.get("text", ""))] +
+              [b.get("id") for p in passage["paragraphs"] for b in p.get("blanks", [])
+               if isinstance(b.get("id"), int)] + [0])
+    while len(wanted) < BLANKS_PER_PARAGRAPH:
+        top += 1
+        wanted.append(top)
+    return wanted
+
+
+def find_repairs(bank: str, passage: Dict) -> List[Repair]:
+    repairs = []
+    if bank == "grammar-cloze":
+        for index, paragraph in enumerate(passage.get("paragraphs", [])):
+            ids = paragraph_ids(passage, paragraph)
+            if ids is not None:
+                markers = [int(m) for m in MARKER.findall(paragraph.get("text", ""))]
+                blanks = [b.get("id") for b in paragraph.get("blanks", [])]
+                repairs.append(Repair(bank, passage["id"], "paragraph", index,
+                                      f"markers {markers}, blanks {blanks}", ids=ids))
+                continue
+            _, invalid = validate_batch(PART_SCHEMAS["blank"], paragraph["blanks"])
+            for position, errors in sorted(invalid.items()):
+                blank = paragraph["blanks"][position]
+                repairs.append(Repair(bank, passage["id"], "blank", index, errors[0]["type"], blank_id=blank["id"]))
+    else:
+        _, invalid = validate_batch(PART_SCHEMAS["question"], passage.get("questions", []))
+        for position, errors in sorted(invalid.items()):
+            repairs.append(Repair(bank, passage["id"], "question", position, errors[0]["type"]))
+    return repairs
+
+
+# --- Prompts ---
+
+def filled(paragraph: Dict, keep: tuple = ()) -> str:
+    """Paragraph text with every blank filled in by its answer, except the markers in `keep`."""
+    answers = {b.get("id"): b.get("answer") for b in paragraph.get("blanks", [])}
+
+    def fill(match):
+        n = int(match.group(1))
+        return match.group(0) if n in keep or not answers.get(n) else answers[n]
+    return MARKER.sub(fill, paragraph.get("text", ""))
+
+
+def paragraph_subunit(paragraph: Dict) -> str:
+    subunits = [b.get("subunit") for b in paragraph.get("blanks", []) if b.get("subunit")]
+    return Counter(subunits).most_common(1)[0][0] if subunits else "Mixed Grammar"
+
+
+def blank_prompt(passage: Dict, repair: Repair) -> str:
+    paragraph = passage["paragraphs"][repair.index]
+    subunit = paragraph_subunit(paragraph)
+    text = "\n\n".join(filled(p, keep=(repair.blank_id,) if i == repair.index else ())
+                       for i, p in enumerate(passage["paragraphs"]))
+    return f"""Repair one grammar cloze blank for Singapore students.
+
+Difficulty Level: {passage.get("difficulty")} (1-3: Primary, 4-6: Secondary, 7-9: JC)
+Grammar Topic: {subunit}
+
+Every blank in this passage is filled in except __{repair.blank_id}__:
+
+{text}
+
+Return a JSON object for blank __{repair.blank_id}__ with:
+- "id": {repair.blank_id}
+- "answer": The correct word or phrase for the blank (lowercase)
+- "options": Array of 4 different options (the answer + 3 distractors)
+- "subunit": "{subunit}"
+- "explanation": Why the answer is correct (2-3 sentences)
+
+Distractors must be grammatically plausible but contextually wrong.
+
+Return ONLY valid JSON, no markdown."""
+
+
+def paragraph_prompt(passage: Dict, repair: Repair) -> str:
+    paragraph = passage["paragraphs"][repair.index]
+    subunit = paragraph_subunit(paragraph)
+    markers = ", ".join(f"__{i}__" for i in repair.ids)
+    text = "\n\n".join(f"[REWRITE] {MARKER.sub(lambda m: '_____', filled(p))}" if i == repair.index else filled(p)
+                       for i, p in enumerate(passage["paragraphs"]))
+    return f"""Rewrite one paragraph of a grammar cloze exercise for Singapore students.
+
+Difficulty Level: {passage.get("difficulty")} (1-3: Primary, 4-6: Secondary, 7-9: JC)
+Grammar Topic: {subunit}
+
+The passage, with the paragraph to rewrite marked [REWRITE]:
+
+{text}
+
+Rewrite that paragraph only: keep what it says and its 4 sentences, and test the grammar topic with
+exactly {len(repair.ids)} blanks, marked {markers} in that order.
+
+Return a JSON object with:
+- "text": The paragraph with the blanks marked {markers}
+- "blanks": Array of {len(repair.ids)} objects with:
+    - "id": The blank number ({", ".join(map(str, repair.ids))})
+    - "answer": Correct word (lowercase)
+    - "options": Array of 4 different options (1 correct + 3 distractors)
+    - "subunit": "{subunit}"
+    - "explanation": Why the answer is correct (2-3 sentences)
+
+Return ONLY valid JSON, no markdown."""
+
+
+def question_prompt(passage: Dict, repair: Repair) -> str:
+    question = passage["questions"][repair.index]
+    others = "\n".join(f"- {q.get('question')}" for i, q in enumerate(passage["questions"]) if i != repair.index)
+    old = f' It used to ask: "{question.get("question")}"' if question.get("question") else ""
+    return f"""Repair one reading comprehension question for Singapore students.
+
+Difficulty Level: {passage.get("difficulty")}
+Title: {passage.get("title")}
+
+Passage:
+{passage.get("passage")}
+
+The other questions on this passage (do not repeat them):
+{others or "- (none)"}
+
+Write a new multiple-choice question {question.get("id", repair.index + 1)} on the passage.{old}
+
+Return a JSON object with:
+- "id": {question.get("id", repair.index + 1)}
+- "question": The question text
+- "options": Object with keys "1", "2", "3", "4" for 4 different answer choices
+- "answer": The correct answer (must match one option exactly)
+- "answer_index": Which option is correct (1, 2, 3, or 4)
+- "explanation": Why the answer is correct (2-3 sentences)
+
+Return ONLY valid JSON, no markdown."""
+
+
+PROMPTS = {"blank": blank_prompt, "paragraph": paragraph_prompt, "question": question_prompt}
+
+
+def repair_job(passage: Dict, repair: Repair) -> Job:
+    return Job(key=repair.key, prompt=PROMPTS[repair.kind](passage, repair),
+               meta={"repair": repair, "difficulty": passage.get("difficulty")},
+               schema=response_schema(PART_SCHEMAS[repair.kind], many=False))
+
+
+def rewrite_estimate(bank: str, passage: Dict) -> int:
+    """Tokens to regenerate the passage from scratch: its generator's prompt plus the passage itself."""
+    if bank == "grammar-cloze":
+        prompt = generate_grammar_cloze_ai.build_passage_prompt(passage.get("difficulty", 5))
+    else:
+        prompt = generate_comprehension_ai.build_passage_prompt(passage.get("difficulty", 5),
+                                                                passage.get("theme", ""))
+    return estimate_tokens(prompt) + estimate_tokens(json.dumps(passage, indent=2, ensure_ascii=False))
+
+
+# --- Patching ---
+
+def apply(passage: Dict, repair: Repair, data, rejected: Counter) -> bool:
+    """Patch a validated reply into the passage; False (counted in rejected) if it does not fit."""
+    if not isinstance(data, dict):
+        rejected["not an object"] += 1
+        return False
+    if repair.kind == "question":
+        data["id"] = passage["questions"][repair.index].get("id", repair.index + 1)
+    elif repair.kind == "blank":
+        data["id"] = repair.blank_id
+    if not accept_valid(PART_SCHEMAS[repair.kind], [data], rejected):
+        return False
+    if repair.kind == "question":
+        passage["questions"][repair.index] = data
+    elif repair.kind == "blank":
+        blanks = passage["paragraphs"][repair.index]["blanks"]
+        blanks[[b.get("id") for b in blanks].index(repair.blank_id)] = data
+    else:
+        if sorted(b["id"] for b in data["blanks"]) != repair.ids:
+            rejected["wrong blank ids"] += 1
+            return False
+        passage["paragraphs"][repair.index] = {"text": data["text"], "blanks": data["blanks"]}
+    return True
+
+
+def renumber(passage: Dict):
+    """Number the blanks 1, 2, ... in reading order, rewriting the __n__ markers to match."""
+    next_id = 1
+    for paragraph in passage["paragraphs"]:
+        mapping = {}
+        for marker in MARKER.findall(paragraph["text"]):
+            if int(marker) not in mapping:
+                mapping[int(marker)] = next_id
+                next_id += 1
+        paragraph["text"] = MARKER.sub(lambda m: f"__{mapping[int(m.group(1))]}__", paragraph["text"])
+        for blank in paragraph["blanks"]:
+            blank["id"] = mapping[blank["id"]]
+        paragraph["blanks"].sort(key=lambda b: b["id"])
+    passage["totalBlanks"] = next_id - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate only the failing parts of passages")
+    add_runtime_args(parser)
+    parser.add_argument("--bank", choices=REPAIRABLE, action="append",
+                        help="Bank to repair (repeatable; default: both)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Apply and list the local fixes and the parts to regenerate, without model calls or writes")
+    args = parser.parse_args()
+    banks = args.bank or REPAIRABLE
+    if args.output and len(banks) > 1:
+        parser.error("--output needs a single --bank")
+
+    print("=" * 60)
+    print("PASSAGE REPAIR")
+    print("=" * 60)
+
+    with open_store(banks=banks) as store:
+        passages = {bank: list(store.items(bank)) for bank in banks}
+        # Failing passages are fixed on copies, which replace the originals only once they pass whole
+        working: Dict[str, Dict[int, Dict]] = {}
+        repairs: List[Repair] = []
+        for bank in banks:
+            _, invalid = validate_batch(bank, passages[bank])
+            working[bank] = {p["id"]: copy.deepcopy(p) for p in (passages[bank][i] for i in invalid if i >= 0)}
+            fixes = Counter()
+            found = []
+            for passage in working[bank].values():
+                fixes.update(fix_locally(bank, passage))
+                found.extend(find_repairs(bank, passage))
+            repairs.extend(found)
+            print(f"  {bank:<15} {len(passages[bank]):>5} passages, {len(working[bank])} failing")
+            for fix, count in fixes.most_common():
+                print(f"      fixed locally: {fix} x{count}")
+            for (kind, reason), count in Counter((r.kind, r.reason) for r in found).most_common(10):
+                print(f"      regenerate {kind}: {reason} x{count}")
+
+        jobs = [repair_job(working[r.bank][r.passage_id], r) for r in repairs]
+        rewrite_tokens = sum(rewrite_estimate(bank, working[bank][passage_id])
+                             for bank, passage_id in {(r.bank, r.passage_id) for r in repairs})
+        if args.dry_run:
+            prompt_tokens = sum(estimate_tokens(job.prompt) for job in jobs)
+            print(f"\n{len(jobs)} parts to regenerate: ~{prompt_tokens:,} prompt tokens "
+                  f"(regenerating the passages whole: ~{rewrite_tokens:,} tokens)")
+            return
+
+        rejected = Counter()
+        spent = 0
+        if jobs:
+            print(f"\nRegenerating {len(jobs)} parts...")
+            for result in collect_results(jobs, model_name=DEFAULT_MODEL, **runner_options(args)):
+                repair = result.job.meta["repair"]
+                spent += estimate_tokens(result.job.prompt) + (estimate_tokens(result.text) if result.text else 0)
+                before = Counter(rejected)
+                patched = result.ok and apply(working[repair.bank][repair.passage_id], repair, result.data, rejected)
+                result.report(int(patched), rejected - before)
+
+        renumbered = {(r.bank, r.passage_id) for r in repairs if r.kind == "paragraph"}
+        print()
+        for bank in banks:
+            for passage_id in sorted(working[bank]):
+                if (bank, passage_id) in renumbered:
+                    passage = working[bank][passage_id]
+                    if not validate_batch(PART_SCHEMAS["paragraph"], passage["paragraphs"])[1]:
+                        renumber(passage)
+            repaired, _ = validate_batch(bank, list(working[bank].values()))
+            positions = {p["id"]: i for i, p in enumerate(passages[bank])}
+            for passage in repaired:
+                passages[bank][positions[passage["id"]]] = passage
+            print(f"  {bank:<15} {len(repaired)} passages repaired, "
+                  f"{len(working[bank]) - len(repaired)} still failing")
+            if not repaired:
+                continue
+            if args.fake or args.output:
+                path = output_path(args, bank_path(bank))
+                write_json_atomic(path, passages[bank], indent=BANKS[bank].indent,
+                                  ensure_ascii=BANKS[bank].ensure_ascii)
+                print(f"      saved to: {path}")
+            else:
+                store.upsert(bank, repaired)
+                store.export(bank)
+                print(f"      exported to: {BANKS[bank].file}")
+
+    if rejected:
+        print(f"\nRejected replies: {dict(rejected)}")
+    if jobs:
+        print(f"Tokens (est.): ~{spent:,} for {len(jobs)} part prompts and replies, "
+              f"vs ~{rewrite_tokens:,} to regenerate the passages whole")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts import each other as top-level modules (python scripts/foo.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,45 @@
+from collections import Counter
+
+from content_schemas import accept_valid, describe_invalid, error_counts, validate_batch
+
+
+def question(number, **fields):
+    item = {"question_number": number, "question": "Which word means 'brave'?", "theme": "Feelings",
+            "difficulty": 3, "options": {"1": "bold", "2": "shy", "3": "calm", "4": "dull"},
+            "answer": "bold", "answer_index": 1}
+    item.update(fields)
+    return item
+
+
+def test_valid_items_pass_and_invalid_ones_are_reported_by_position():
+    items = [question(1), question(2, difficulty="3"), question(3)]
+    valid, invalid = validate_batch("vocab-mcq", items)
+    assert valid == [items[0], items[2]]
+    assert list(invalid) == [1]
+    assert error_counts(invalid) == Counter({"int_type at difficulty": 1})
+
+
+def test_every_defect_of_an_item_is_reported():
+    bad = question(796, options={"1": "bold", "2": "Bold", "3": "calm", "4": "dull"}, answer="brave", answer_index=3)
+    _, invalid = validate_batch("vocab-mcq", [bad])
+    problems = describe_invalid("vocab-mcq", [bad], invalid)
+    assert {p["key"] for p in problems} == {"796"}
+    assert [(p["type"], p["message"]) for p in problems] == [
+        ("answer_not_option", "answer 'brave' is not an option"),
+        ("answer_index", "answer_index 3 is 'calm', not 'brave'"),
+        ("repeated_option", "repeated option(s): bold"),
+    ]
+
+
+def test_missing_fields_and_bad_values_are_all_listed():
+    bad = question(5, difficulty=12)
+    del bad["theme"]
+    _, invalid = validate_batch("vocab-mcq", [bad])
+    assert set(error_counts(invalid)) == {"missing at theme", "less_than_equal at difficulty"}
+
+
+def test_accept_valid_counts_each_rejected_item_once():
+    rejected = Counter()
+    bad = question(2, answer="brave", answer_index=2)
+    assert accept_valid("vocab-mcq", [question(1), bad], rejected) == [question(1)]
+    assert rejected == Counter({"schema: answer_not_option": 1})
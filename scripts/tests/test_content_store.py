@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+import content_store
+from content_store import BANKS, ContentStore
+
+
+def passage(n):
+    return {"id": n, "title": f"Passage {n}", "difficulty": 3, "paragraphs": [{"text": "Ünïcode", "blanks": []}]}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_store, "DATA_DIR", str(tmp_path))
+    path = tmp_path / BANKS["grammar-cloze"].file
+    path.write_text(json.dumps([passage(1), passage(2)], indent=2, ensure_ascii=False), encoding="utf-8")
+    with ContentStore(str(tmp_path / "store.sqlite")) as store:
+        store.sync(["grammar-cloze"])
+        yield store
+
+
+def test_append_writes_the_layout_json_dump_would(store):
+    store.append("grammar-cloze", [passage(3), passage(4)])
+    path = content_store.bank_path("grammar-cloze")
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    expected = [passage(n) for n in range(1, 5)]
+    assert text == json.dumps(expected, indent=2, ensure_ascii=False)
+    assert [item["id"] for item in store.items("grammar-cloze")] == [1, 2, 3, 4]
+
+
+def test_append_leaves_the_bank_in_sync(store):
+    store.append("grammar-cloze", [passage(3)])
+    assert store.sync(["grammar-cloze"]) == []
+    assert store.max_number("grammar-cloze") == 3
+
+
+def test_append_of_an_existing_key_rewrites_the_file(store):
+    changed = dict(passage(2), title="Renamed")
+    store.append("grammar-cloze", [changed, passage(3)])
+    with open(content_store.bank_path("grammar-cloze"), encoding="utf-8") as f:
+        assert [p["title"] for p in json.load(f)] == ["Passage 1", "Renamed", "Passage 3"]
+
+
+def test_high_water_round_trip(store):
+    assert store.high_water("/data/vocab_8000.json") is None
+    store.set_high_water("/data/vocab_8000.json", 1024, 2048, "abc")
+    assert store.high_water("/data/vocab_8000.json") == (1024, 2048, "abc")
+    store.set_high_water("/data/vocab_8000.json", 2048, 4096, "def")
+    assert store.high_water("/data/vocab_8000.json") == (2048, 4096, "def")
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from llm_runtime.parsing import StreamingArrayParser, parse_json_items
+
+ITEMS = [{"word": "brave", "note": "a, [tricky] {string}"}, {"word": "calm"}, {"word": "eager"}]
+
+
+def test_items_arrive_as_soon_as_they_are_complete():
+    text = "```json\n" + json.dumps(ITEMS) + "\n```"
+    parser = StreamingArrayParser()
+    seen = []
+    for i in range(0, len(text), 7):
+        seen.extend(parser.feed(text[i:i + 7]))
+    items = parser.close()
+    assert seen == ITEMS
+    assert items == ITEMS
+    assert (items.salvaged, items.lost) == (0, 0)
+
+
+def test_truncated_response_keeps_the_items_before_the_cut():
+    text = json.dumps(ITEMS)
+    items = parse_json_items(text[:text.index('{"word": "eager"') + 10])
+    assert items == ITEMS[:2]
+    assert (items.salvaged, items.lost) == (2, 1)
+
+
+def test_malformed_element_loses_only_itself():
+    items = parse_json_items('[{"word": "brave"}, {"word": calm}, {"word": "eager"}]')
+    assert items == [{"word": "brave"}, {"word": "eager"}]
+    assert (items.salvaged, items.lost) == (2, 1)
+
+
+def test_single_object_is_wrapped():
+    assert parse_json_items('{"word": "brave"}') == [{"word": "brave"}]
+
+
+def test_nothing_recoverable_raises():
+    with pytest.raises(ValueError):
+        parse_json_items('[{"word": "bra')
@@ -0,0 +1,39 @@
+import pytest
+
+from word_families import FamilyIndex, family_key
+
+SAME_FAMILY = [
+    ("run", "running"), ("run", "ran"), ("hope", "hoped"), ("hope", "hoping"), ("use", "using"),
+    ("ice", "icing"), ("devise", "devised"), ("study", "studies"), ("study", "studied"),
+    ("cat", "cats"), ("map", "maps"), ("box", "boxes"), ("class", "classes"), ("sit", "sitting"),
+    ("tie", "ties"), ("tie", "tied"), ("lie", "lies"),
+    ("fly", "flies"), ("sky", "skies"), ("cry", "cried"), ("cry", "cries"), ("try", "tried"),
+    ("go", "goes"), ("bus", "buses"), ("gas", "gases"), ("toe", "toes"), ("hero", "heroes"),
+    ("crisis", "crises"), ("thesis", "theses"),
+    ("building", "buildings"), ("feeling", "feelings"),
+]
+
+DIFFERENT_FAMILY = [
+    ("new", "news"), ("even", "evening"), ("morn", "morning"), ("wick", "wicked"), ("ceil", "ceiling"),
+    ("dure", "during"), ("bore", "boring"), ("crook", "crooked"), ("beside", "besides"),
+    ("dog", "dogged"), ("build", "building"), ("paint", "painting"), ("interest", "interesting"),
+    ("meet", "meeting"), ("feel", "feeling"), ("age", "aged"), ("bia", "bias"),
+    ("happy", "happiness"),
+]
+
+
+@pytest.mark.parametrize("base, form", SAME_FAMILY)
+def test_inflections_share_a_family(base, form):
+    assert family_key(base) == family_key(form)
+
+
+@pytest.mark.parametrize("base, form", DIFFERENT_FAMILY)
+def test_lexicalised_and_derived_words_stay_apart(base, form):
+    assert family_key(base) != family_key(form)
+
+
+def test_index_rejects_only_the_same_family():
+    index = FamilyIndex(["evening", "run"])
+    assert index.add("even") is None
+    assert index.add("running") == "run"
+    assert "wicked" not in index
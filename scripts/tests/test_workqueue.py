@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from llm_runtime.workqueue import WorkQueue
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "queue.sqlite")
+
+
+def worker(path, name, **options):
+    return WorkQueue(path, "test", worker_id=name, **options)
+
+
+def test_expired_lease_is_handed_out_again(path):
+    a = worker(path, "a", lease_seconds=0.05)
+    b = worker(path, "b", lease_seconds=0.05)
+    a.enqueue("job-1", {"n": 1})
+    leased = a.lease()
+    assert leased.key == "job-1" and leased.attempts == 1
+    assert b.lease() is None
+    time.sleep(0.1)
+    again = b.lease()
+    assert (again.id, again.payload, again.attempts) == (leased.id, {"n": 1}, 2)
+    b.complete(again.id, ["item"])
+    assert b.counts() == {"done": 1}
+
+
+def test_heartbeat_keeps_the_lease(path):
+    a = worker(path, "a", lease_seconds=0.2)
+    b = worker(path, "b", lease_seconds=0.2)
+    a.enqueue("job-1", {})
+    a.lease()
+    time.sleep(0.1)
+    assert a.heartbeat() == 1
+    time.sleep(0.15)
+    assert b.lease() is None
+
+
+def test_job_fails_once_attempts_run_out(path):
+    queue = worker(path, "a", lease_seconds=0.01, max_attempts=2)
+    queue.enqueue("job-1", {})
+    assert queue.lease().attempts == 1
+    time.sleep(0.02)
+    assert queue.lease().attempts == 2
+    time.sleep(0.02)
+    assert queue.lease() is None
+    assert queue.counts() == {"failed": 1}
+
+
+def test_dedup_keys_are_global(path):
+    a, b = worker(path, "a"), worker(path, "b")
+    a.enqueue_many([("job-1", {}), ("job-2", {})])
+    first, second = a.lease(), b.lease()
+    assert a.complete(first.id, ["Run", "walk"], dedup_key=str.lower) == ["Run", "walk"]
+    assert b.complete(second.id, ["run", "jump"], dedup_key=str.lower) == ["jump"]
+    assert a.items() == ["Run", "walk", "jump"]
+
+
+def test_only_one_worker_claims_the_export(path):
+    a, b = worker(path, "a"), worker(path, "b")
+    a.enqueue("job-1", {})
+    job = a.lease()
+    assert not b.claim_export()
+    a.complete(job.id, [])
+    assert a.claim_export()
+    assert not b.claim_export()
+    b.enqueue("job-2", {})
+    b.complete(b.lease().id, [])
+    assert b.claim_export()
@@ -0,0 +1,124 @@
+"""
+Question Bank Validator
+Checks every bank that dataManifest.js imports, item by item, against its
+model in content_schemas.py, which holds the one rule set the generators and
+repair_passages.py validate with too:
+
+- MCQs (vocab, grammar, and the questions inside comprehension and
+  listening passages): the answer is one of the options, answer_index
+  points at it, and no option is repeated.
+- Cloze passages (vocab and grammar): the __n__ markers in each paragraph
+  match that paragraph's blanks, every blank's answer is one of its
+  options, options are unique, and totalBlanks is right.
+- Synthesis: answerParts, filled in, rebuild the answer (compared the way
+  SynthesisView.jsx compares a learner's answer).
+- Every bank: the fields the app reads are present, with the right types.
+
+Each file is split into chunks and the chunks are spread over a process
+pool, each validated with one content_schemas.validate_batch call, so the
+whole src/data tree validates in about a second on a few cores. The report
+lists every problem with its bank, item key and check (the error type);
+--json writes it for CI or other tools, and the exit status is 1 if
+anything failed.
+
+Usage:
+    python validate_banks.py [--bank vocab-mcq] [--workers 4] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from content_schemas import describe_invalid, validate_batch
+from content_store import BANKS, bank_path
+
+CHUNK_SIZE = 500
+
+Problem = Tuple[str, str, str]  # (item key, check, message)
+
+
+def validate_chunk(task: Tuple[str, int, List[Dict]]) -> Tuple[str, int, List[Problem]]:
+    """Validate one chunk against the bank's schema. Returns (bank, items checked, problems)."""
+    bank, start, items = task
+    _, invalid = validate_batch(bank, items)
+    problems = [
+        (p["key"], p["type"], f"{p['path']}: {p['message']}" if p["path"] else p["message"])
+        for p in describe_invalid(bank, items, invalid, start)
+    ]
+    return bank, len(items), problems
+
+
+def chunks(bank: str) -> List[Tuple[str, int, List[Dict]]]:
+    with open(bank_path(bank), encoding="utf-8") as f:
+        items = json.load(f)
+    return [(bank, start, items[start:start + CHUNK_SIZE]) for start in range(0, len(items), CHUNK_SIZE)] \
+        or [(bank, 0, [])]
+
+
+def validate(banks: List[str], workers: int) -> Dict:
+    """Validate the banks and build the report."""
+    started = time.time()
+    tasks = [task for bank in banks for task in chunks(bank)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(validate_chunk, tasks))
+    else:
+        results = [validate_chunk(task) for task in tasks]
+
+    files = {bank: {"file": BANKS[bank].file, "items": 0, "problems": 0, "checks": Counter()} for bank in banks}
+    problems = []
+    for bank, checked, found in results:
+        files[bank]["items"] += checked
+        files[bank]["problems"] += len(found)
+        for key, check, message in found:
+            files[bank]["checks"][check] += 1
+            problems.append({"bank": bank, "key": key, "check": check, "message": message})
+    for info in files.values():
+        info["checks"] = dict(info["checks"])
+    return {
+        "ok": not problems,
+        "seconds": round(time.time() - started, 3),
+        "workers": workers,
+        "files": files,
+        "problems": problems,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the src/data question banks")
+    parser.add_argument("--bank", choices=list(BANKS), action="append",
+                        help="Bank to validate (repeatable; default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes to spread the chunks over (default: one per CPU)")
+    parser.add_argument("--json", metavar="PATH", default=None, help="Write the full report as JSON")
+    parser.add_argument("--show", type=int, default=10, help="Problems to print per bank (default: 10)")
+    args = parser.parse_args()
+
+    report = validate(args.bank or list(BANKS), max(1, args.workers))
+
+    print("=" * 60)
+    print(f"Validated {sum(f['items'] for f in report['files'].values())} items in {report['seconds']}s "
+          f"({report['workers']} workers)")
+    print("=" * 60)
+    for bank, info in report["files"].items():
+        status = "OK" if not info["problems"] else f"{info['problems']} problems"
+        print(f"  {bank:<15} {info['items']:>6} items  {status}")
+        for check, count in sorted(info["checks"].items()):
+            print(f"      {check:<18} {count}")
+        shown = [p for p in report["problems"] if p["bank"] == bank][:args.show]
+        for problem in shown:
+            print(f"      {problem['key']}: {problem['message']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport saved to: {args.json}")
+    raise SystemExit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
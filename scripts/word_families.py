@@ -0,0 +1,285 @@
+"""
+Word Family Index
+Catches near-duplicate vocabulary such as "devise"/"devised" or
+"run"/"running" that an exact lowercase match lets through.
+
+family_key() reduces a word to a family key with the inflectional steps of
+the Porter stemmer (plurals, -ed, -ing, final -y and silent -e) plus a short
+table of irregular forms. Derivations are left alone on purpose: "happy"
+and "happiness" are different entries in a vocabulary bank.
+
+Two guards keep unrelated words apart. Lexicalised forms ("news", "evening",
+"wicked", "besides") are never stemmed, and a suffix only comes off when at
+least four letters remain or what remains is a known short base ("run",
+"hope", "map"), so "during" does not become "dure".
+
+FamilyIndex is a dict from family key to the first word seen, so "is this
+family already present?" is one stem and one lookup at insert time. It is
+used by generate_vocab_ai.py, ai_word_generator.py and merge_vocab.py.
+
+Run as a script it audits the existing banks and lists every family with
+more than one member:
+
+Usage: python word_families.py [--bank questions|spelling] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "../src/data")
+BANKS = {
+    "questions": (os.path.join(DATA_DIR, "questions.json"), "answer"),
+    "spelling": (os.path.join(DATA_DIR, "spelling_words.json"), "word"),
+}
+
+VOWELS = set("aeiou")
+
+# Common irregular forms -> base form. Forms that are also words in their own
+# right (saw, rose, left, felt, found, better) are left out.
+IRREGULAR = {
+    "ran": "run", "went": "go", "gone": "go", "was": "be", "were": "be", "been": "be",
+    "had": "have", "did": "do", "done": "do", "made": "make", "said": "say", "seen": "see",
+    "took": "take", "taken": "take", "gave": "give", "given": "give", "came": "come",
+    "knew": "know", "known": "know", "thought": "think", "brought": "bring", "bought": "buy",
+    "caught": "catch", "taught": "teach", "fought": "fight", "sought": "seek", "told": "tell",
+    "sold": "sell", "held": "hold", "stood": "stand", "understood": "understand",
+    "wrote": "write", "written": "write", "spoke": "speak", "spoken": "speak", "broke": "break",
+    "broken": "break", "chose": "choose", "chosen": "choose", "froze": "freeze",
+    "frozen": "freeze", "drove": "drive", "driven": "drive", "rode": "ride", "ridden": "ride",
+    "risen": "rise", "fallen": "fall", "began": "begin", "begun": "begin", "sang": "sing",
+    "sung": "sing", "swam": "swim", "swum": "swim", "drank": "drink", "ate": "eat",
+    "eaten": "eat", "flew": "fly", "flown": "fly", "grew": "grow", "grown": "grow",
+    "threw": "throw", "thrown": "throw", "drew": "draw", "drawn": "draw", "wore": "wear",
+    "worn": "wear", "tore": "tear", "torn": "tear", "hid": "hide", "hidden": "hide",
+    "bitten": "bite", "forgot": "forget", "forgotten": "forget", "forgave": "forgive",
+    "forgiven": "forgive", "fled": "flee", "bled": "bleed", "sent": "send", "spent": "spend",
+    "built": "build", "lent": "lend", "meant": "mean", "kept": "keep", "slept": "sleep",
+    "swept": "sweep", "wept": "weep", "paid": "pay", "laid": "lay",
+    "children": "child", "men": "man", "women": "woman", "mice": "mouse", "geese": "goose",
+    "feet": "foot", "teeth": "tooth", "oxen": "ox", "lice": "louse",
+    "crises": "crisis", "theses": "thesis", "oases": "oasis", "hypotheses": "hypothesis",
+    "analyses": "analysis", "diagnoses": "diagnosis", "phenomena": "phenomenon", "criteria": "criterion",
+}
+
+
+# Forms that look inflected but are words in their own right, with their own
+# meaning ("news" is not the plural of "new", nor "evening" a form of "even",
+# and "building" or "interesting" are vocabulary items of their own). Their
+# plurals ("buildings") land here too once the -s is off.
+LEXICALISED = {
+    "news", "means", "series", "species", "besides", "clothes", "glasses", "goods", "manners",
+    "thanks", "physics", "politics", "economics", "mathematics", "athletics",
+    "savings", "earnings", "surroundings", "belongings",
+    "evening", "morning", "ceiling", "during", "boring", "wedding", "pudding",
+    "building", "painting", "meeting", "feeling", "interesting", "clothing",
+    "wicked", "crooked", "naked", "sacred", "rugged", "ragged", "beloved", "hundred", "kindred",
+    "dogged", "aged", "learned", "blessed",
+}
+
+# Bases shorter than four letters (or four with a silent e) whose inflections
+# are still stemmed: "running" -> "run", "hoped" -> "hope", "maps" -> "map".
+SHORT_BASES = {
+    # verbs
+    "do", "go", "act", "add", "age", "aid", "ask", "ban", "beg", "bow", "box", "buy", "cry", "cut", "die", "dig", "dip",
+    "dry", "dye", "end", "fit", "fix", "fly", "fry", "get", "hit", "hop", "hug", "hum", "jog", "let", "lie",
+    "mix", "mop", "mow", "nap", "nod", "owe", "own", "pat", "pay", "pop", "put", "rob", "rot", "row",
+    "rub", "run", "say", "sew", "sip", "sit", "sob", "sow", "tap", "tax", "tie", "tip", "tow", "try",
+    "use", "vow", "wag", "wax", "win", "zip",
+    "ache", "bake", "bite", "bore", "care", "cope", "cure", "dare", "date", "dine", "dose", "doze",
+    "dupe", "face", "fade", "fine", "fire", "fuse", "gaze", "hide", "hire", "hone", "hope", "joke",
+    "like", "line", "live", "love", "lure", "make", "mine", "move", "name", "note", "pace", "poke",
+    "pose", "race", "rage", "rate", "ride", "rope", "save", "size", "take", "tape", "time", "tire",
+    "tune", "type", "vote", "wade", "wave", "wipe", "wire",
+    # nouns
+    "ant", "ape", "arm", "bag", "bat", "bed", "bee", "bin", "boy", "bud", "bun", "bus", "cab", "cap", "car",
+    "cat", "cow", "cup", "day", "dog", "ear", "egg", "elm", "eye", "fan", "fee", "fin", "fox", "gap", "gas",
+    "gem", "gum", "gun", "hat", "hen", "hut", "ice", "inn", "jar", "jaw", "jet", "job", "key", "kid",
+    "kit", "law", "leg", "lid", "lip", "log", "map", "mug", "net", "nut", "oak", "oar", "owl", "pan",
+    "paw", "pea", "peg", "pen", "pet", "pie", "pig", "pin", "pot", "rat", "ray", "rib", "rug", "sea",
+    "sky", "spy", "tag", "tea", "toe", "toy", "van", "war", "way", "web", "wig", "yam",
+}
+
+
+def is_consonant(word: str, i: int) -> bool:
+    c = word[i]
+    if c in VOWELS:
+        return False
+    if c == "y":
+        return i == 0 or not is_consonant(word, i - 1)
+    return True
+
+
+def measure(stem: str) -> int:
+    """Porter's m: the number of vowel-consonant sequences in the stem."""
+    form = "".join("c" if is_consonant(stem, i) else "v" for i in range(len(stem)))
+    return len(re.findall(r"v+c+", form))
+
+
+def has_vowel(stem: str) -> bool:
+    return any(not is_consonant(stem, i) for i in range(len(stem)))
+
+
+def ends_cvc(stem: str) -> bool:
+    """Consonant-vowel-consonant ending, the last not w, x or y (hop, hat)."""
+    n = len(stem)
+    return (n >= 3 and is_consonant(stem, n - 3) and not is_consonant(stem, n - 2)
+            and is_consonant(stem, n - 1) and stem[-1] not in "wxy")
+
+
+def strippable(stem: str) -> bool:
+    """Whether a suffix may come off, leaving `stem` ("runn", "hop", "map")."""
+    return len(stem) >= 4 or bool({stem, stem + "e", stem[:-1]} & SHORT_BASES)
+
+
+def stem_token(word: str) -> str:
+    """Porter steps 1a, 1b, 1c and 5a: the inflectional part of the stemmer."""
+    if word in IRREGULAR:
+        word = IRREGULAR[word]
+    if len(word) <= 3 or word in LEXICALISED:
+        return word
+
+    # 1a: plurals (but not "class", "status", "analysis")
+    if word.endswith(("sses", "ches", "shes", "xes", "zzes")):
+        if strippable(word[:-2]):
+            word = word[:-2]
+    elif word.endswith("ies"):
+        stem = word[:-3]
+        if stem + "ie" in SHORT_BASES:
+            word = stem + "ie"  # ties -> tie
+        elif stem + "y" in SHORT_BASES:
+            word = stem + "y"  # flies -> fly
+        elif len(word) > 4 and strippable(word[:-2]):
+            word = word[:-2]  # studies -> studi
+    elif word.endswith("es") and word[:-1] not in SHORT_BASES and word[:-2] in SHORT_BASES:
+        word = word[:-2]  # goes -> go, buses -> bus (but toes -> toe below)
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")) and strippable(word[:-1]):
+        word = word[:-1]
+    if word in LEXICALISED:
+        return word
+
+    # 1b: -ied, -eed, -ed, -ing
+    if word.endswith("ied") and (word[:-3] + "ie" in SHORT_BASES or word[:-3] + "y" in SHORT_BASES):
+        word = word[:-3] + ("ie" if word[:-3] + "ie" in SHORT_BASES else "y")  # tied -> tie, cried -> cry
+    elif word.endswith("eed"):
+        if measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ("ed", "ing"):
+            stem = word[: -len(suffix)]
+            if word.endswith(suffix) and has_vowel(stem) and strippable(stem):
+                word = stem
+                if word.endswith(("at", "bl", "iz")):
+                    word += "e"
+                elif len(word) >= 2 and word[-1] == word[-2] and is_consonant(word, len(word) - 1) \
+                        and word[-1] not in "lsz":
+                    word = word[:-1]
+                elif measure(word) == 1 and ends_cvc(word):
+                    word += "e"
+                break
+
+    # 1c: final y after a vowel-bearing stem
+    if word.endswith("y") and has_vowel(word[:-1]):
+        word = word[:-1] + "i"
+
+    # 5a: silent e
+    if word.endswith("e"):
+        m = measure(word[:-1])
+        if m > 1 or (m == 1 and not ends_cvc(word[:-1])):
+            word = word[:-1]
+    # Short bases keep their e, so "using" meets "use" (which is never stemmed)
+    if len(word) < 3 and word + "e" in SHORT_BASES:
+        word += "e"
+    return word
+
+
+def family_key(word: str) -> str:
+    """Family key for a word or phrase (each token is stemmed)."""
+    tokens = re.findall(r"[a-z]+", word.lower().replace("'", ""))
+    return " ".join(stem_token(t) for t in tokens) or word.lower().strip()
+
+
+class FamilyIndex:
+    """Word family -> first member seen. `word in index` asks about the family."""
+
+    def __init__(self, words: Iterable[str] = ()):
+        self.families: Dict[str, str] = {}
+        for word in words:
+            self.add(word)
+
+    def find(self, word: str) -> Optional[str]:
+        """The member already in the index from this word's family, or None."""
+        return self.families.get(family_key(word))
+
+    def add(self, word: str) -> Optional[str]:
+        """Add a word unless its family is present; returns the existing member in that case."""
+        key = family_key(word)
+        existing = self.families.get(key)
+        if existing is None:
+            self.families[key] = word.lower().strip()
+        return existing
+
+    def __contains__(self, word: str) -> bool:
+        return family_key(word) in self.families
+
+    def __len__(self) -> int:
+        return len(self.families)
+
+
+def audit(items: List[Dict], word_of: Callable[[Dict], str]) -> List[Dict]:
+    """Families with more than one member: exact repeats and inflected variants alike."""
+    families = defaultdict(list)
+    for position, item in enumerate(items):
+        word = word_of(item)
+        if word:
+            families[family_key(word)].append((position, word.lower().strip()))
+    groups = []
+    for key, members in families.items():
+        if len(members) > 1:
+            words = sorted({w for _, w in members})
+            groups.append({
+                "family": key,
+                "words": words,
+                "count": len(members),
+                "kind": "exact" if len(words) == 1 else "variant",
+                "positions": [p for p, _ in members],
+            })
+    groups.sort(key=lambda g: (-g["count"], g["family"]))
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List word families that occur more than once in a bank")
+    parser.add_argument("--bank", choices=sorted(BANKS), action="append",
+                        help="Bank to audit (repeatable; default: all)")
+    parser.add_argument("--json", action="store_true", help="Print the groups as JSON")
+    args = parser.parse_args()
+
+    report = {}
+    for bank in args.bank or sorted(BANKS):
+        path, field = BANKS[bank]
+        with open(path, encoding="utf-8") as f:
+            items = json.load(f)
+        groups = audit(items, lambda item: item.get(field, ""))
+        report[bank] = {"items": len(items), "families": len(groups), "groups": groups}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for bank, result in report.items():
+        exact = sum(1 for g in result["groups"] if g["kind"] == "exact")
+        print("=" * 60)
+        print(f"{bank}: {result['items']} items, {result['families']} repeated families "
+              f"({exact} exact, {result['families'] - exact} inflected variants)")
+        print("=" * 60)
+        for group in result["groups"]:
+            print(f"  {group['count']}x {' / '.join(group['words'])}")
+        print()
+
+
+if __name__ == "__main__":
+    main()